@@ -1,5 +1,6 @@
 import React, { useRef, useEffect, useState } from "react";
 import MessageList, {
+  chunkHasId,
   ChunkedMessage,
   CompleteMessage,
   Message,
@@ -147,7 +148,7 @@ const ChatWindow = () => {
               const parent = prevMessages.find(
                 (msg) =>
                   msg.kind === "chunked-message" &&
-                  msg.contents.some((c) => chunkIds.includes(c.id)),
+                  msg.contents.some((c) => chunkHasId(c, chunkIds)),
               );
               if (parent) setMessageIdStreamingAudio(parent.id);
               return prevMessages;
@@ -201,6 +202,7 @@ const ChatWindow = () => {
                     id: message.id,
                     content: chunkContent,
                     finish_reason: message.finish_reason || null,
+                    chunk_ids: message.chunk_ids,
                   };
 
                   console.log("Adding chunk:", newChunk); // Debug the new chunk
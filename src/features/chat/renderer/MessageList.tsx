@@ -21,6 +21,12 @@ export interface MessageChunk {
   id: string;
   content: string;
   finish_reason: string | null;
+  chunk_ids?: string[]; // Ids of the chunks merged into this one, if Python coalesced them
+}
+
+// Whether a chunk holds any of the given chunk ids
+export function chunkHasId(chunk: MessageChunk, ids: string[]): boolean {
+  return (chunk.chunk_ids ?? [chunk.id]).some((id) => ids.includes(id));
 }
 
 export type Message = CompleteMessage | ChunkedMessage;
@@ -95,7 +101,7 @@ const MessageItem: React.FC<MessageItemProps> = ({ message, roleToName, sentence
     // Build markdown string with HTML spans for highlighted chunks
     content = message.contents.map(chunk => {
       const text = typeof chunk.content === 'string' ? chunk.content : String(chunk.content || '');
-      if (sentenceIds.includes(chunk.id)) {
+      if (chunkHasId(chunk, sentenceIds)) {
         return `<span class=\"bg-yellow-200\">${text}</span>`;
       }
       return text;
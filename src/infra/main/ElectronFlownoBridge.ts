@@ -1,4 +1,5 @@
 import { app, BrowserWindow, IpcMainEvent, IpcMainInvokeEvent } from "electron";
+import { readFile } from "fs/promises";
 import path from "path";
 import { PythonRunner } from "electron-flowno-bridge";
 import { IPC_ElectronFlownoBridge_messageForRenderer } from "@infra/IPCChannels";
@@ -11,8 +12,27 @@ export interface IElectronFlownoBridge {
   isRunning(event: IpcMainInvokeEvent): Promise<boolean>;
 }
 
+/// Replace a sentence's audio file reference with the file's bytes, which
+/// reach the renderer as a Uint8Array instead of base64 inside the JSON
+async function attachAudio(message: any): Promise<any> {
+  const audioRef = message?.type === "sentence" ? message.payload?.audio_ref : null;
+  if (!audioRef) {
+    return message;
+  }
+  try {
+    const audioData = await readFile(audioRef.path);
+    return { ...message, payload: { ...message.payload, audio_data: new Uint8Array(audioData) } };
+  } catch (error) {
+    // The renderer synthesizes sentences without audio itself
+    console.error("Could not read sentence audio:", error);
+    return message;
+  }
+}
+
 export class ElectronFlownoBridge implements IElectronFlownoBridge {
   private pythonRunner?: PythonRunner;
+  // Messages are forwarded in order even while a sentence's audio is being read
+  private forwarding: Promise<void> = Promise.resolve();
 
   constructor() {
     console.log("==== ElectronFlownoBridge instance created ====");
@@ -142,9 +162,15 @@ export class ElectronFlownoBridge implements IElectronFlownoBridge {
         try {
           this.pythonRunner.registerMessageListener((message) => {
             // Forward all messages to the renderer process
-            if (mainWindow && !mainWindow.isDestroyed()) {
-              mainWindow.webContents.send(IPC_ElectronFlownoBridge_messageForRenderer, message);
-            }
+            this.forwarding = this.forwarding.then(async () => {
+              // A batch stays one renderer message; the preload script unpacks it
+              const forwarded = message?.type === "batch"
+                ? { ...message, messages: await Promise.all(message.messages.map(attachAudio)) }
+                : await attachAudio(message);
+              if (mainWindow && !mainWindow.isDestroyed()) {
+                mainWindow.webContents.send(IPC_ElectronFlownoBridge_messageForRenderer, forwarded);
+              }
+            });
           });
           resolve();
         } catch (error) {
@@ -0,0 +1,47 @@
+"""
+Throughput benchmark of decoding messages from the frontend.
+
+Decodes the high-rate messages the frontend sends into their ipc_schema
+dataclasses and prints how many are decoded per second. For comparison,
+the last row reads a sentence-done's ID with unchecked dict lookups, as
+the handler did before messages were decoded:
+
+    python benchmarks/ipc_decoding.py [--seconds 0.5]
+"""
+import argparse
+import sys
+
+from ipc_encoding import import_messages, measure
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=0.5, help="Time spent per message")
+    args = parser.parse_args(argv)
+
+    schema = import_messages().ipc_schema
+    from FlownoApp.messages.decoders import decode
+
+    sentence_done = {"type": "sentence-done", "payload": {"id": "s42"}}
+    messages = {
+        "sentence-done": (schema.SentenceDoneRequest, sentence_done),
+        "stop-generation": (schema.StopGenerationRequest, {"type": "stop-generation", "payload": {"chatId": "chat-1"}}),
+        "set-api-config": (schema.SetApiConfigRequest, {
+            "type": "set-api-config",
+            "payload": {"url": "http://localhost:5000/v1/chat/completions", "model": "llama", "temperature": 0.7, "max_tokens": 1024},
+        }),
+        "new-prompt": (schema.NewPromptMessage, {
+            "id": "m1", "type": "new-prompt", "content": {"id": "m1", "role": "user", "content": "Hello there", "chatId": "chat-1"},
+        }),
+    }
+
+    print(f"{'message':<34} {'messages/s':>12} {'us/message':>12}")
+    for name, (cls, message) in messages.items():
+        seconds = measure(lambda m: decode(cls, m), message, args.seconds)
+        print(f"{name:<34} {1 / seconds:>12,.0f} {seconds * 1e6:>12.2f}")
+    seconds = measure(lambda m: m.get("payload", {}).get("id"), sentence_done, args.seconds)
+    print(f"{'sentence-done (unchecked lookup)':<34} {1 / seconds:>12,.0f} {seconds * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
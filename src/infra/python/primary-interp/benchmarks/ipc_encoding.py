@@ -0,0 +1,82 @@
+"""
+Microbenchmark of encoding messages for the NodeJS bridge.
+
+Encodes typical messages with each JSON backend of NodeJSMessageJSONEncoder
+and prints the time per message and its size:
+
+    python benchmarks/ipc_encoding.py [--seconds 0.5] [--history 500]
+
+Only the messages package is imported, since importing FlownoApp itself
+would create the app.
+"""
+import argparse
+import os
+import sys
+import time
+import types
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "FlownoApp")
+
+
+def import_messages() -> types.SimpleNamespace:
+    """Import the messages package under a bare FlownoApp package."""
+    package = types.ModuleType("FlownoApp")
+    package.__path__ = [PACKAGE_DIR]
+    sys.modules["FlownoApp"] = package
+    from FlownoApp.messages import domain_types, encoders, ipc_schema
+    return types.SimpleNamespace(domain_types=domain_types, encoders=encoders, ipc_schema=ipc_schema)
+
+
+def sample_messages(m: types.SimpleNamespace, history: int) -> dict[str, object]:
+    """One message of each kind the bridge carries most, by name."""
+    schema = m.ipc_schema
+    payload = schema.SentenceEventPayload(
+        id="s42", chunk_ids=["c40", "c41", "c42"], text="Here is a sentence of average length.",
+        audio="", order=42, chat_id="chat-1",
+        audio_ref=schema.AudioRef("/tmp/flowno-audio/s42.wav", 96000, "audio/wav"),
+    )
+    messages = [
+        m.domain_types.Message(f"m{i}", "user" if i % 2 else "assistant", "A turn of the conversation. " * 8)
+        for i in range(history)
+    ]
+    return {
+        "chunk": schema.ChunkedResponse("chunk", "c42", "r1", "token ", chat_id="chat-1"),
+        "sentence": schema.SentenceEvent("sentence", payload),
+        f"chat-loaded ({history} messages)": schema.ChatLoadedResponse(
+            "chat-loaded", schema.ChatLoadedPayload("chat-1", messages)
+        ),
+    }
+
+
+def measure(encode, message: object, seconds: float) -> float:
+    """Seconds per call of encode(message), over about `seconds`."""
+    calls, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        for _ in range(100):
+            encode(message)
+        calls += 100
+    return elapsed / calls
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=0.5, help="Time spent per message and backend")
+    parser.add_argument("--history", type=int, default=500, help="Messages of the loaded chat")
+    args = parser.parse_args(argv)
+
+    m = import_messages()
+    backends = {"json": m.encoders.NodeJSMessageJSONEncoder(fast=False)}
+    if m.encoders.orjson is not None:
+        backends["orjson"] = m.encoders.NodeJSMessageJSONEncoder(fast=True)
+    else:
+        print("orjson is not installed; measuring the json backend only\n")
+
+    print(f"{'message':<28} {'backend':<8} {'us/message':>12} {'bytes':>10}")
+    for name, message in sample_messages(m, args.history).items():
+        for backend, encoder in backends.items():
+            seconds = measure(encoder.encode, message, args.seconds)
+            print(f"{name:<28} {backend:<8} {seconds * 1e6:>12.1f} {len(encoder.encode(message)):>10}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
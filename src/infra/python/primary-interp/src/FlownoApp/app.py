@@ -8,24 +8,33 @@ import time
 from typing import Dict, Callable, Coroutine, Any, TypeVar, final
 from typing_extensions import TypeVarTuple, Unpack
 
-from flowno import FlowHDL, AsyncQueue, node
+from flowno import FlowHDL, node
 from FlownoApp.nodes.sentencizer import ChunkSentences
 import nodejs_callback_bridge
 
-from .messages.domain_types import Message, AppState, ApiConfig
+from .messages.domain_types import AppState, ApiConfig, ContextConfig, RetryConfig, DeadlineConfig, RateLimitConfig, SessionConfig, OffloadConfig, SpeechConfig, StreamingConfig
 from .messages.encoders import NodeJSMessageJSONEncoder
 from .ipc.handler import handle_message
+from .ipc.dispatch import PriorityDispatcher
 from .ipc.context import AppContext
-from .nodes.gui_io import GUIChat, SentenceSpeaker
+from .nodes.gui_io import GUIChat, PromptRouter, SentenceSpeaker
 from .nodes.chat_history import ChatHistory
 from .nodes.inference import Inference, ChunkContents
+from .nodes.context import ContextWindow
+from .services.summarizer import HistorySummarizer
+from .services.retrieval import HistoryRetriever
+from .services.interpreters import SubinterpreterPool
+from .services import offload, tts
+from .services.scheduler import RequestScheduler
+from .services.sessions import SessionRouter, SessionManager, GenerationLane
+from .services.sharding import ShardRouter
 
 # Set up logging
 logging.basicConfig(level=os.environ.get("FLOWNO_LOG_LEVEL", "WARNING"))
 logger = logging.getLogger(__name__)
 
-# Initialize the NodeJS bridge JSON encoder
-nodejs_callback_bridge.set_json_encoder(NodeJSMessageJSONEncoder())
+# Initialize the NodeJS bridge JSON encoder (orjson, if installed, unless FLOWNO_FAST_JSON=0)
+nodejs_callback_bridge.set_json_encoder(NodeJSMessageJSONEncoder(fast=os.environ.get("FLOWNO_FAST_JSON", "1") != "0"))
 
 # ---------------------------------------------------------------------
 # Helper Functions
@@ -58,9 +67,6 @@ class ChatApp:
         """
         Initialize the ChatApp with a flow graph and message handling.
         """
-        # Create the prompt queue for receiving messages from the frontend
-        self.prompt_queue = AsyncQueue[Message]()
-        
         # Initialize application state
         self.app_state = AppState(
             current_chat_id=None,
@@ -69,44 +75,172 @@ class ChatApp:
                 url=os.environ.get("LLM_API_URL", "http://localhost:5000/v1/chat/completions"),
                 token=os.environ.get("GROQ_API_KEY", ""),
                 model=os.environ.get("LLM_MODEL", "llama-3.3-70b-versatile"),
-            )
+            ),
+            context_config=ContextConfig(
+                summary_model=os.environ.get("LLM_SUMMARY_MODEL") or None,
+                retrieval_top_k=int(os.environ.get("FLOWNO_RETRIEVAL_TOP_K", "0")),
+            ),
+            retry_config=RetryConfig(
+                max_retries=int(os.environ.get("FLOWNO_MAX_RETRIES", "3")),
+            ),
+            deadline_config=DeadlineConfig(
+                first_token_timeout=float(os.environ.get("FLOWNO_FIRST_TOKEN_TIMEOUT", "30")) or None,
+                chunk_timeout=float(os.environ.get("FLOWNO_CHUNK_TIMEOUT", "20")) or None,
+                fallback_url=os.environ.get("LLM_FALLBACK_API_URL") or None,
+            ),
+            rate_limit_config=RateLimitConfig(
+                requests_per_minute=int(os.environ.get("FLOWNO_REQUESTS_PER_MINUTE", "0")) or None,
+                tokens_per_minute=int(os.environ.get("FLOWNO_TOKENS_PER_MINUTE", "0")) or None,
+            ),
+            session_config=SessionConfig(
+                max_concurrent_generations=int(os.environ.get("FLOWNO_MAX_CONCURRENT_GENERATIONS", "4")),
+                max_live_sessions=int(os.environ.get("FLOWNO_MAX_LIVE_SESSIONS", "16")),
+                idle_timeout=float(os.environ.get("FLOWNO_SESSION_IDLE_TIMEOUT", "600")) or None,
+                shards=int(os.environ.get("FLOWNO_SHARDS", "0")),
+            ),
+            offload_config=OffloadConfig(
+                thread_workers=int(os.environ.get("FLOWNO_OFFLOAD_THREADS", "4")),
+                process_workers=int(os.environ.get("FLOWNO_OFFLOAD_PROCESSES", "2")),
+                interpreters=int(os.environ.get("FLOWNO_INTERPRETERS", "2")),
+            ),
+            speech_config=SpeechConfig(
+                enabled=os.environ.get("FLOWNO_SPEECH", "1") != "0",
+                max_in_flight=int(os.environ.get("FLOWNO_SPEECH_IN_FLIGHT", "2")),
+                ack_timeout=float(os.environ.get("FLOWNO_SPEECH_ACK_TIMEOUT", "30")) or None,
+                engine=os.environ.get("FLOWNO_TTS_ENGINE") or None,
+                voice=os.environ.get("FLOWNO_TTS_VOICE", "default"),
+                lookahead=int(os.environ.get("FLOWNO_TTS_LOOKAHEAD", "2")),
+                batch_chars=int(os.environ.get("FLOWNO_SPEECH_BATCH_CHARS", "0")),
+                audio_transport=os.environ.get("FLOWNO_TTS_AUDIO_TRANSPORT", "file"),
+                cache_memory_bytes=int(float(os.environ.get("FLOWNO_TTS_CACHE_MEMORY_MB", "8")) * 1024 * 1024),
+                cache_dir=os.environ.get("FLOWNO_TTS_CACHE_DIR") or None,
+                cache_disk_bytes=int(float(os.environ.get("FLOWNO_TTS_CACHE_DISK_MB", "256")) * 1024 * 1024),
+            ),
+            streaming_config=StreamingConfig(
+                coalesce=os.environ.get("FLOWNO_COALESCE_CHUNKS", "0") != "0",
+                min_interval=float(os.environ.get("FLOWNO_CHUNK_MIN_INTERVAL_MS", "16")) / 1000,
+                max_interval=float(os.environ.get("FLOWNO_CHUNK_MAX_INTERVAL_MS", "100")) / 1000,
+                max_bytes=int(os.environ.get("FLOWNO_CHUNK_FLUSH_BYTES", "2048")),
+            ),
         )
+
+        # Pools that @cpu_bound functions run on
+        offload.configure(self.app_state.offload_config)
+        tts.configure(self.app_state.speech_config)
+
+        # Admits every LLM request by priority and keeps them under the provider's rate limits
+        self.scheduler = RequestScheduler(self.app_state.rate_limit_config)
+
+        # Background summarizer that keeps long histories compact
+        self.summarizer = HistorySummarizer(
+            self.app_state.api_config, self.app_state.context_config, scheduler=self.scheduler
+        )
+
+        # Subinterpreters (each with its own GIL) for CPU-bound work; 0 disables
+        interpreters = self.app_state.offload_config.interpreters
+        self.interpreters = SubinterpreterPool(interpreters) if interpreters > 0 else None
+
+        # Optional BM25 retrieval of relevant older turns
+        self.retriever = HistoryRetriever(self.app_state, pool=self.interpreters)
+
+        # Builds each chat's working state on demand and tears down idle ones
+        self.sessions = SessionManager(
+            self.app_state.session_config, self.app_state.active_sessions, self.retriever
+        )
+
+        # Hands prompts to one of the generation lanes, so chats generate concurrently
+        self.router = SessionRouter(self.app_state.session_config.max_concurrent_generations, self.sessions)
         
         # Create the Flowno graph
         with FlowHDL() as f:
-            # GUIChat receives prompts from queue and sends chunks to the frontend
-            f.gui_chat = GUIChat(self.prompt_queue, f.inference)
-            
-            # Inference consumes message history and produces stream of chunks
-            f.inference = Inference(f.history, self.app_state.api_config)
-            
-            # ChunkContents extracts content strings from chunks
-            f.chunk_contents = ChunkContents(f.inference)
-            
-            # ChatHistory receives prompts and accumulated response content
-            f.history = ChatHistory(f.gui_chat, f.chunk_contents)
-
-            f.sentences = ChunkSentences(f.inference)
-            f.tts = SentenceSpeaker(f.sentences)
-            f.tts.start_speak_task(f)
+            # Every lane's GUIChat depends on this node, so the flow starts all lanes
+            f.router = PromptRouter(self.router)
+
+            for lane in self.router.lanes:
+                self._build_lane(f, lane)
+
+            # Tears down idle sessions and reports their memory
+            f.create_task(self.router.reap_idle())
 
         # Store the flow graph
         self.f = f
         
         # Create the app context that will be passed to message handlers
         self.app_context = AppContext(
-            prompt_queue=self.prompt_queue,
+            router=self.router,
             app_state=self.app_state,
-            flow_hdl=self.f
+            flow_hdl=self.f,
+            scheduler=self.scheduler,
+            sentence_speaker=getattr(self.f, "tts_0"),
         )
         
+        # In sharded mode, chats generate in worker processes and this graph stays idle
+        listener = self.handle_message
+        self.shard_router: ShardRouter | None = None
+        if self.app_state.session_config.shards > 0:
+            self.shard_router = ShardRouter(
+                self.app_state, self.app_state.session_config.shards, self.handle_message
+            )
+            self.f.create_task(self.shard_router.start())
+            listener = self.shard_router.dispatch
+
+        # Handles control messages ahead of queued bulk messages
+        self.dispatcher = PriorityDispatcher(listener)
+
         # Register the message listener with the NodeJS bridge
         nodejs_callback_bridge.register_message_listener(
-            handle_task(self.f, self.handle_message)
+            handle_task(self.f, self.dispatcher.dispatch)
         )
         
         logger.info("ChatApp initialized successfully")
 
+    def _build_lane(self, f: FlowHDL, lane: GenerationLane):
+        """
+        Add the nodes of one generation lane to the graph.
+
+        The nodes of lane i are named like the single-lane graph with an
+        "_i" suffix (f.gui_chat_0, f.inference_0, ...).
+        """
+        def name(node: str) -> str:
+            return f"{node}_{lane.index}"
+
+        # GUIChat receives the lane's prompts from the router and sends chunks to the frontend
+        setattr(f, name("gui_chat"), GUIChat(
+            f.router, lane, getattr(f, name("inference")), self.app_state.streaming_config
+        ))
+
+        # Inference consumes the context window and produces stream of chunks
+        setattr(f, name("inference"), Inference(
+            getattr(f, name("context")),
+            self.app_state.api_config,
+            lane.control,
+            self.app_state.retry_config,
+            self.app_state.deadline_config,
+            self.scheduler,
+        ))
+
+        # ChunkContents extracts content strings from chunks
+        setattr(f, name("chunk_contents"), ChunkContents(getattr(f, name("inference"))))
+
+        # ChatHistory receives prompts and accumulated response content
+        setattr(f, name("history"), ChatHistory(
+            getattr(f, name("gui_chat")), getattr(f, name("chunk_contents")), lane
+        ))
+
+        # ContextWindow swaps the oldest turns for a cached summary
+        # and, if enabled, the most relevant older turns
+        setattr(f, name("context"), ContextWindow(
+            getattr(f, name("history")), self.summarizer, self.retriever, lane
+        ))
+
+        # The TTS branch segments sentences only while speech is enabled
+        setattr(f, name("sentences"), ChunkSentences(
+            getattr(f, name("inference")), self.app_state.speech_config
+        ))
+        setattr(f, name("tts"), SentenceSpeaker(
+            getattr(f, name("sentences")), lane, self.app_state.speech_config
+        ))
+
     def run(self):
         """
         Run the Flowno graph until completion.
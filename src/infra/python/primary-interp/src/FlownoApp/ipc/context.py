@@ -3,8 +3,11 @@ Context object for IPC message handlers.
 """
 from dataclasses import dataclass
 
-from flowno import FlowHDL, AsyncQueue
-from ..messages.domain_types import Message, AppState
+from flowno import FlowHDL
+from ..messages.domain_types import AppState
+from ..nodes.gui_io import SentenceSpeaker
+from ..services.scheduler import RequestScheduler
+from ..services.sessions import SessionRouter
 
 import logging
 
@@ -17,6 +20,8 @@ class AppContext:
     
     Contains references to shared resources that handlers need to access.
     """
-    prompt_queue: AsyncQueue[Message]
+    router: SessionRouter
     app_state: AppState
-    flow_hdl: FlowHDL
\ No newline at end of file
+    flow_hdl: FlowHDL
+    scheduler: RequestScheduler
+    sentence_speaker: SentenceSpeaker
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Priority lanes for messages from the frontend.
+
+Control messages (stopping a generation, acknowledging a sentence, changing
+settings) are small and latency-sensitive. Bulk messages (prompts, loading
+a chat with a long history) may take a while to handle. Control messages
+are handled as soon as they arrive. Bulk messages wait in a lane that is
+handled one message at a time, in arrival order, so a burst of them cannot
+crowd the event loop ahead of a stop or an acknowledgement.
+
+The frontend may send several messages in one `batch` envelope
+(`{"type": "batch", "messages": [...]}`), for example to sync its state at
+startup with one bridge crossing. The messages of a batch are handled in
+order: at once if they are all control messages, otherwise as one item of
+the bulk lane.
+"""
+from collections.abc import Awaitable, Callable
+import logging
+import time
+from typing import Any
+
+from flowno import spawn
+
+from ..services.metrics import metrics
+from ..utils.bounded_queue import BoundedQueue
+
+logger = logging.getLogger(__name__)
+
+# Messages handled ahead of the bulk lane
+CONTROL_MESSAGES = frozenset({
+    "stop-generation", "sentence-done", "set-api-config", "get-api-config", "set-speech", "get-metrics",
+})
+# Bulk messages queued before their dispatch waits
+BULK_LANE_SIZE = 64
+
+
+class PriorityDispatcher:
+    """
+    Hands each message from the frontend to `handle`, control messages first.
+
+    Batches are unpacked here rather than in `handle`, so that in sharded
+    mode each of their messages is routed on its own. Their sizes are
+    recorded in the `<name>.batch_size` summary.
+
+    The bulk lane's handler task starts with the first queued message and
+    stops once the lane is empty. The time from `dispatch()` until a
+    message's handler returned is recorded per lane in the
+    `<name>.<lane>.latency_seconds` summaries; the bulk lane's depth is
+    the `queues.<name>.bulk.depth` gauge.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[dict[str, Any]], Awaitable[None]],
+        control_messages: frozenset[str] = CONTROL_MESSAGES,
+        name: str = "inbound",
+    ):
+        """
+        Args:
+            handle: Handles one message
+            control_messages: Types of the messages handled ahead of the others
+            name: Name of the metrics
+        """
+        self.handle = handle
+        self.control_messages = control_messages
+        self.name = name
+        # The messages of each bulk item, with the time it was dispatched
+        self.bulk: BoundedQueue[tuple[list[dict[str, Any]], float]] = BoundedQueue(
+            BULK_LANE_SIZE, "block", f"{name}.bulk"
+        )
+        self.draining = False
+
+    async def dispatch(self, message: dict[str, Any]) -> None:
+        """Handle a control message or batch of them now, or queue a bulk message or batch."""
+        received = time.perf_counter()
+        messages = self._unpack(message)
+        if all(m.get("type") in self.control_messages for m in messages):
+            await self._handle(messages, "control", received)
+            return
+        await self.bulk.put((messages, received))
+        if not self.draining:
+            self.draining = True
+            await spawn(self._drain())
+
+    def _unpack(self, message: dict[str, Any]) -> list[dict[str, Any]]:
+        if message.get("type") != "batch":
+            return [message]
+        messages = message.get("messages")
+        if not isinstance(messages, list):
+            logger.error("Dropping batch without a list of messages")
+            return []
+        metrics.observe(f"{self.name}.batch_size", len(messages))
+        malformed = [m for m in messages if not isinstance(m, dict)]
+        if malformed:
+            logger.error(f"Dropping {len(malformed)} malformed messages of a batch")
+        return [m for m in messages if isinstance(m, dict)]
+
+    async def _handle(self, messages: list[dict[str, Any]], lane: str, received: float) -> None:
+        for message in messages:
+            try:
+                await self.handle(message)
+            except Exception as e:
+                logger.error(f"Unhandled error handling {message.get('type')}: {e}")
+        metrics.observe(f"{self.name}.{lane}.latency_seconds", time.perf_counter() - received)
+
+    async def _drain(self) -> None:
+        try:
+            while self.bulk.items:
+                messages, received = await self.bulk.get()
+                await self._handle(messages, "bulk", received)
+        finally:
+            self.draining = False
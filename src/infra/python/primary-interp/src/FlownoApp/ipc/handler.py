@@ -5,14 +5,36 @@ import logging
 from typing import Any
 
 from .context import AppContext
-from .registry import MESSAGE_HANDLERS
+from .registry import MESSAGE_HANDLERS, MESSAGE_SCHEMAS
+from ..messages.decoders import DecodeError, decode
 from ..messages.ipc_schema import ErrorResponse, ErrorPayload
+from ..services.metrics import metrics
+from ..services.outbox import outbox
 
 logger = logging.getLogger(__name__)
 
+async def send_error(text: str, message_type: str | None) -> None:
+    """Send an error response for a message back to the frontend."""
+    try:
+        error_response = ErrorResponse(
+            type="error",
+            payload=ErrorPayload(
+                message=text,
+                originalMessageType=message_type
+            )
+        )
+        await outbox.send(error_response)
+    except Exception as send_err:
+        logger.error(f"Failed to send error response: {str(send_err)}")
+
 async def handle_message(message: dict[str, object], context: AppContext) -> None:
     """
     Central handler for all IPC messages from the frontend.
+
+    The message is decoded as its type's schema class (`MESSAGE_SCHEMAS`)
+    before the handler gets it. Messages that do not match their schema are
+    answered with an error naming the field at fault and counted as
+    `ipc.<type>.invalid`.
     
     Args:
         message: The raw message dictionary from the frontend
@@ -31,37 +53,20 @@ async def handle_message(message: dict[str, object], context: AppContext) -> Non
     
     if handler:
         try:
-            # Call the handler with the message and context
-            await handler(message, context)
+            request = decode(MESSAGE_SCHEMAS[message_type], message)
+        except DecodeError as e:
+            logger.error(f"Invalid {message_type} message: {e}")
+            metrics.increment(f"ipc.{message_type}.invalid")
+            await send_error(f"Invalid {message_type} message: {e}", message_type)
+            return
+        try:
+            # Call the handler with the decoded message and context
+            await handler(request, context)
         except Exception as e:
             logger.error(f"Error handling message type '{message_type}': {str(e)}")
-            try:
-                import nodejs_callback_bridge
-                
-                # Send error response back to frontend
-                error_response = ErrorResponse(
-                    type="error",
-                    payload=ErrorPayload(
-                        message=f"Error processing request: {str(e)}",
-                        originalMessageType=message_type
-                    )
-                )
-                nodejs_callback_bridge.send_message(error_response)
-            except Exception as send_err:
-                logger.error(f"Failed to send error response: {str(send_err)}")
+            # Send error response back to frontend
+            await send_error(f"Error processing request: {str(e)}", message_type)
     else:
         logger.warning(f"No handler registered for message type: {message_type}")
-        try:
-            import nodejs_callback_bridge
-            
-            # Send error response for unknown message type
-            error_response = ErrorResponse(
-                type="error",
-                payload=ErrorPayload(
-                    message=f"Unknown message type: {message_type}",
-                    originalMessageType=message_type
-                )
-            )
-            nodejs_callback_bridge.send_message(error_response)
-        except Exception as send_err:
-            logger.error(f"Failed to send error response: {str(send_err)}")
\ No newline at end of file
+        # Send error response for unknown message type
+        await send_error(f"Unknown message type: {message_type}", message_type)
\ No newline at end of file
@@ -2,7 +2,7 @@
 IPC message handlers for FlownoApp.
 """
 # Re-export all handler functions
-from .prompt_handlers import handle_new_prompt
+from .prompt_handlers import handle_new_prompt, handle_stop_generation
 from .chat_management_handlers import (
     handle_load_chat, 
     handle_create_new_chat,
@@ -12,4 +12,5 @@ from .chat_management_handlers import (
 from .config_handlers import (
     handle_get_api_config,
     handle_set_api_config
-)
\ No newline at end of file
+)
+from .metrics_handlers import handle_get_metrics
\ No newline at end of file
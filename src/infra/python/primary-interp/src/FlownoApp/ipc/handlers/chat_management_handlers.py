@@ -4,31 +4,42 @@ Handlers for chat management IPC messages.
 import logging
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List
-
-import nodejs_callback_bridge
+from typing import Dict, List
 
 from ...messages.domain_types import Message, ChatSession
-from ...messages.ipc_schema import ChatListResponse, ChatListPayload, ChatSummary, AllChatsDeletedResponse, ChatLoadedResponse, ChatLoadedPayload
+from ...messages.ipc_schema import (
+    ChatListResponse, ChatListPayload, ChatSummary, AllChatsDeletedResponse, ChatLoadedResponse, ChatLoadedPayload,
+    LoadChatRequest, CreateNewChatRequest, DeleteMessageRequest, EditMessageRequest, GetChatListRequest, DeleteAllChatsRequest,
+    ErrorResponse, ErrorPayload
+)
+from ...services.outbox import outbox
 from ..context import AppContext  # Import from context.py instead of handler.py
 
 logger = logging.getLogger(__name__)
 
-async def handle_load_chat(message: dict[str, Any], context: AppContext) -> None:
+async def handle_load_chat(message: LoadChatRequest, context: AppContext) -> None:
     """
     Handle 'load-chat' messages from the frontend.
+
+    An empty chat ID is answered with an error.
     
     Args:
-        message: The raw message dictionary containing the chat ID to load
+        message: The decoded message containing the chat ID to load
         context: Application context
     """
     try:
-        # Extract chat ID from message
-        chat_id = message.get("payload", {}).get("chatId")
+        chat_id = message.payload.chatId
         if not chat_id:
             logger.error("Missing chat ID in load-chat request")
+            await outbox.send(ErrorResponse(
+                type="error",
+                payload=ErrorPayload(message="Missing chat ID in load-chat request", originalMessageType="load-chat"),
+            ))
             return
             
+        # Save the live history of the chat, if any, so it is sent in full
+        context.router.sessions.sync(chat_id)
+
         # Placeholder for retrieving chat from storage
         # In a real implementation, we would load the chat from a database
         # For now, we'll create a mock session if it doesn't exist
@@ -52,18 +63,18 @@ async def handle_load_chat(message: dict[str, Any], context: AppContext) -> None
                 messages=session.messages
             )
         )
-        nodejs_callback_bridge.send_message(response)
+        await outbox.send(response)
         logger.info(f"Loaded chat: {chat_id}")
         
     except Exception as e:
         logger.error(f"Error handling load-chat: {str(e)}")
 
-async def handle_create_new_chat(message: dict[str, Any], context: AppContext) -> None:
+async def handle_create_new_chat(message: CreateNewChatRequest, context: AppContext) -> None:
     """
     Handle 'create-new-chat' messages from the frontend.
     
     Args:
-        message: The raw message dictionary
+        message: The decoded message
         context: Application context
     """
     try:
@@ -91,7 +102,7 @@ async def handle_create_new_chat(message: dict[str, Any], context: AppContext) -
                 messages=[]
             )
         )
-        nodejs_callback_bridge.send_message(response)
+        await outbox.send(response)
         
         # Also refresh the chat list
         await handle_get_chat_list(message, context)
@@ -101,42 +112,46 @@ async def handle_create_new_chat(message: dict[str, Any], context: AppContext) -
     except Exception as e:
         logger.error(f"Error handling create-new-chat: {str(e)}")
 
-async def handle_delete_message(message: dict[str, Any], context: AppContext) -> None:
+async def handle_delete_message(message: DeleteMessageRequest, context: AppContext) -> None:
     """
     Handle 'delete-message' messages from the frontend.
     
     Args:
-        message: The raw message dictionary containing the message ID to delete
+        message: The decoded message containing the message ID to delete
         context: Application context
     """
     # This is a stub implementation that will be expanded later
     logger.info("Delete message request received (stub implementation)")
+    # Indexes built over the chat's history only notice appended messages
+    context.router.sessions.history_changed(context.app_state.current_chat_id)
     # Implementation will involve:
     # 1. Extract message ID from payload
     # 2. Find and remove the message from current chat
     # 3. Send message-deleted confirmation to frontend
 
-async def handle_edit_message(message: dict[str, Any], context: AppContext) -> None:
+async def handle_edit_message(message: EditMessageRequest, context: AppContext) -> None:
     """
     Handle 'edit-message' messages from the frontend.
     
     Args:
-        message: The raw message dictionary containing the message ID and new content
+        message: The decoded message containing the message ID and new content
         context: Application context
     """
     # This is a stub implementation that will be expanded later
     logger.info("Edit message request received (stub implementation)")
+    # Indexes built over the chat's history only notice appended messages
+    context.router.sessions.history_changed(context.app_state.current_chat_id)
     # Implementation will involve:
     # 1. Extract message ID and new content from payload
     # 2. Find and update the message in current chat
     # 3. Send message-updated confirmation to frontend
 
-async def handle_get_chat_list(message: dict[str, Any], context: AppContext) -> None:
+async def handle_get_chat_list(message: GetChatListRequest | CreateNewChatRequest, context: AppContext) -> None:
     """
     Handle 'get-chat-list' messages from the frontend.
     
     Args:
-        message: The raw message dictionary
+        message: The decoded message
         context: Application context
     """
     try:
@@ -163,23 +178,24 @@ async def handle_get_chat_list(message: dict[str, Any], context: AppContext) ->
         )
         
         # Send the response
-        nodejs_callback_bridge.send_message(response)
+        await outbox.send(response)
         logger.info(f"Sent chat list with {len(chat_summaries)} chats")
         
     except Exception as e:
         logger.error(f"Error handling get-chat-list: {str(e)}")
 
-async def handle_delete_all_chats(message: dict[str, Any], context: AppContext) -> None:
+async def handle_delete_all_chats(message: DeleteAllChatsRequest, context: AppContext) -> None:
     """
     Handle 'delete-all-chats' messages from the frontend.
     
     Args:
-        message: The raw message dictionary
+        message: The decoded message
         context: Application context
     """
     try:
-        # Clear all active sessions
-        context.app_state.active_sessions = {}
+        # Clear all active sessions; the dict is shared with the session manager
+        context.app_state.active_sessions.clear()
+        context.router.sessions.clear(context.router.in_use)
         
         # Clear current chat ID
         context.app_state.current_chat_id = None
@@ -189,7 +205,7 @@ async def handle_delete_all_chats(message: dict[str, Any], context: AppContext)
             type="all-chats-deleted",
             payload=None
         )
-        nodejs_callback_bridge.send_message(response)
+        await outbox.send(response)
         
         logger.info("Deleted all chats")
         
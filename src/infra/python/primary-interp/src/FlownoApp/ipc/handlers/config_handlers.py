@@ -2,22 +2,22 @@
 Handlers for configuration-related IPC messages.
 """
 import logging
-import nodejs_callback_bridge
 
 from ...messages.domain_types import ApiConfig
-from ...messages.ipc_schema import ApiConfigResponse, ApiConfigPayload
+from ...messages.ipc_schema import ApiConfigResponse, ApiConfigPayload, GetApiConfigRequest, SetApiConfigRequest
+from ...services.outbox import outbox
 from ..context import AppContext  # Import from context.py instead of handler.py
 
 logger = logging.getLogger(__name__)
 
-async def handle_get_api_config(message: dict[str, object], context: AppContext) -> None:
+async def handle_get_api_config(message: GetApiConfigRequest | SetApiConfigRequest, context: AppContext) -> None:
     """
     Handle 'get-api-config' messages from the frontend.
     
     Sends the current API configuration to the frontend.
     
     Args:
-        message: The raw message dictionary
+        message: The decoded message
         context: Application context containing the app state
     """
     try:
@@ -37,56 +37,48 @@ async def handle_get_api_config(message: dict[str, object], context: AppContext)
             type="api-config",
             payload=payload
         )
-        nodejs_callback_bridge.send_message(response)
+        await outbox.send(response)
         logger.info("Sent API config to frontend")
         
     except Exception as e:
         logger.error(f"Error handling get-api-config: {e}")
         raise
 
-async def handle_set_api_config(message: dict[str, object], context: AppContext) -> None:
+async def handle_set_api_config(message: SetApiConfigRequest, context: AppContext) -> None:
     """
     Handle 'set-api-config' messages from the frontend.
     
     Updates the API configuration with the values provided.
     
     Args:
-        message: The raw message dictionary containing the new config values
+        message: The decoded message containing the new config values
         context: Application context containing the app state
     """
     try:
-        # Extract the config details
-        if "payload" not in message:
-            raise ValueError("Missing 'payload' in set-api-config message")
-            
-        payload = message["payload"]
-        if not isinstance(payload, dict):
-            raise ValueError("Payload must be a dictionary")
+        payload = message.payload
+        api_config = context.app_state.api_config
         
         # Update only the fields that are provided
-        if payload.get("url") is not None:
-            context.app_state.api_config.url = payload["url"]
+        if payload.url is not None:
+            api_config.url = payload.url
             
-        if payload.get("token") is not None:
-            context.app_state.api_config.token = payload["token"]
+        if payload.token is not None:
+            api_config.token = payload.token
             
-        if payload.get("model") is not None:
-            context.app_state.api_config.model = payload["model"]
+        if payload.model is not None:
+            api_config.model = payload.model
             
-        if payload.get("temperature") is not None:
-            context.app_state.api_config.temperature = float(payload["temperature"])
+        if payload.temperature is not None:
+            api_config.temperature = payload.temperature
             
-        if payload.get("max_tokens") is not None:
-            context.app_state.api_config.max_tokens = int(payload["max_tokens"]) if payload["max_tokens"] else None
+        if payload.max_tokens is not None:
+            api_config.max_tokens = payload.max_tokens or None
             
         logger.info("Updated API configuration")
         
         # Confirm the update by sending the current config back (excluding token)
         await handle_get_api_config(message, context)
         
-    except ValueError as e:
-        logger.error(f"Invalid value in set-api-config: {e}")
-        raise
     except Exception as e:
         logger.error(f"Error handling set-api-config: {e}")
         raise
\ No newline at end of file
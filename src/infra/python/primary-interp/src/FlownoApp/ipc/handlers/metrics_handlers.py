@@ -0,0 +1,39 @@
+"""
+Handlers for metrics-related IPC messages.
+"""
+import logging
+
+from ...messages.ipc_schema import GetMetricsRequest, MetricsResponse, MetricsPayload
+from ...services.metrics import metrics
+from ...services.outbox import outbox
+from ..context import AppContext
+
+logger = logging.getLogger(__name__)
+
+async def handle_get_metrics(message: GetMetricsRequest, context: AppContext) -> None:
+    """
+    Handle 'get-metrics' messages from the frontend.
+    
+    Sends a snapshot of the counters, gauges and timing summaries recorded
+    by the nodes and services.
+    
+    Args:
+        message: The decoded message (unused)
+        context: Application context (unused)
+    """
+    try:
+        snapshot = metrics.snapshot()
+        response = MetricsResponse(
+            type="metrics",
+            payload=MetricsPayload(
+                counters=snapshot["counters"],
+                gauges=snapshot["gauges"],
+                summaries=snapshot["summaries"],
+            ),
+        )
+        await outbox.send(response)
+        logger.debug("Sent metrics to frontend")
+        
+    except Exception as e:
+        logger.error(f"Error handling get-metrics: {e}")
+        raise
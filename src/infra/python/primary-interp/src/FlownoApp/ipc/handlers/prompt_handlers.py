@@ -2,61 +2,79 @@
 Handlers for prompt-related IPC messages.
 """
 import logging
-from typing import Any
 import time
 
 from ...messages.domain_types import Message
+from ...messages.ipc_schema import GenerationStoppedPayload, GenerationStoppedResponse, NewPromptMessage, StopGenerationRequest
+from ...services.outbox import outbox
 from ..context import AppContext  # Import from context.py instead of handler.py
 
 logger = logging.getLogger(__name__)
 
-async def handle_new_prompt(message: dict[str, object], context: AppContext) -> None:
+async def handle_new_prompt(message: NewPromptMessage, context: AppContext) -> None:
     """
     Handle 'new-prompt' messages from the frontend.
     
-    This creates a Message object from the payload and adds it to the prompt queue.
+    This creates a Message object from the payload and hands it to the
+    session router, which answers it in the prompt's chat (the current chat
+    if the payload has no chatId).
     
     Args:
-        message: The raw message dictionary containing the new prompt
-        context: Application context containing the prompt queue
+        message: The decoded new-prompt message
+        context: Application context containing the session router
     """
     try:
-        # Extract the prompt details from the message
-        if "content" not in message:
-            logger.error("Missing 'content' in new-prompt message")
-            raise ValueError("Invalid new-prompt message format: missing 'content'")
-            
-        content = message["content"]
-        if not isinstance(content, dict):
-            logger.error(f"Invalid content type in new-prompt: {type(content)}")
-            raise ValueError("Prompt content must be a dictionary")
-        msg_id = content.get("id")
-        msg_role = content.get("role")
-        msg_content = content.get("content")
-        
-        # Validate required fields
-        if not msg_id:
-            msg_id = f"user-{int(time.time() * 1000)}"  # Generate ID if missing
-            
-        if not msg_role or msg_role != "user":
-            logger.warning(f"Invalid role in new-prompt: {msg_role}, forcing 'user'")
-            msg_role = "user"
-            
-        if not isinstance(msg_content, str):
-            logger.error(f"Invalid content type in new-prompt: {type(msg_content)}")
-            raise ValueError("Prompt content must be a string")
+        prompt = message.content
+        msg_id = prompt.id or f"user-{int(time.time() * 1000)}"  # Generate ID if empty
+        chat_id = prompt.chatId or context.app_state.current_chat_id
+        
+        if prompt.role != "user":
+            logger.warning(f"Invalid role in new-prompt: {prompt.role}, forcing 'user'")
         
         # Create a Message object
-        message_obj = Message(msg_id, msg_role, msg_content)
+        message_obj = Message(msg_id, "user", prompt.content)
         logger.info(f"Created new prompt with ID: {message_obj.id}")
         
-        # Put the message in the prompt queue for processing
-        await context.prompt_queue.put(message_obj)
-        logger.info(f"Enqueued prompt: {message_obj.id}")
+        # Hold back background LLM work until this turn's request is admitted
+        context.scheduler.expect_foreground()
+        
+        # Queue the message for the next free generation lane
+        await context.router.submit(chat_id, message_obj)
+        logger.info(f"Enqueued prompt: {message_obj.id} (chat {chat_id})")
         
-    except KeyError as e:
-        logger.error(f"Missing key in prompt message: {e}")
-        raise ValueError(f"Invalid message format: missing {e}")
     except Exception as e:
         logger.error(f"Error handling new-prompt: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def handle_stop_generation(message: StopGenerationRequest, context: AppContext) -> None:
+    """
+    Handle 'stop-generation' messages from the frontend.
+    
+    Aborts the in-flight API request of the chat given in the payload (the
+    current chat by default), drops the chat's sentences waiting to be spoken
+    and confirms with a 'generation-stopped' message naming the chat. The
+    partial answer is kept in the chat history. Generations of other chats
+    keep running.
+    
+    Args:
+        message: The decoded stop-generation message
+        context: Application context containing the session router
+    """
+    try:
+        chat_id = (message.payload and message.payload.chatId) or context.app_state.current_chat_id
+        was_active = False
+        for lane in context.router.lanes_for(chat_id):
+            was_active = await lane.control.request_stop() or was_active
+        
+        # Drop queued and unacknowledged sentences of the stopped response
+        await context.sentence_speaker.cancel_pending(chat_id)
+        
+        await outbox.send(GenerationStoppedResponse(
+            type="generation-stopped",
+            payload=GenerationStoppedPayload(chatId=chat_id),
+        ))
+        logger.info(f"Stopped generation of chat {chat_id} (active={was_active})")
+        
+    except Exception as e:
+        logger.error(f"Error handling stop-generation: {e}")
+        raise
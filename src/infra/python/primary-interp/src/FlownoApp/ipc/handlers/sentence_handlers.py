@@ -4,32 +4,55 @@ Handlers for sentence-related messages from the frontend.
 import logging
 
 from ...ipc.context import AppContext
-from ...messages.ipc_schema import SentenceDoneRequest
+from ...messages.ipc_schema import AckPayload, AckResponse, SentenceDoneRequest, SetSpeechRequest
+from ...services.outbox import outbox
 
 logger = logging.getLogger(__name__)
 
-async def handle_sentence_done(message: dict, context: AppContext) -> None:
+async def handle_sentence_done(message: SentenceDoneRequest, context: AppContext) -> None:
     """
     Handle notification that a sentence has finished playing on the frontend.
     
     Args:
-        message: The raw message dictionary from the frontend
+        message: The decoded sentence-done message
         context: Application context containing queues and state
     """
     try:
-        # Extract the sentence ID from the payload
-        sentence_id = message.get("payload", {}).get("id")
+        sentence_id = message.payload.id
         
         if not sentence_id:
             logger.error("Received sentence-done without an ID")
             return
             
-        # Get the SentenceSpeaker node and call its handler
-        sentence_speaker = context.flow_hdl.tts
-        if sentence_speaker:
-            await sentence_speaker.handle_sentence_done(sentence_id)
-        else:
-            logger.error("SentenceSpeaker node not available in FlowHDL context")
+        # Let the SentenceSpeaker node handle the acknowledgement
+        await context.sentence_speaker.handle_sentence_done(sentence_id)
             
     except Exception as e:
-        logger.error(f"Error handling sentence-done message: {e}")
\ No newline at end of file
+        logger.error(f"Error handling sentence-done message: {e}")
+
+async def handle_set_speech(message: SetSpeechRequest, context: AppContext) -> None:
+    """
+    Turn speech on or off.
+
+    Responses that start afterwards are only split into sentences (loading
+    spaCy on first use) while speech is on. Turning it off also drops the
+    sentences still waiting to be spoken.
+
+    Args:
+        message: The decoded set-speech message
+        context: Application context containing queues and state
+    """
+    try:
+        enabled = message.payload.enabled
+        context.app_state.speech_config.enabled = enabled
+        dropped = 0 if enabled else await context.sentence_speaker.cancel_all()
+        logger.info(f"Speech {'enabled' if enabled else 'disabled'} (dropped {dropped} sentences)")
+
+        await outbox.send(AckResponse(
+            type="ack",
+            payload=AckPayload(originalMessageType="set-speech", success=True),
+        ))
+
+    except Exception as e:
+        logger.error(f"Error handling set-speech message: {e}")
+        raise
@@ -16,9 +16,11 @@ from ..messages.ipc_schema import (
     GetChatListRequest, 
     GetApiConfigRequest, 
     SentenceDoneRequest,
-    DeleteAllChatsRequest
+    SetSpeechRequest,
+    DeleteAllChatsRequest,
+    GetMetricsRequest
 )
-from ..ipc.handlers.prompt_handlers import handle_new_prompt
+from ..ipc.handlers.prompt_handlers import handle_new_prompt, handle_stop_generation
 from ..ipc.handlers.chat_management_handlers import (
     handle_load_chat, 
     handle_create_new_chat,
@@ -31,15 +33,17 @@ from ..ipc.handlers.config_handlers import (
     handle_get_api_config,
     handle_set_api_config
 )
-from ..ipc.handlers.sentence_handlers import handle_sentence_done
+from ..ipc.handlers.sentence_handlers import handle_sentence_done, handle_set_speech
+from ..ipc.handlers.metrics_handlers import handle_get_metrics
 
-# Define the type for handler functions
-MessageHandlerType = Callable[[dict[str, Any], 'AppContext'], Awaitable[None]]
+# Define the type for handler functions; each gets its message decoded as its schema class
+MessageHandlerType = Callable[[Any, 'AppContext'], Awaitable[None]]
 
 # Registry mapping message types to their handler functions
 MESSAGE_HANDLERS: dict[str, MessageHandlerType] = {
     # Prompt handling
     "new-prompt": handle_new_prompt,
+    "stop-generation": handle_stop_generation,
     
     # Chat management
     "load-chat": handle_load_chat,
@@ -55,7 +59,25 @@ MESSAGE_HANDLERS: dict[str, MessageHandlerType] = {
     
     # TTS sentence playback
     "sentence-done": handle_sentence_done,
+    "set-speech": handle_set_speech,
     
-    # To be implemented in the future
-    # "stop-generation": handle_stop_generation,
+    # Diagnostics
+    "get-metrics": handle_get_metrics,
+}
+
+# Schema class each message type is decoded as before its handler gets it
+MESSAGE_SCHEMAS: dict[str, type] = {
+    "new-prompt": NewPromptMessage,
+    "stop-generation": StopGenerationRequest,
+    "load-chat": LoadChatRequest,
+    "create-new-chat": CreateNewChatRequest,
+    "delete-message": DeleteMessageRequest,
+    "edit-message": EditMessageRequest,
+    "get-chat-list": GetChatListRequest,
+    "delete-all-chats": DeleteAllChatsRequest,
+    "get-api-config": GetApiConfigRequest,
+    "set-api-config": SetApiConfigRequest,
+    "sentence-done": SentenceDoneRequest,
+    "set-speech": SetSpeechRequest,
+    "get-metrics": GetMetricsRequest,
 }
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Stand-in for nodejs_callback_bridge inside shard worker processes.
+
+A worker (FlownoApp/worker.py) installs this module as
+`nodejs_callback_bridge` before importing the app, so nodes and handlers
+talk to the primary interpreter's ShardRouter over a local socket instead of
+to Electron. Messages travel in both directions as JSON, one per line.
+"""
+from collections.abc import AsyncGenerator, Callable
+import json
+import logging
+import socket as _socket
+from typing import Any
+
+from flowno import SocketHandle
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the socket at a time
+READ_SIZE = 65536
+
+_encoder: json.JSONEncoder = json.JSONEncoder()
+_listener: Callable[[dict[str, Any]], None] | None = None
+_sock: _socket.socket | None = None
+
+
+def encode_line(message: object, encoder: json.JSONEncoder | None = None) -> bytes:
+    """Encode one message as a line of JSON."""
+    return ((encoder or _encoder).encode(message) + "\n").encode("utf-8")
+
+
+async def read_lines(handle: SocketHandle) -> AsyncGenerator[dict[str, Any], None]:
+    """
+    Yield the JSON messages received on a socket until the peer disconnects.
+
+    Lines that are not valid JSON objects are logged and skipped.
+    """
+    buffer = b""
+    while True:
+        data = await handle.recv(READ_SIZE)
+        if not data:
+            return
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                logger.error(f"Dropping malformed line: {e}")
+                continue
+            if isinstance(message, dict):
+                yield message
+
+
+# ---------------------------------------------------------------------
+# nodejs_callback_bridge API
+# ---------------------------------------------------------------------
+
+def set_json_encoder(encoder: json.JSONEncoder) -> None:
+    """Use encoder for every message sent to the primary interpreter."""
+    global _encoder
+    _encoder = encoder
+
+
+def register_message_listener(listener: Callable[[dict[str, Any]], None]) -> None:
+    """Call listener with every message received from the primary interpreter."""
+    global _listener
+    _listener = listener
+
+
+def send_message(message: object) -> None:
+    """Send a message to the primary interpreter, which forwards it to the frontend."""
+    if _sock is None:
+        logger.error("Shard bridge is not connected; dropping message")
+        return
+    _sock.sendall(encode_line(message))
+
+
+# ---------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------
+
+def connect(sock: _socket.socket) -> None:
+    """Use a connected socket to the primary interpreter."""
+    global _sock
+    _sock = sock
+
+
+async def pump_inbound() -> None:
+    """Hand every message from the primary interpreter to the registered listener."""
+    if _sock is None:
+        raise RuntimeError("Shard bridge is not connected")
+    async for message in read_lines(SocketHandle(_sock)):
+        if _listener is None:
+            logger.warning(f"No listener registered; dropping {message.get('type')}")
+            continue
+        _listener(message)
+    logger.info("Primary interpreter disconnected")
@@ -2,5 +2,5 @@
 Messages package for FlownoApp.
 """
 # Re-export commonly used message types
-from .domain_types import Message, Messages, ChatSession, ApiConfig, AppState
+from .domain_types import Message, Messages, ChatSession, ApiConfig, ContextConfig, AppState
 from .ipc_schema import ChunkedResponse, NewResponseMessage
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Decoders that turn messages from the frontend into `ipc_schema` dataclasses.
+
+The bridge hands each message to Python as a dict parsed from JSON. The
+first time a dataclass is decoded, a function is generated from its fields
+that checks such a dict against the field annotations and builds the
+dataclass, and it is cached. Handlers therefore get typed messages, and a
+malformed message is rejected with the path of the field at fault, like
+`payload.chatId: expected string, got null`. Keys the schema does not
+know are ignored.
+"""
+from collections.abc import Callable
+from dataclasses import MISSING, fields, is_dataclass
+from types import UnionType
+from typing import Any, Literal, TypeVar, Union, get_args, get_origin, get_type_hints
+
+T = TypeVar("T")
+
+# Names of the JSON types, for error messages
+JSON_TYPES: dict[type, str] = {
+    dict: "object", list: "array", str: "string", bool: "boolean", int: "number", float: "number", type(None): "null",
+}
+
+# Decoder of each dataclass decoded so far
+_decoders: dict[type, Callable[[Any], Any]] = {}
+# Marks a key missing from the message
+_missing = object()
+
+
+class DecodeError(ValueError):
+    """A message from the frontend that does not match its schema."""
+
+    def __init__(self, path: str, problem: str):
+        """
+        Args:
+            path: Field at fault, like `payload.chatId`; empty for the message itself
+            problem: What is wrong with it
+        """
+        super().__init__(f"{path}: {problem}" if path else problem)
+        self.path = path
+        self.problem = problem
+
+    def within(self, field: str) -> "DecodeError":
+        """The same error, with its path starting at the object holding `field`."""
+        if not self.path or self.path.startswith("["):
+            return DecodeError(f"{field}{self.path}", self.problem)
+        return DecodeError(f"{field}.{self.path}", self.problem)
+
+
+def _mismatch(path: str, expected: str, value: Any) -> DecodeError:
+    return DecodeError(path, f"expected {expected}, got {JSON_TYPES.get(type(value), type(value).__name__)}")
+
+
+def _decode_items(decode_item: Callable[[Any], Any], items: list[Any]) -> list[Any]:
+    result = []
+    for i, item in enumerate(items):
+        try:
+            result.append(decode_item(item))
+        except DecodeError as e:
+            raise e.within(f"[{i}]") from None
+    return result
+
+
+def _check_lines(value: str, annotation: Any, path: str, namespace: dict[str, Any]) -> list[str]:
+    """
+    Source of the statements that check `value` against `annotation`.
+
+    The statements convert `value` in place where needed: integers become
+    floats and nested objects become their dataclasses. Errors are raised
+    with the path `path`.
+    """
+    origin, args = get_origin(annotation), get_args(annotation)
+    if annotation is type(None):
+        # Empty payloads carry nothing, whatever was sent
+        return [f"{value} = None"]
+    if origin in (Union, UnionType):
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) != 1 or len(args) != 2:
+            return []
+        lines = _check_lines(value, options[0], path, namespace)
+        return [f"if {value} is not None:", *(f"    {line}" for line in lines)] if lines else []
+    if origin is Literal:
+        options = f"_options{len(namespace)}"
+        namespace[options] = args
+        expected = f"expected {' or '.join(repr(arg) for arg in args)}, got "
+        return [
+            f"if {value} not in {options}:",
+            f"    raise DecodeError({path!r}, {expected!r} + repr({value}))",
+        ]
+    if annotation in (str, bool, int):
+        return [
+            f"if {value}.__class__ is not {annotation.__name__}:",
+            f"    raise _mismatch({path!r}, {JSON_TYPES[annotation]!r}, {value})",
+        ]
+    if annotation is float:
+        return [
+            f"if {value}.__class__ is not float:",
+            f"    if {value}.__class__ is not int:",
+            f"        raise _mismatch({path!r}, 'number', {value})",
+            f"    {value} = float({value})",
+        ]
+    if annotation is dict or origin is dict:
+        return [f"if {value}.__class__ is not dict:", f"    raise _mismatch({path!r}, 'object', {value})"]
+    if annotation is list or origin is list:
+        lines = [f"if {value}.__class__ is not list:", f"    raise _mismatch({path!r}, 'array', {value})"]
+        if args and (decode_item := _item_decoder(args[0])) is not None:
+            name = f"_items{len(namespace)}"
+            namespace[name] = decode_item
+            lines += _nested_lines(f"_decode_items({name}, {value})", value, path)
+        return lines
+    if isinstance(annotation, type) and is_dataclass(annotation):
+        name = f"_decode{len(namespace)}"
+        namespace[name] = decoder_for(annotation)
+        return _nested_lines(f"{name}({value})", value, path)
+    # Any and annotations without a JSON counterpart are not checked
+    return []
+
+
+def _nested_lines(call: str, value: str, path: str) -> list[str]:
+    return [
+        "try:",
+        f"    {value} = {call}",
+        "except DecodeError as e:",
+        f"    raise e.within({path!r}) from None",
+    ]
+
+
+def _item_decoder(annotation: Any) -> Callable[[Any], Any] | None:
+    """A function checking one item of a list, or None if the items are not checked."""
+    if isinstance(annotation, type) and is_dataclass(annotation):
+        return decoder_for(annotation)
+    namespace: dict[str, Any] = {"DecodeError": DecodeError, "_mismatch": _mismatch, "_decode_items": _decode_items}
+    lines = _check_lines("v", annotation, "", namespace)
+    if not lines:
+        return None
+    source = "\n".join(["def decode_item(v):", *(f"    {line}" for line in lines), "    return v"])
+    exec(source, namespace)
+    return namespace["decode_item"]
+
+
+def compile_decoder(cls: type[T]) -> Callable[[Any], T]:
+    """
+    Generate a function that checks a dict against the dataclass `cls` and builds it.
+
+    The function's source is built from the class's fields. A key missing
+    from the dict takes the field's default, or is an error if the field
+    has none. The function raises `DecodeError` for the first field that
+    does not match its annotation.
+    """
+    try:
+        annotations = get_type_hints(cls)
+    except Exception:
+        annotations = {}
+    namespace: dict[str, Any] = {
+        "DecodeError": DecodeError, "_mismatch": _mismatch, "_decode_items": _decode_items,
+        "_missing": _missing, "_cls": cls,
+    }
+    lines = [
+        "def decode(d):",
+        "    if d.__class__ is not dict:",
+        "        raise _mismatch('', 'object', d)",
+    ]
+    arguments = []
+    for i, f in enumerate(fields(cls)):
+        if not f.init:
+            continue
+        value = f"a{i}"
+        lines.append(f"    {value} = d.get({f.name!r}, _missing)")
+        lines.append(f"    if {value} is _missing:")
+        if f.default is not MISSING:
+            namespace[f"_default{i}"] = f.default
+            lines.append(f"        {value} = _default{i}")
+        elif f.default_factory is not MISSING:
+            namespace[f"_factory{i}"] = f.default_factory
+            lines.append(f"        {value} = _factory{i}()")
+        else:
+            lines.append(f"        raise DecodeError({f.name!r}, 'missing')")
+        checks = _check_lines(value, annotations.get(f.name, Any), f.name, namespace)
+        if checks:
+            lines.append("    else:")
+            lines += (f"        {line}" for line in checks)
+        arguments.append(f"{f.name}={value}")
+    lines.append(f"    return _cls({', '.join(arguments)})")
+    exec("\n".join(lines), namespace)
+    decode = namespace["decode"]
+    decode.__qualname__ = decode.__name__ = f"decode_{cls.__name__}"
+    return decode
+
+
+def decoder_for(cls: type[T]) -> Callable[[Any], T]:
+    """Return the cached decoder of a dataclass, compiling it on first use."""
+    decode = _decoders.get(cls)
+    if decode is None:
+        decode = _decoders[cls] = compile_decoder(cls)
+    return decode
+
+
+def decode(cls: type[T], message: Any) -> T:
+    """Check a message parsed from JSON against the dataclass `cls` and build it, or raise DecodeError."""
+    return (_decoders.get(cls) or decoder_for(cls))(message)
@@ -45,9 +45,89 @@ class ApiConfig:
     temperature: float = 0.7
     max_tokens: int | None = None
 
+@dataclass
+class ContextConfig:
+    """Controls how much of a conversation's history is sent to the LLM."""
+    summary_threshold: int = 40         # History length at which old turns get summarized
+    keep_recent: int = 12               # Most recent messages that are always sent verbatim
+    summary_block: int = 8              # Summaries cover whole blocks of this many messages
+    summary_model: str | None = None    # Cheaper model for summaries (defaults to ApiConfig.model)
+    retrieval_top_k: int = 0            # Older turns retrieved by relevance (0 disables retrieval)
+
+@dataclass
+class RetryConfig:
+    """Controls how failed LLM requests are retried."""
+    max_retries: int = 3                # Retries after the first attempt (0 disables retrying)
+    base_delay: float = 0.5             # Seconds before the first retry; doubles per retry
+    max_delay: float = 8.0              # Upper bound on a single backoff delay
+    jitter: float = 0.5                 # Fraction of the delay that is randomized away
+
+@dataclass
+class DeadlineConfig:
+    """Bounds how long a streaming response may stall before it is abandoned."""
+    first_token_timeout: float | None = 30.0    # Seconds until the first stream item (None disables)
+    chunk_timeout: float | None = 20.0          # Seconds allowed between stream items (None disables)
+    fallback_url: str | None = None             # Endpoint used for retries after a stall
+
+@dataclass
+class RateLimitConfig:
+    """Client-side budgets per API endpoint and token, and concurrency limits per priority class."""
+    requests_per_minute: int | None = None  # None disables the budget
+    tokens_per_minute: int | None = None    # Estimated prompt tokens plus max_tokens; None disables
+    interactive_concurrency: int = 4        # Concurrent requests for the user's turns
+    background_concurrency: int = 1         # Concurrent summaries, titles and other background requests
+
+@dataclass
+class SessionConfig:
+    """Controls how chat sessions share the generation graph."""
+    max_concurrent_generations: int = 4     # Chats that may generate at the same time
+    max_live_sessions: int = 16             # Chats whose working state is kept in memory
+    idle_timeout: float | None = 600.0      # Seconds before an idle chat is torn down (None disables)
+    shards: int = 0                         # Worker processes chats are spread over (0 generates in this process)
+
+@dataclass
+class OffloadConfig:
+    """Sizes of the pools CPU-bound work runs on."""
+    thread_workers: int = 4                 # Threads shared by @cpu_bound functions
+    process_workers: int = 2                # Processes shared by @cpu_bound(executor="process") functions
+    max_pending: int = 8                    # Default limit on queued or running calls per function
+    interpreters: int = 2                   # Subinterpreters of the SubinterpreterPool (0 disables)
+
+@dataclass
+class SpeechConfig:
+    """Controls the text-to-speech branch of the graph."""
+    enabled: bool = True                    # Segment responses into sentences and send them for speech
+    max_in_flight: int = 2                  # Sentences sent to the frontend and not yet acknowledged
+    ack_timeout: float | None = 30.0        # Seconds before an unacknowledged sentence is given up (None waits forever)
+    engine: str | None = None               # Local TTS engine that pre-renders sentence audio (None leaves it to the frontend)
+    voice: str = "default"                  # Voice passed to the engine
+    lookahead: int = 2                      # Sentences rendered ahead of the one being sent
+    batch_chars: int = 0                    # Merge queued short sentences into events of up to this many characters (0 disables)
+    audio_transport: Literal["file", "inline"] = "file"  # Pass rendered audio as a spooled file or as base64 in the message
+    cache_memory_bytes: int = 8 * 1024 * 1024  # Rendered audio kept in memory (0 disables)
+    cache_dir: str | None = None            # Directory of the on-disk audio cache (None disables)
+    cache_disk_bytes: int = 256 * 1024 * 1024  # Size cap of the on-disk audio cache
+
+@dataclass
+class StreamingConfig:
+    """Controls how response chunks are forwarded to the frontend."""
+    coalesce: bool = False                  # Merge consecutive chunks of a response into fewer messages
+    min_interval: float = 0.016             # Shortest time between messages of a response (one frame)
+    max_interval: float = 0.1               # Longest time a chunk may be held back
+    chunks_per_flush: int = 4               # Chunks a message should carry at the observed token rate
+    max_bytes: int = 2048                   # Buffered text that is sent without waiting for the interval
+
 @dataclass
 class AppState:
     """A container for the main application state."""
     current_chat_id: str | None = None
     active_sessions: dict[str, ChatSession] = field(default_factory=dict)
-    api_config: ApiConfig = field(default_factory=ApiConfig)
\ No newline at end of file
+    api_config: ApiConfig = field(default_factory=ApiConfig)
+    context_config: ContextConfig = field(default_factory=ContextConfig)
+    retry_config: RetryConfig = field(default_factory=RetryConfig)
+    deadline_config: DeadlineConfig = field(default_factory=DeadlineConfig)
+    rate_limit_config: RateLimitConfig = field(default_factory=RateLimitConfig)
+    session_config: SessionConfig = field(default_factory=SessionConfig)
+    offload_config: OffloadConfig = field(default_factory=OffloadConfig)
+    speech_config: SpeechConfig = field(default_factory=SpeechConfig)
+    streaming_config: StreamingConfig = field(default_factory=StreamingConfig)
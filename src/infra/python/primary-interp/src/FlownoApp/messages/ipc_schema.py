@@ -14,6 +14,12 @@ class IPCMessageBase:
     """Base class for all IPC messages."""
     type: Any  # Literal[] does not subtype correctly.
 
+@dataclass
+class BatchMessage(IPCMessageBase):
+    """Several messages crossing the bridge at once, in either direction; handled in order."""
+    type: Literal["batch"]
+    messages: list[Any]
+
 # -----------------------------------------------------------------
 # Frontend -> Python Messages (Commands & Queries)
 # -----------------------------------------------------------------
@@ -21,8 +27,9 @@ class IPCMessageBase:
 @dataclass
 class NewPromptPayload:
     id: str
-    role: Literal["user", "system"]
     content: str
+    role: str | None = "user"  # Not checked: prompts are always stored as 'user', other roles are logged
+    chatId: str | None = None  # Chat the prompt belongs to (defaults to the current chat)
 
 @dataclass
 class NewPromptMessage(IPCMessageBase):
@@ -80,10 +87,14 @@ class SetApiConfigRequest(IPCMessageBase):
     type: Literal["set-api-config"]
     payload: ApiConfigPayload
 
+@dataclass
+class StopGenerationPayload:
+    chatId: str | None = None  # Chat whose generation is stopped (defaults to the current chat)
+
 @dataclass
 class StopGenerationRequest(IPCMessageBase):
     type: Literal["stop-generation"]
-    payload: None = None  # Empty payload
+    payload: StopGenerationPayload | None = None
 
 @dataclass
 class GetChatListRequest(IPCMessageBase):
@@ -95,6 +106,11 @@ class GetApiConfigRequest(IPCMessageBase):
     type: Literal["get-api-config"]
     payload: None = None  # Empty payload
 
+@dataclass
+class GetMetricsRequest(IPCMessageBase):
+    type: Literal["get-metrics"]
+    payload: None = None  # Empty payload
+
 # -----------------------------------------------------------------
 # Python -> Frontend Messages (Responses & Events)
 # -----------------------------------------------------------------
@@ -134,6 +150,17 @@ class ApiConfigResponse(IPCMessageBase):
     type: Literal["api-config"]
     payload: ApiConfigPayload
 
+@dataclass
+class MetricsPayload:
+    counters: dict[str, int]
+    gauges: dict[str, float]
+    summaries: dict[str, dict[str, float]]  # name -> {count, total, mean, max}
+
+@dataclass
+class MetricsResponse(IPCMessageBase):
+    type: Literal["metrics"]
+    payload: MetricsPayload
+
 @dataclass
 class MessageDeletedPayload:
     messageId: str
@@ -143,10 +170,14 @@ class MessageDeletedResponse(IPCMessageBase):
     type: Literal["message-deleted"]
     payload: MessageDeletedPayload
 
+@dataclass
+class GenerationStoppedPayload:
+    chatId: str | None  # Chat whose generation was stopped
+
 @dataclass
 class GenerationStoppedResponse(IPCMessageBase):
     type: Literal["generation-stopped"]
-    payload: None = None  # Empty payload
+    payload: GenerationStoppedPayload
 
 @dataclass
 class MessageUpdatedPayload:
@@ -182,14 +213,23 @@ class ErrorResponse(IPCMessageBase):
 # Sentence-related Messages for TTS
 # -----------------------------------------------------------------
 
+@dataclass
+class AudioRef:
+    """Pre-rendered audio stored in a file instead of the message itself."""
+    path: str             # File holding the audio; removed once the sentence is done
+    size: int             # Size of the audio in bytes
+    media_type: str       # MIME type of the audio, e.g. "audio/wav"
+
 @dataclass
 class SentenceEventPayload:
     """Payload for sentence events sent to frontend for speech synthesis."""
     id: str
     chunk_ids: list[str]  # IDs of chunks that contributed to this sentence
     text: str             # The sentence text content
-    audio: str            # Base64-encoded audio data (if pre-rendered)
+    audio: str            # Base64-encoded audio data (if pre-rendered inline)
     order: int            # Sequence number for correct playback order
+    chat_id: str | None = None  # Chat whose response the sentence belongs to
+    audio_ref: AudioRef | None = None  # Pre-rendered audio passed as a file
 
 @dataclass
 class SentenceEvent(IPCMessageBase):
@@ -208,6 +248,17 @@ class SentenceDoneRequest(IPCMessageBase):
     type: Literal["sentence-done"]
     payload: SentenceDonePayload
 
+@dataclass
+class SetSpeechPayload:
+    """Payload for turning speech on or off."""
+    enabled: bool         # Whether responses are split into sentences for TTS
+
+@dataclass
+class SetSpeechRequest(IPCMessageBase):
+    """Request sent from frontend when the user turns speech on or off."""
+    type: Literal["set-speech"]
+    payload: SetSpeechPayload
+
 # -----------------------------------------------------------------
 # Streaming Response Messages (Already present in the old codebase)
 # -----------------------------------------------------------------
@@ -222,6 +273,7 @@ class NewResponsePayload:
 class NewResponseMessage(IPCMessageBase):
     type: Literal["new-response"]
     response: NewResponsePayload
+    chat_id: str | None = None  # Chat the response answers
 
 @dataclass
 class ChunkedResponse(IPCMessageBase):
@@ -229,4 +281,6 @@ class ChunkedResponse(IPCMessageBase):
     id: str
     response_id: str
     content: str
-    finish_reason: str | None = None  # Optional finish reason
\ No newline at end of file
+    finish_reason: str | None = None  # Optional finish reason
+    chat_id: str | None = None  # Chat the response answers
+    chunk_ids: list[str] | None = None  # Ids of the chunks merged into this one, if it was coalesced
\ No newline at end of file
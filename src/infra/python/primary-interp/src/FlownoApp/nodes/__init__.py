@@ -2,6 +2,7 @@
 Nodes package for FlownoApp.
 """
 # Re-export all the Flowno nodes
-from .gui_io import GUIChat
+from .gui_io import GUIChat, PromptRouter
 from .chat_history import ChatHistory
-from .inference import Inference, ChunkContents
\ No newline at end of file
+from .inference import Inference, ChunkContents
+from .context import ContextWindow
\ No newline at end of file
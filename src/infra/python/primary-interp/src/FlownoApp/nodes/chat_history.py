@@ -2,6 +2,7 @@ from flowno import node
 import logging
 
 from ..messages.domain_types import Message, Messages
+from ..services.sessions import GenerationLane
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +21,17 @@ class ChatHistory:
     # Initialize with a system message
     messages: Messages = [Message("system-0", "system", "You are a helpful assistant.")]
 
-    async def call(self, new_prompt: Message, last_response: str = "") -> Messages:
+    async def call(
+        self, new_prompt: Message, last_response: str = "", lane: GenerationLane | None = None
+    ) -> Messages:
         """
         Updates the chat history with a new prompt and the previous response.
         
         Args:
             new_prompt: The new user message to add to history
             last_response: The string content of the assistant's response (accumulated from chunks)
+            lane: Optional generation lane; if given, the response is recorded in the
+                history of the lane's previous chat and the prompt in its current chat's
             
         Returns:
             Messages: The updated list of all messages in the conversation
@@ -38,27 +43,34 @@ class ChatHistory:
                 f"Expected last_response to be a string, got {type(last_response).__name__}"
             )
             
+        messages = lane.router.history(lane.chat_id) if lane is not None else self.messages
+
         # If we have a response from the previous turn, add it to history
         if last_response:
+            previous_messages = lane.router.history(lane.previous_chat_id) if lane is not None else self.messages
             # Create a response ID based on the previous message
             assistant_response_id = f"{new_prompt.id}-resp"
             
             # Check if this response ID already exists to prevent duplicates 
             # if the node reruns unexpectedly
-            if not any(msg.id == assistant_response_id for msg in self.messages):
-                self.messages.append(
+            if not any(msg.id == assistant_response_id for msg in previous_messages):
+                previous_messages.append(
                     Message(assistant_response_id, "assistant", last_response)
                 )
                 logger.debug(f"Added assistant response: {assistant_response_id}")
             else:
                 logger.warning(f"Duplicate assistant response ID detected: {assistant_response_id}")
+
+        # The previous chat's answer is recorded, so its next prompt may go to any lane
+        if lane is not None and lane.previous_chat_id != lane.chat_id:
+            await lane.router.release(lane, lane.previous_chat_id)
                 
         # Add the new prompt to history if it doesn't already exist
-        if not any(msg.id == new_prompt.id for msg in self.messages):
-            self.messages.append(new_prompt)
+        if not any(msg.id == new_prompt.id for msg in messages):
+            messages.append(new_prompt)
             logger.debug(f"Added user prompt: {new_prompt.id}")
         else:
             logger.warning(f"Duplicate prompt ID detected: {new_prompt.id}")
 
         # Return a copy to avoid potential mutation issues if the list is held elsewhere
-        return list(self.messages)
\ No newline at end of file
+        return list(messages)
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Nodes that decide which parts of the history are sent to the LLM."""
+from flowno import node
+import logging
+
+from ..messages.domain_types import Messages
+from ..services.summarizer import HistorySummarizer
+from ..services.retrieval import HistoryRetriever
+from ..services.sessions import GenerationLane
+
+logger = logging.getLogger(__name__)
+
+
+@node
+async def ContextWindow(
+    messages: Messages,
+    summarizer: HistorySummarizer,
+    retriever: HistoryRetriever | None = None,
+    lane: GenerationLane | None = None,
+) -> Messages:
+    """
+    Builds the message list for the next Inference call.
+
+    Long histories are compacted into a summary of the oldest turns plus the
+    recent turns; short histories pass through unchanged. When retrieval is
+    enabled, the older turns are further reduced to the ones most relevant to
+    the latest prompt.
+
+    Args:
+        messages: The full conversation history from ChatHistory
+        summarizer: Service that caches and schedules history summaries
+        retriever: Optional BM25 retrieval stage over the session's messages
+        lane: Optional generation lane, whose chat the retrieval index is kept for
+
+    Returns:
+        Messages: The messages to send to the LLM
+    """
+    context = await summarizer.compact(messages)
+    if retriever is not None:
+        # The turns after the context's system messages are always a suffix of
+        # the history; anything before them is covered by the summary.
+        head_len = 0
+        while head_len < len(context) and context[head_len].role == "system":
+            head_len += 1
+        start = len(messages) - (len(context) - head_len)
+        chat_id = lane.chat_id if lane is not None else None
+        await retriever.prepare(messages, chat_id)
+        context = retriever.select(messages, context, start, chat_id)
+    if len(context) != len(messages):
+        logger.debug(f"Compacted history from {len(messages)} to {len(context)} messages")
+    return context
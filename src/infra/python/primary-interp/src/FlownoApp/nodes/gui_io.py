@@ -1,40 +1,106 @@
-from flowno import FlowHDL, node, Stream, AsyncQueue, sleep
+import base64
+from dataclasses import replace
+from flowno import node, Stream, spawn
+from flowno.core.event_loop.tasks import TaskHandle
 import logging
-import nodejs_callback_bridge  # Import for sending messages to frontend
 
-from ..messages.domain_types import Message
+from ..messages.domain_types import Message, SpeechConfig, StreamingConfig
 from ..messages.ipc_schema import ChunkedResponse
 from ..messages.ipc_schema import SentenceEvent, SentenceEventPayload, SentenceDoneRequest
+from ..services.audio_spool import audio_spool
+from ..services.metrics import metrics
+from ..services.outbox import outbox
+from ..services.sessions import SessionRouter, GenerationLane
+from ..services.tts import get_engine, synthesize
+from ..utils.bounded_queue import BoundedQueue
+from ..utils.chunk_coalescer import ChunkCoalescer
+from ..utils.credit_window import CreditWindow
 from .inference import new_id
 
 logger = logging.getLogger(__name__)
 
+# Sentences waiting to be spoken before new ones are merged into the last
+SENTENCE_QUEUE_SIZE = 16
+
+QueuedSentence = tuple[str | None, int, SentenceEvent]
+# Like QueuedSentence, with the task rendering the sentence's audio
+RenderingSentence = tuple[str | None, int, TaskHandle[SentenceEvent]]
+
+
+def merge_sentences(queued: QueuedSentence, new: QueuedSentence) -> QueuedSentence | None:
+    """Append a sentence to the last queued one if both belong to the same chat and epoch."""
+    chat_id, epoch, event = queued
+    if (chat_id, epoch) != new[:2]:
+        return None
+    payload = replace(
+        event.payload,
+        text=f"{event.payload.text} {new[2].payload.text}",
+        chunk_ids=event.payload.chunk_ids + new[2].payload.chunk_ids,
+    )
+    return chat_id, epoch, replace(event, payload=payload)
+
+
+async def take_batch(
+    queue: BoundedQueue[QueuedSentence], first: QueuedSentence, max_chars: int
+) -> QueuedSentence:
+    """
+    Merge the sentences already queued behind `first` into it while the text stays within `max_chars`.
+
+    Only consecutive sentences of the same chat and epoch are merged, and
+    never more than are queued right now, so batching adds no delay.
+    """
+    batch = first
+    while queue.items and len(batch[2].payload.text) + 1 + len(queue.items[0][2].payload.text) <= max_chars:
+        merged = merge_sentences(batch, queue.items[0])
+        if merged is None:
+            break
+        await queue.get()
+        batch = merged
+        metrics.increment("speech.batched_sentences")
+    return batch
+
+@node
+async def PromptRouter(router: SessionRouter) -> SessionRouter:
+    """
+    Passes the SessionRouter to the GUIChat node of every lane.
+
+    Flowno only starts the nodes it can reach from the first node it
+    resolves; depending on this shared node makes the flow start every lane.
+    """
+    return router
+
 @node(stream_in=["response_chunks"])
 async def GUIChat(
-    prompt_queue: AsyncQueue[Message],
+    router: SessionRouter,
+    lane: GenerationLane,
     response_chunks: Stream[ChunkedResponse] | None = None,
+    streaming: StreamingConfig | None = None,
 ):
     """
     Sends streaming responses to the GUI via the NodeJS callback bridge,
-    then waits for a new prompt from the prompt queue. The prompt queue
-    is populated by the bridge message handler when a new prompt is received.
+    then waits for the next prompt the router hands to this lane. The router
+    is fed by the bridge message handler when a new prompt is received.
     
     Args:
-        prompt_queue: Queue to receive new prompts from the frontend
+        router: Router that distributes prompts over the generation lanes
+        lane: The generation lane this node belongs to
         response_chunks: Stream of ChunkedResponse objects to forward to the frontend
+        streaming: Whether and how chunks are merged into fewer messages
         
     Returns:
-        Message: The next user prompt from the queue
+        Message: The next user prompt for this lane
     """
     if response_chunks:
+        # Forwards the ChunkedResponse objects to the JS side, merged if coalescing is on
+        coalescer = ChunkCoalescer(outbox.send, streaming or StreamingConfig())
         async for chunk in response_chunks:
-            # Forward the ChunkedResponse object to the JS side
-            nodejs_callback_bridge.send_message(chunk)
-            logger.debug(f"Sent chunk: {chunk.id} for response {chunk.response_id}")
+            await coalescer.add(chunk)
+            logger.debug(f"Received chunk: {chunk.id} for response {chunk.response_id}")
+        await coalescer.close()
 
-    # Wait for a new prompt from the queue
-    logger.debug("Waiting for new prompt...")
-    prompt = await prompt_queue.get()
+    # Wait for a new prompt from the router
+    logger.debug(f"Lane {lane.index} waiting for new prompt...")
+    prompt = await router.next_prompt(lane)
     logger.debug(f"Received prompt: {prompt.id}")
     return prompt
 
@@ -43,57 +109,179 @@ class SentenceSpeaker:
     """
     A node that receives sentence events and sends them to the frontend.
     Also handles playback completion notifications from frontend.
+
+    Every generation lane has its own SentenceSpeaker node; they share one
+    queue and one speak task, so sentences are spoken one after another.
+    If a TTS engine is configured, the audio of the next
+    `SpeechConfig.lookahead` sentences is rendered on the offload threads
+    while earlier ones play. The audio is passed as a spooled file
+    (`audio_ref`) or base64-encoded in the `audio` field, depending on
+    `SpeechConfig.audio_transport`; files are removed once their sentence
+    leaves the credit window.
+    With `SpeechConfig.batch_chars` set, short sentences that are queued
+    together are merged into one event of up to that many characters.
+    Sending is paced by the frontend's acknowledgements: at most
+    `SpeechConfig.max_in_flight` sentences are sent and not yet done
+    playing, and each `sentence-done` lets the next one go. Sentences that
+    are not acknowledged within `SpeechConfig.ack_timeout` are given up.
     
     Args:
         sentences: Stream of SentenceEvent objects to be sent to the frontend
+        lane: Optional generation lane the sentences belong to
+        speech: Speech settings (the defaults if None)
     """
 
-    sentence_queue: AsyncQueue[SentenceEvent] = AsyncQueue()
+    # Sentences waiting to be sent, tagged with their chat and the chat's epoch they were produced in.
+    # When TTS falls behind, new sentences are merged into the last queued one.
+    sentence_queue: BoundedQueue[QueuedSentence] = BoundedQueue(
+        SENTENCE_QUEUE_SIZE, "coalesce", "tts_sentences", merge_sentences
+    )
+    # Sentences taken from the queue whose audio is rendered ahead of playback
+    rendered: BoundedQueue[RenderingSentence] = BoundedQueue(SpeechConfig.lookahead, "block", "tts_rendered")
+    render_task = None
     speak_task = None
+    expiry_task = None
     # Counter to preserve sentence ordering (for non-sequential playback options)
     sentence_counter: int = 0
-    # Dictionary to track in-flight sentences awaiting playback confirmation
-    pending_sentences: dict[str, SentenceEvent] = {}
+    # Sentences sent to the frontend and awaiting playback confirmation
+    pending_sentences: CreditWindow[SentenceEvent] = CreditWindow(
+        SpeechConfig.max_in_flight, SpeechConfig.ack_timeout, "speech",
+        on_release=lambda sentence_id, _: audio_spool.remove(sentence_id),
+    )
+    # Bumped per chat by cancel_pending(); sentences from an older epoch are dropped
+    epochs: dict[str | None, int] = {}
+
+    async def render(self, sentence_event: SentenceEvent, speech: SpeechConfig) -> SentenceEvent:
+        """Attach the sentence's audio if a TTS engine is configured; on failure the frontend synthesizes it."""
+        if speech.engine is None:
+            return sentence_event
+        try:
+            engine = get_engine(speech.engine, speech.voice)
+            audio = await synthesize(engine, sentence_event.payload.text)
+            if speech.audio_transport == "file":
+                audio_ref = audio_spool.write(sentence_event.payload.id, audio, engine.media_type)
+                payload = replace(sentence_event.payload, audio_ref=audio_ref)
+            else:
+                payload = replace(sentence_event.payload, audio=base64.b64encode(audio).decode("ascii"))
+        except Exception as e:
+            metrics.increment("speech.render_errors")
+            logger.error(f"Could not render sentence {sentence_event.payload.id}: {e}")
+            return sentence_event
+        return replace(sentence_event, payload=payload)
+
+    async def render_ahead(self, speech: SpeechConfig):
+        """Start rendering queued sentences, up to the lookahead; runs forever."""
+        while True:
+            chat_id, epoch, sentence_event = await self.sentence_queue.get()
+            if epoch != self.epochs.get(chat_id, 0):
+                # Queued before generation was stopped
+                continue
+            if speech.batch_chars > 0:
+                # A burst of short sentences becomes one event, rendering and acknowledgement
+                _, _, sentence_event = await take_batch(
+                    self.sentence_queue, (chat_id, epoch, sentence_event), speech.batch_chars
+                )
+            rendering = await spawn(self.render(sentence_event, speech))
+            await self.rendered.put((chat_id, epoch, rendering))
+
+    async def speak(self):
+        """Send rendered sentences to the frontend as credits become available; runs forever."""
+        while True:
+            chat_id, epoch, rendering = await self.rendered.get()
+            sentence_event = await rendering.join()
+            if epoch != self.epochs.get(chat_id, 0):
+                # Stopped while the sentence was rendered
+                audio_spool.remove(sentence_event.payload.id)
+                continue
 
-    def start_speak_task(self, loop: FlowHDL):
+            # Wait until the frontend has finished enough of the sentences already sent
+            await self.pending_sentences.acquire()
+            if epoch != self.epochs.get(chat_id, 0):
+                # Stopped while waiting for a credit
+                audio_spool.remove(sentence_event.payload.id)
+                continue
+
+            # Kept until playback completes, is given up, or the chat is stopped
+            self.pending_sentences.add(sentence_event.payload.id, sentence_event)
+
+            # Send the event directly to the frontend
+            await outbox.send(sentence_event)
+
+            logger.debug(f"Sent sentence event: id={sentence_event.payload.id}, " +
+                         f"text={sentence_event.payload.text[:30]}{'...' if len(sentence_event.payload.text) > 30 else ''}")
+
+    async def call(
+        self,
+        sentences: Stream[SentenceEvent],
+        lane: GenerationLane | None = None,
+        speech: SpeechConfig | None = None,
+    ):
         """
-        Start the task that sends sentences to the frontend.
+        Process the stream of sentence events and send them to the queue.
         
         Args:
-            loop: The event loop to run the task in
+            sentences: Stream of SentenceEvent objects
+            lane: Optional generation lane the sentences belong to
+            speech: Speech settings (the defaults if None)
         """
+        speech = speech or SpeechConfig()
+        self.pending_sentences.size = max(1, speech.max_in_flight)
+        self.pending_sentences.timeout = speech.ack_timeout
+
+        # Sentences of this response are dropped once cancel_pending() bumps the chat's epoch
+        chat_id = lane.chat_id if lane is not None else None
+        epoch = self.epochs.get(chat_id, 0)
+        async for sentence_event in sentences:
+            if epoch != self.epochs.get(chat_id, 0):
+                continue
+            if SentenceSpeaker.speak_task is None:
+                # Started by the first sentence; all lanes' speakers share them
+                self.rendered.maxsize = max(1, speech.lookahead)
+                SentenceSpeaker.render_task = await spawn(self.render_ahead(speech))
+                SentenceSpeaker.speak_task = await spawn(self.speak())
+                SentenceSpeaker.expiry_task = await spawn(self.pending_sentences.run_expiry())
+                logger.debug("Started speak task")
+            await self.sentence_queue.put((chat_id, epoch, sentence_event))
 
-        async def speak():
-            while True:
-                # Get the next sentence event from the queue
-                sentence_event = await self.sentence_queue.get()
-                
-                # Store in pending sentences dict for reference when playback completes
-                self.pending_sentences[sentence_event.payload.id] = sentence_event
-                
-                # Send the event directly to the frontend
-                nodejs_callback_bridge.send_message(sentence_event)
-                
-                # We no longer need to simulate speaking time - the frontend will
-                # notify us when playback is complete through a SentenceDoneRequest
-                await sleep(2)
-                
-                logger.debug(f"Sent sentence event: id={sentence_event.payload.id}, " +
-                             f"text={sentence_event.payload.text[:30]}{'...' if len(sentence_event.payload.text) > 30 else ''}")
-
-        if self.speak_task is None:
-            self.speak_task = loop.create_task(speak())
-            logger.debug("Started speak task")
-
-    async def call(self, sentences: Stream[SentenceEvent]):
+    async def cancel_pending(self, chat_id: str | None = None) -> int:
         """
-        Process the stream of sentence events and send them to the queue.
+        Drop every queued and unacknowledged sentence of a chat after its generation was stopped.
         
+        Queued and rendered sentences are not removed from their queues; the
+        speak task skips them because they belong to an older epoch.
+
         Args:
-            sentences: Stream of SentenceEvent objects
+            chat_id: The chat whose generation was stopped
+        
+        Returns:
+            int: The number of sentences that were dropped
         """
-        async for sentence_event in sentences:
-            await self.sentence_queue.put(sentence_event)
+        unacknowledged = [
+            sentence_id for sentence_id, event in self.pending_sentences.items()
+            if event.payload.chat_id == chat_id
+        ]
+        epoch = self.epochs.get(chat_id, 0)
+        queued = sum(1 for queued_chat, queued_epoch, _ in [*self.sentence_queue.items, *self.rendered.items]
+                     if queued_chat == chat_id and queued_epoch == epoch)
+        dropped = queued + len(unacknowledged)
+        self.epochs[chat_id] = epoch + 1
+        await self.pending_sentences.release(unacknowledged)
+        logger.debug(f"Dropped {dropped} pending sentences of chat {chat_id}")
+        return dropped
+
+    async def cancel_all(self) -> int:
+        """
+        Drop the queued and unacknowledged sentences of every chat (after speech was turned off).
+
+        Returns:
+            int: The number of sentences that were dropped
+        """
+        chat_ids = {chat_id for chat_id, _, _ in [*self.sentence_queue.items, *self.rendered.items]}
+        chat_ids.update(event.payload.chat_id for _, event in self.pending_sentences.items())
+        dropped = 0
+        for chat_id in chat_ids:
+            dropped += await self.cancel_pending(chat_id)
+        return dropped
             
     async def handle_sentence_done(self, sentence_id: str):
         """
@@ -102,9 +290,8 @@ class SentenceSpeaker:
         Args:
             sentence_id: ID of the sentence that finished playing
         """
-        if sentence_id in self.pending_sentences:
-            # Remove from pending dict once playback is confirmed
-            del self.pending_sentences[sentence_id]
+        if await self.pending_sentences.acknowledge(sentence_id):
             logger.debug(f"Sentence playback complete: id={sentence_id}")
         else:
+            # Also the case for sentences that were given up or whose chat was stopped
             logger.warning(f"Received completion for unknown sentence: id={sentence_id}")
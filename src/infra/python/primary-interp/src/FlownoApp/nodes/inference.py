@@ -1,17 +1,25 @@
 """Inference and response processing nodes."""
 from collections.abc import AsyncGenerator
-from flowno import node, Stream
+from flowno import node, Stream, sleep
 import logging
 import time
 import os
-import nodejs_callback_bridge
+import uuid
 
 from flowno.io import HttpClient, Headers
-from flowno.io.http_client import HTTPException, streaming_response_is_ok
+from flowno.io.http_client import streaming_response_is_ok
 
-from ..messages.domain_types import Message, Messages, ApiConfig
+from ..messages.domain_types import Message, Messages, ApiConfig, RetryConfig, DeadlineConfig
 from ..messages.ipc_schema import ChunkedResponse, NewResponseMessage
 from ..messages.encoders import MessageJSONEncoder
+from ..services.generation import GenerationControl, GenerationCancelled
+from ..services.llm_client import AbortableHttpClient, ApiError
+from ..services.metrics import metrics
+from ..services.outbox import outbox
+from ..services.retry import is_retryable, backoff_delay
+from ..services.rate_limit import estimate_tokens
+from ..services.scheduler import AdmissionCancelled, RequestScheduler, Priority
+from ..utils.stream_pump import StreamPump, StreamStalled
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +29,11 @@ logger = logging.getLogger(__name__)
 
 def new_id(prefix: str) -> str:
     """Generate a new unique ID with a prefix."""
-    return f"{prefix}-{int(time.time() * 1000)}"  # Convert to milliseconds
+    # Random rather than time-based: lanes and shard workers create IDs within the same millisecond
+    return f"{prefix}-{uuid.uuid4().hex}"
 
 
-def create_blank_response():
+async def create_blank_response(chat_id: str | None = None):
     """Create and send a blank response placeholder to the frontend."""
     new_response_id = new_id("response")
     message = NewResponseMessage(
@@ -34,8 +43,9 @@ def create_blank_response():
             role="assistant",
             content="",
         ),
+        chat_id=chat_id,
     )
-    nodejs_callback_bridge.send_message(message)
+    await outbox.send(message)
     return new_response_id
 
 
@@ -46,6 +56,8 @@ def create_blank_response():
 # Default API configuration
 DEFAULT_API_URL = "http://localhost:5000/v1/chat/completions"
 DEFAULT_API_TOKEN = os.environ.get("GROQ_API_KEY", "")
+# Stream items read ahead of the consumers; beyond that the connection is not read
+STREAM_BUFFER = 256
 
 # HTTP client setup
 headers = Headers()
@@ -59,97 +71,275 @@ client.json_encoder = MessageJSONEncoder()
 # Inference Node
 # ---------------------------------------------------------------------
 
+def parse_retry_after(value: object) -> float | None:
+    """Parse a Retry-After header given in seconds (HTTP dates are ignored)."""
+    try:
+        return float(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+async def stream_completion(
+    stream_client: HttpClient, api_url: str, request: dict
+) -> AsyncGenerator[dict, None]:
+    """
+    Make the streaming API request and yield the decoded stream items.
+
+    Running the whole request inside one generator lets a StreamPump read it
+    in a separate task, so connecting and waiting for the first token can be
+    interrupted too.
+
+    Raises:
+        ApiError: If the API responds with an error status
+        ConnectionResetError: If the server closed the connection mid-stream
+    """
+    response = await stream_client.stream_post(api_url, json=request)
+
+    # Check if the response is valid
+    if not streaming_response_is_ok(response):
+        logger.error(f"API response error: {response.status}")
+        raise ApiError(response.status, response.body, parse_retry_after(response.headers.get("Retry-After")))
+
+    try:
+        async for response_stream_json in response.body:
+            yield response_stream_json
+    except Exception as e:
+        # HttpClient reports a truncated chunked body with a bare Exception
+        if type(e) is Exception and "closed connection" in str(e):
+            raise ConnectionResetError(str(e)) from e
+        raise
+
+
+def build_request(
+    messages: Messages, api_config: ApiConfig | None, response_id: str, partial: str = ""
+) -> dict:
+    """
+    Build the streaming chat completion request body.
+
+    Args:
+        messages: The conversation to send
+        api_config: Optional API configuration (uses defaults if None)
+        response_id: ID of the response being generated
+        partial: Text already generated by an earlier attempt; it is sent as a
+            trailing assistant message so the model continues from it
+
+    Returns:
+        dict: The JSON request body
+    """
+    if partial:
+        messages = messages + [Message(f"{response_id}-partial", "assistant", partial)]
+    return {
+        "messages": messages,
+        "model": api_config.model if api_config else "llama-3.3-70b-versatile",
+        "stream": True,
+        # Add additional parameters if provided in api_config
+        **({"temperature": api_config.temperature} if api_config and api_config.temperature is not None else {}),
+        **({"max_tokens": api_config.max_tokens} if api_config and api_config.max_tokens is not None else {}),
+    }
+
+
 @node
-async def Inference(messages: Messages, api_config: ApiConfig = None) -> AsyncGenerator[ChunkedResponse, None]:
+async def Inference(
+    messages: Messages,
+    api_config: ApiConfig = None,
+    control: GenerationControl | None = None,
+    retry_config: RetryConfig | None = None,
+    deadline_config: DeadlineConfig | None = None,
+    scheduler: RequestScheduler | None = None,
+) -> AsyncGenerator[ChunkedResponse, None]:
     """
     Calls the LLM API with the message history and streams the chunked responses.
+
+    Transient failures (connection errors, 429 and 5xx) are retried with
+    exponential backoff. If the stream breaks after some content was streamed,
+    the retry asks the model to continue from the partial answer, so the
+    frontend keeps receiving one uninterrupted response.
+
+    A stream that misses its time-to-first-token or inter-chunk deadline is
+    dropped and treated as a transient failure; if a fallback endpoint is
+    configured, the remaining attempts go there.
     
     Args:
         messages: The list of messages in the conversation
         api_config: Optional API configuration (uses default if None)
+        control: Optional handle that lets IPC handlers cancel the generation;
+            its chat_id is copied to every chunk
+        retry_config: Optional retry policy (no retries if None)
+        deadline_config: Optional stall deadlines (a stream may stall forever if None)
+        scheduler: Optional scheduler that admits the request as interactive work
         
     Yields:
-        ChunkedResponse: Chunks of the AI's response as they arrive
+        ChunkedResponse: Chunks of the AI's response as they arrive. A cancelled
+        generation ends with an empty chunk whose finish_reason is "cancelled".
     """
     # Use provided API config or default
     api_url = api_config.url if api_config else DEFAULT_API_URL
-    api_model = api_config.model if api_config else "llama-3.3-70b-versatile"
+    max_retries = retry_config.max_retries if retry_config else 0
+    first_token_timeout = deadline_config.first_token_timeout if deadline_config else None
+    chunk_timeout = deadline_config.chunk_timeout if deadline_config else None
     
     # Set the API token in headers if provided
     if api_config and api_config.token:
         headers.set("Authorization", f"Bearer {api_config.token}")
         # Create a blank response placeholder for the frontend first
-    new_response_id = create_blank_response()
+    chat_id = control.chat_id if control is not None else None
+    new_response_id = await create_blank_response(chat_id)
     logger.info(f"Created blank response with ID: {new_response_id}")
+    if control is not None:
+        control.begin(new_response_id)
+        if scheduler is not None:
+            control.on_stop(scheduler.wake)
 
+    pump = None
+    partial = ""  # Content streamed so far, across attempts
+    attempt = 0
     try:
-        # Make the API request
-        response = await client.stream_post(
-            api_url,
-            json={
-                "messages": messages,
-                "model": api_model,
-                "stream": True,
-                # Add additional parameters if provided in api_config
-                **({"temperature": api_config.temperature} if api_config and api_config.temperature is not None else {}),
-                **({"max_tokens": api_config.max_tokens} if api_config and api_config.max_tokens is not None else {}),
-            },
+        while True:
+            if control is not None and control.stop_requested:
+                raise GenerationCancelled()
+            request = build_request(messages, api_config, new_response_id, partial)
+            admitted = False
+            try:
+                if scheduler is not None:
+                    max_tokens = api_config.max_tokens if api_config else None
+                    try:
+                        await scheduler.acquire(
+                            api_url,
+                            api_config.token if api_config else DEFAULT_API_TOKEN,
+                            estimate_tokens(request["messages"]) + (max_tokens or 0),
+                            Priority.INTERACTIVE,
+                            cancelled=(lambda: control.stop_requested) if control is not None else None,
+                        )
+                    except AdmissionCancelled:
+                        raise GenerationCancelled() from None
+                    admitted = True
+                    if control is not None and control.stop_requested:
+                        raise GenerationCancelled()
+
+                # Make the API request in a separate reader task. Each attempt
+                # gets its own client so a stop can drop exactly this connection.
+                stream_client = AbortableHttpClient(headers=headers)
+                stream_client.json_encoder = client.json_encoder
+                pump = await StreamPump(
+                    stream_completion(stream_client, api_url, request),
+                    on_interrupt=stream_client.abort,
+                    first_item_timeout=first_token_timeout,
+                    item_timeout=chunk_timeout,
+                    maxsize=STREAM_BUFFER,
+                    name="inference.stream",
+                ).start()
+                if control is not None:
+                    control.attach(pump)
+                    if control.stop_requested:
+                        await pump.interrupt(GenerationCancelled())
+
+                # Process the streaming response
+                async for response_stream_json in pump:
+                    try:
+                        # Basic validation of the expected structure
+                        if not isinstance(response_stream_json, dict) or "choices" not in response_stream_json:
+                            logger.warning(f"Unexpected stream item format: {response_stream_json}")
+                            continue
+
+                        choice = response_stream_json["choices"][0]
+                        delta = choice.get("delta", {})
+                        chunk_content = delta.get("content", "")  # Default to empty string if None
+                        finish_reason = choice.get("finish_reason")
+
+                        # Create and yield a chunk response
+                        chunk_response = ChunkedResponse(
+                            type="chunk",
+                            id=new_id("chunk"),
+                            response_id=new_response_id,
+                            content=chunk_content,
+                            finish_reason=finish_reason,
+                            chat_id=chat_id,
+                        )
+                        
+                        # Only log if it's the final chunk or has content
+                        if finish_reason or chunk_content:
+                            logger.debug(f"Yielding chunk: content_length={len(chunk_content)}, finish_reason={finish_reason}")
+                        
+                        if pump.first_item_at is not None and not partial and chunk_content:
+                            metrics.observe("inference.time_to_first_token_s", time.monotonic() - pump.started_at)
+                        partial += chunk_content or ""
+                        yield chunk_response
+
+                    except (KeyError, IndexError, TypeError) as e:
+                        logger.error(f"Error processing stream item: {e} - Item: {response_stream_json}")
+                        continue  # Skip this item and try the next one
+                    except Exception as e:
+                        logger.error(f"Unexpected error processing stream: {e}")
+                        raise  # Re-raise unexpected errors
+                break
+
+            except (ApiError, ConnectionError, TimeoutError) as e:
+                if isinstance(e, StreamStalled):
+                    metrics.increment("inference.stalls")
+                    logger.warning(f"Stream of {new_response_id} from {api_url} stalled: {e}")
+                    if deadline_config and deadline_config.fallback_url and api_url != deadline_config.fallback_url:
+                        api_url = deadline_config.fallback_url
+                        metrics.increment("inference.failovers")
+                        logger.warning(f"Failing over to {api_url}")
+                if attempt >= max_retries or not is_retryable(e):
+                    if attempt:
+                        metrics.increment("inference.retries_exhausted")
+                    raise
+                delay = backoff_delay(retry_config, attempt, getattr(e, "retry_after", None))
+                attempt += 1
+                metrics.increment("inference.retries")
+                metrics.observe("inference.retry_delay_s", delay)
+                if partial:
+                    metrics.increment("inference.resumed_streams")
+                logger.warning(f"Retrying {new_response_id} in {delay:.2f}s (attempt {attempt}/{max_retries}): {e}")
+            finally:
+                if admitted:
+                    await scheduler.release(Priority.INTERACTIVE)
+            # A stop during the backoff ends it; the loop then exits as cancelled
+            if control is not None:
+                await control.sleep(delay)
+            else:
+                await sleep(delay)
+
+    except GenerationCancelled:
+        # The partial answer stays in the accumulated history; downstream
+        # nodes see the finish_reason and stop their own work.
+        logger.info(f"Generation of {new_response_id} cancelled")
+        if pump is not None:
+            await pump.wait_closed()
+        yield ChunkedResponse(
+            type="chunk",
+            id=new_id("chunk"),
+            response_id=new_response_id,
+            content="",
+            finish_reason="cancelled",
+            chat_id=chat_id,
         )
+    except StreamStalled as e:
+        # The stall already dropped the connection; report it instead of crashing the flow
+        yield ChunkedResponse(
+            type="chunk",
+            id=new_id("error-chunk"),
+            response_id=new_response_id,
+            content=f"\n\n**The model stopped responding ({e}).**",
+            finish_reason="error",
+            chat_id=chat_id,
+        )
+        logger.error(f"Stream stalled during API call: {e}")
+    except ApiError as e:
+        error_message = e.body
+        
+        ## TODO: Send a more user-friendly error message to the frontend
 
-        # Check if the response is valid
-        if not streaming_response_is_ok(response):
-            logger.error(f"API response error: {response.status}")
-            error_message = response.body
-            
-            ## TODO: Send a more user-friendly error message to the frontend
-
-            # Yield an error chunk
-            yield ChunkedResponse(
-                type="chunk",
-                id=new_id("error-chunk"),
-                response_id=new_response_id,
-                content=f"\n\n**{error_message}**",
-                finish_reason="error"
-            )
-            raise HTTPException(response.status, error_message)
-
-        # Process the streaming response
-        async for response_stream_json in response.body:
-            try:
-                # Basic validation of the expected structure
-                if not isinstance(response_stream_json, dict) or "choices" not in response_stream_json:
-                    logger.warning(f"Unexpected stream item format: {response_stream_json}")
-                    continue
-
-                choice = response_stream_json["choices"][0]
-                delta = choice.get("delta", {})
-                chunk_content = delta.get("content", "")  # Default to empty string if None
-                finish_reason = choice.get("finish_reason")
-
-                # Create and yield a chunk response
-                chunk_response = ChunkedResponse(
-                    type="chunk",
-                    id=new_id("chunk"),
-                    response_id=new_response_id,
-                    content=chunk_content,
-                    finish_reason=finish_reason
-                )
-                
-                # Only log if it's the final chunk or has content
-                if finish_reason or chunk_content:
-                    logger.debug(f"Yielding chunk: content_length={len(chunk_content)}, finish_reason={finish_reason}")
-                
-                yield chunk_response
-
-            except (KeyError, IndexError, TypeError) as e:
-                logger.error(f"Error processing stream item: {e} - Item: {response_stream_json}")
-                continue  # Skip this item and try the next one
-            except Exception as e:
-                logger.error(f"Unexpected error processing stream: {e}")
-                raise  # Re-raise unexpected errors
-
-    except HTTPException as e:
-        # Already handled above with custom error chunk
+        # Yield an error chunk
+        yield ChunkedResponse(
+            type="chunk",
+            id=new_id("error-chunk"),
+            response_id=new_response_id,
+            content=f"\n\n**{error_message}**",
+            finish_reason="error",
+            chat_id=chat_id,
+        )
         logger.error(f"HTTP Exception during API call: {e}")
     except Exception as e:
         # Handle any other exceptions
@@ -160,15 +350,24 @@ async def Inference(messages: Messages, api_config: ApiConfig = None) -> AsyncGe
             id=new_id("error-chunk"),
             response_id=new_response_id,
             content=f"\n\n**An unexpected error occurred: {str(e)}**",
-            finish_reason="error"
+            finish_reason="error",
+            chat_id=chat_id,
         )
         raise
+    finally:
+        if attempt:
+            metrics.observe("inference.retries_per_response", attempt)
+        if control is not None:
+            await control.finish()
 
 
 # ---------------------------------------------------------------------
 # Processing Nodes
 # ---------------------------------------------------------------------
 
+# Recorded as the assistant turn when a generation is stopped before any content
+STOPPED_RESPONSE = "[stopped]"
+
 @node(stream_in=["chunks"])
 async def ChunkContents(chunks: Stream[ChunkedResponse]):
     """
@@ -182,8 +381,14 @@ async def ChunkContents(chunks: Stream[ChunkedResponse]):
         chunks: Stream of ChunkedResponse objects
         
     Yields:
-        str: The content from each chunk
+        str: The content from each chunk. A response stopped before any content
+        arrived yields STOPPED_RESPONSE instead, so ChatHistory still records an
+        assistant turn and the history keeps alternating between roles.
     """
+    has_content = False
     async for chunk in chunks:
         if chunk.content:  # Only yield non-empty content
-            yield chunk.content
\ No newline at end of file
+            has_content = True
+            yield chunk.content
+        elif chunk.finish_reason == "cancelled" and not has_content:
+            yield STOPPED_RESPONSE
\ No newline at end of file
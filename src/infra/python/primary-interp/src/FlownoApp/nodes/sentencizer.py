@@ -1,36 +1,75 @@
 """
 Sentence boundary detection using spaCy.
+
+spaCy and its model are only loaded once speech is enabled; see
+SpeechConfig.
 """
 import logging
+from typing import TYPE_CHECKING
 from flowno import Stream, node
 
+from FlownoApp.messages.domain_types import SpeechConfig
 from FlownoApp.messages.ipc_schema import ChunkedResponse, SentenceEvent, SentenceEventPayload
-from FlownoApp.utils.sentence_processor import SentenceProcessor
 from FlownoApp.nodes.inference import new_id
+from FlownoApp.services.offload import cpu_bound
+
+if TYPE_CHECKING:
+    from FlownoApp.utils.sentence_processor import SentenceProcessor, SentenceResult
 
 logger = logging.getLogger(__name__)
 
 
+# spaCy runs on the offload threads; one call at a time, since every lane shares its pipeline
+@cpu_bound(name="sentencizer_load", max_pending=1)
+def new_sentence_processor() -> "SentenceProcessor":
+    # The first call imports spaCy and loads its model
+    from FlownoApp.utils.sentence_processor import SentenceProcessor
+    return SentenceProcessor()
+
+
+@cpu_bound(name="sentencizer", max_pending=1)
+def split_sentences(
+    sentencizer: "SentenceProcessor", chunk: ChunkedResponse, stream_finished: bool, num_buffer_sentences: int
+) -> "SentenceResult":
+    return sentencizer.process_chunk(chunk, stream_finished=stream_finished, num_buffer_sentences=num_buffer_sentences)
+
+
 @node(stream_in=["chunks"])
-async def ChunkSentences(chunks: Stream[ChunkedResponse]):
+async def ChunkSentences(chunks: Stream[ChunkedResponse], speech: SpeechConfig | None = None):
     """
     Read a stream of text chunks and split them into sentences using spaCy.
+
+    With speech disabled the chunks are consumed without any segmentation.
+    The setting is read once per response.
     
     Args:
         chunks: The input text chunks to be segmented into sentences
+        speech: Whether sentences are spoken (always, if None)
         
     Yields:
         SentenceEvent: Event with sentence payload for TTS processing
     """
-    sentencizer = SentenceProcessor()
+    if speech is not None and not speech.enabled:
+        async for _ in chunks:
+            pass
+        return
+
+    sentencizer = await new_sentence_processor()
     num_buffer_sentences = 1
     # Counter for preserving sentence order
     sentence_order = 0
     
     async for chunk in chunks:
-        chunk_ids, sentence_text = sentencizer.process_chunk(
-            chunk, 
-            stream_finished=chunk.finish_reason is not None, 
+        if chunk.finish_reason == "cancelled":
+            # Generation was stopped (this is the final chunk): drop the
+            # unfinished sentence instead of speaking it
+            logger.debug("Generation cancelled, discarding buffered text")
+            continue
+
+        chunk_ids, sentence_text = await split_sentences(
+            sentencizer,
+            chunk,
+            stream_finished=chunk.finish_reason is not None,
             num_buffer_sentences=num_buffer_sentences
         )
         
@@ -45,7 +84,8 @@ async def ChunkSentences(chunks: Stream[ChunkedResponse]):
                 chunk_ids=chunk_ids,
                 text=sentence_text.strip(),
                 audio="",  # Empty for now, could be filled with pre-rendered audio
-                order=sentence_order
+                order=sentence_order,
+                chat_id=chunk.chat_id,
             )
             
             # Create the event
@@ -1,8 +1,23 @@
 """
 Services package for FlownoApp.
 
-This package will contain business logic services that aren't directly 
-part of the Flowno graph but provide functionality like persistence, 
-configuration management, etc.
+This package contains business logic services that aren't directly
+part of the Flowno graph but are used by its nodes:
+
+- llm_client: One-shot completion requests and abortable streaming clients
+- generation: Control handle for stopping the running generation
+- retry: Retry decisions and backoff for API requests
+- rate_limit: Client-side request and token budgets per API profile
+- scheduler: Priority-aware admission of every LLM request
+- sessions: Generation lanes and the router that spreads chats over them
+- sharding: Spreading chats over worker processes
+- interpreters: Subinterpreter pool for CPU-bound work
+- offload: @cpu_bound, which runs synchronous functions on thread or process pools
+- tts: Pluggable local speech synthesis engines for pre-rendering sentence audio
+- audio_cache: Memory and disk cache of synthesized sentence audio
+- audio_spool: Files that pass rendered audio to the frontend outside the JSON messages
+- outbox: The queue and writer task every message to the frontend goes through
+- metrics: Shared counters, gauges and timing summaries
+- summarizer: Background summarization of old conversation turns
+- retrieval: BM25 retrieval of relevant older turns
 """
-# No services implemented yet, but the package structure is ready for future expansion
\ No newline at end of file
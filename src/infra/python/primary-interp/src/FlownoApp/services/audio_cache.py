@@ -0,0 +1,157 @@
+"""
+Cache of synthesized sentence audio.
+
+Assistants repeat many short sentences ("Sure!", "Let me know if you have
+questions."), so rendered audio is cached by a hash of the engine, voice
+and text. The cache has two tiers: an LRU in memory and an optional
+size-capped directory on disk, which survives restarts.
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".audio"
+
+
+class AudioCache:
+    """
+    Two-tier LRU cache of audio bytes, safe to use from the offload threads.
+
+    Both tiers are bounded by their total size in bytes and evict the least
+    recently used entries first. A disk hit is copied into memory. Hits
+    and evictions per tier and misses are counted under `<name>.*`, and the
+    sizes of the tiers are published as `<name>.memory_bytes` and
+    `<name>.disk_bytes` gauges.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = 8 * 1024 * 1024,
+        directory: str | None = None,
+        disk_bytes: int = 256 * 1024 * 1024,
+        name: str = "tts_cache",
+    ):
+        """
+        Args:
+            memory_bytes: Size of the memory tier
+            directory: Directory of the disk tier (no disk tier if None)
+            disk_bytes: Size of the disk tier
+            name: Name of the metrics
+        """
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.name = name
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        # File sizes of the disk tier, least recently used first
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        if directory is not None:
+            self._load_directory()
+
+    @staticmethod
+    def key(engine: str, voice: str, text: str) -> str:
+        """Return the cache key of a sentence rendered by an engine and voice."""
+        return hashlib.sha256(f"{engine}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _load_directory(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len(SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.memory_bytes", self._memory_size)
+        metrics.set_gauge(f"{self.name}.disk_bytes", self._disk_size)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached audio of a key, or None on a miss."""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                metrics.increment(f"{self.name}.memory_hits")
+                return audio
+            if key in self._disk:
+                try:
+                    with open(self._path(key), "rb") as f:
+                        audio = f.read()
+                    os.utime(self._path(key))
+                except OSError as e:
+                    logger.warning(f"Dropping unreadable cached audio {key}: {e}")
+                    self._disk_size -= self._disk.pop(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, audio)
+                    metrics.increment(f"{self.name}.disk_hits")
+                    self._publish()
+                    return audio
+            metrics.increment(f"{self.name}.misses")
+            return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        """Store rendered audio in both tiers."""
+        with self._lock:
+            self._remember(key, audio)
+            if self.directory is not None and key not in self._disk and len(audio) <= self.disk_bytes:
+                self._write(key, audio)
+            self._publish()
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = audio
+        self._memory_size += len(audio)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            metrics.increment(f"{self.name}.memory_evictions")
+
+    def _write(self, key: str, audio: bytes) -> None:
+        # Written under a temporary name first, so a crash never leaves a truncated entry
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not cache audio on disk: {e}")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._disk[key] = len(audio)
+        self._disk_size += len(audio)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        while self._disk_size > self.disk_bytes:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            metrics.increment(f"{self.name}.disk_evictions")
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.warning(f"Could not remove cached audio {key}: {e}")
@@ -0,0 +1,98 @@
+"""
+Files that carry rendered audio to the frontend outside the JSON messages.
+
+Base64 in a JSON message makes audio a third larger and is copied several
+times on the way to the renderer. Instead, the audio is written to a file
+in a private spool directory (on /dev/shm where available, so it stays in
+memory), and the sentence message carries an AudioRef to it. The Electron
+main process reads the file and forwards the bytes. A file is removed once
+its sentence is done playing, given up or cancelled, and the directory is
+removed at exit.
+"""
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from ..messages.ipc_schema import AudioRef
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Memory-backed on Linux
+SHM_DIR = "/dev/shm"
+
+
+class AudioSpool:
+    """
+    A directory of audio files, one per sentence.
+
+    The directory is created on first use. The number and total size of the
+    files are published as `<name>.files` and `<name>.bytes` gauges, and
+    write times are recorded in the `<name>.write_seconds` summary.
+    """
+
+    def __init__(self, directory: str | None = None, name: str = "audio_spool"):
+        """
+        Args:
+            directory: Parent of the spool directory (/dev/shm or the temp directory if None)
+            name: Name of the metrics
+        """
+        self.parent = directory
+        self.name = name
+        self.path: str | None = None
+        self._files: dict[str, tuple[str, int]] = {}
+
+    def _directory(self) -> str:
+        if self.path is None:
+            parent = self.parent
+            if parent is None:
+                parent = SHM_DIR if os.access(SHM_DIR, os.W_OK) else tempfile.gettempdir()
+            self.path = tempfile.mkdtemp(prefix="flowno-audio-", dir=parent)
+            atexit.register(self.close)
+        return self.path
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.files", len(self._files))
+        metrics.set_gauge(f"{self.name}.bytes", sum(size for _, size in self._files.values()))
+
+    def write(self, key: str, audio: bytes, media_type: str) -> AudioRef:
+        """
+        Store the audio of a sentence and return the reference sent in its place.
+
+        Raises:
+            OSError: If the file cannot be written
+        """
+        started = time.perf_counter()
+        path = os.path.join(self._directory(), key)
+        with open(path, "wb") as f:
+            f.write(audio)
+        self._files[key] = (path, len(audio))
+        metrics.observe(f"{self.name}.write_seconds", time.perf_counter() - started)
+        self._publish()
+        return AudioRef(path=path, size=len(audio), media_type=media_type)
+
+    def remove(self, key: str) -> None:
+        """Delete the audio of a sentence, if there is any."""
+        entry = self._files.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(entry[0])
+        except OSError as e:
+            logger.warning(f"Could not remove spooled audio {entry[0]}: {e}")
+        self._publish()
+
+    def close(self) -> None:
+        """Delete the spool directory and every file in it."""
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+        self._files.clear()
+        self._publish()
+
+
+# Shared by every SentenceSpeaker of the process
+audio_spool = AudioSpool()
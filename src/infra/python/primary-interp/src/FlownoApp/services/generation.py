@@ -0,0 +1,99 @@
+"""
+Control handle for the in-flight LLM generation.
+"""
+from collections.abc import Awaitable, Callable
+import logging
+import time
+
+from flowno import Event, sleep
+
+from ..utils.stream_pump import StreamPump
+
+logger = logging.getLogger(__name__)
+
+# How often a wait of the generation checks whether it was stopped
+STOP_POLL = 0.05
+
+
+class GenerationCancelled(Exception):
+    """Raised inside Inference when the frontend asked to stop generating."""
+
+
+class GenerationControl:
+    """
+    Shared between the Inference node and IPC handlers so a running
+    generation can be cancelled.
+
+    Inference calls `begin()` when it starts a response, `attach()` once the
+    response stream is being read and `finish()` when it is done. Handlers
+    call `request_stop()`, which interrupts the stream and waits until
+    Inference has emitted its final chunk. Waits outside the stream (for
+    admission or a retry backoff) go through `on_stop()` and `sleep()` so a
+    stop ends them too.
+    """
+
+    def __init__(self):
+        # Chat the generation answers; set by SessionRouter when it hands out a prompt
+        self.chat_id: str | None = None
+        self.response_id: str | None = None
+        self.stop_requested: bool = False
+        self._pump: StreamPump | None = None
+        self._finished: Event | None = None
+        self._on_stop: list[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def is_active(self) -> bool:
+        """Whether a generation is currently running."""
+        return self.response_id is not None
+
+    def begin(self, response_id: str) -> None:
+        """Mark the start of a new generation."""
+        self.response_id = response_id
+        self.stop_requested = False
+        self._pump = None
+        self._finished = Event()
+        self._on_stop = []
+
+    def attach(self, pump: StreamPump) -> None:
+        """Register the stream being read so `request_stop()` can interrupt it."""
+        self._pump = pump
+
+    def on_stop(self, wake: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function `request_stop()` calls to wake up a wait of the generation."""
+        self._on_stop.append(wake)
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleep for `seconds`, returning early once a stop was requested."""
+        deadline = time.monotonic() + seconds
+        while not self.stop_requested and (remaining := deadline - time.monotonic()) > 0:
+            await sleep(min(remaining, STOP_POLL))
+
+    async def finish(self) -> None:
+        """Mark the current generation as done and wake up any stop requests."""
+        finished = self._finished
+        self.response_id = None
+        self._pump = None
+        self._finished = None
+        self._on_stop = []
+        if finished is not None:
+            await finished.set()
+
+    async def request_stop(self) -> bool:
+        """
+        Cancel the running generation and wait until Inference has wound down.
+
+        Returns:
+            bool: True if a generation was running, False otherwise
+        """
+        if not self.is_active or self._finished is None:
+            return False
+
+        finished = self._finished
+        self.stop_requested = True
+        logger.info(f"Stopping generation of {self.response_id}")
+        for wake in self._on_stop:
+            await wake()
+        if self._pump is not None:
+            await self._pump.interrupt(GenerationCancelled())
+        await finished.wait()
+        return True
@@ -0,0 +1,214 @@
+"""
+A pool of subinterpreters for CPU-bound work.
+
+Python 3.12 can give each subinterpreter its own GIL, so work running in one
+does not stall the event loop that serves IPC and streams responses. Each
+worker of the pool is a thread that owns one isolated subinterpreter. Calls
+and results cross the interpreter boundary as pickled bytes.
+
+Only pure-Python code runs in a subinterpreter: extension modules built
+without multi-interpreter support (numpy, spaCy) refuse to load there.
+Functions whose module cannot be imported, and every function when the
+running Python has no subinterpreter support, run on the worker thread in
+the main interpreter instead.
+"""
+from collections.abc import Callable
+import atexit
+import logging
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from typing import Any, TypeVar
+
+from flowno import Event, current_event_loop
+
+from .metrics import metrics
+
+try:
+    import _xxsubinterpreters as _interpreters
+    import _xxinterpchannels as _channels
+except ImportError:
+    _interpreters = None
+    _channels = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Top-level package of the app, and the directory it is imported from
+_PACKAGE = __name__.split(".")[0]
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run once in every new subinterpreter. Importing the real package would
+# create the app, so a bare package module stands in for it and only the
+# submodules that are needed get imported.
+_SETUP_SCRIPT = """
+import sys, types
+sys.path[:] = path.split(pathsep)
+package = types.ModuleType(package_name)
+package.__path__ = [package_dir]
+sys.modules[package_name] = package
+"""
+
+# Run for every call; `request` and `channel` are passed in by the worker
+_CALL_SCRIPT = """
+import importlib, pickle
+import _xxinterpchannels
+try:
+    try:
+        module_name, qualname, args = pickle.loads(request)
+        target = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            target = getattr(target, part)
+    except ImportError as e:
+        response = pickle.dumps(("unsupported", str(e).strip().splitlines()[-1]))
+    else:
+        response = pickle.dumps(("ok", target(*args)))
+except Exception as e:
+    try:
+        response = pickle.dumps(("error", e))
+    except Exception:
+        response = pickle.dumps(("error", RuntimeError(repr(e))))
+_xxinterpchannels.send(channel, response)
+"""
+
+
+def subinterpreters_available() -> bool:
+    """Whether this Python can run subinterpreters with their own GIL."""
+    return _interpreters is not None and sys.version_info >= (3, 12)
+
+
+class _Job:
+    """One call waiting for, or running on, a worker."""
+
+    def __init__(self, func: Callable[..., Any], args: tuple[Any, ...]):
+        self.func = func
+        self.args = args
+        self.loop = current_event_loop()
+        self.done = Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.isolated = False
+        self.enqueued_at = time.monotonic()
+        self.started_at = 0.0
+
+    async def finish(self) -> None:
+        """Wake the task awaiting the job (runs on the event loop)."""
+        await self.done.set()
+
+
+class SubinterpreterPool:
+    """
+    Runs functions on a fixed number of worker threads, each with its own
+    subinterpreter.
+
+    Functions must be importable by module and qualified name, and their
+    arguments and results picklable. Workers are started on the first call.
+    """
+
+    def __init__(self, size: int = 2, isolated: bool = True):
+        """
+        Args:
+            size: Number of workers (and subinterpreters)
+            isolated: Run functions in subinterpreters where possible; if
+                False every function runs on the worker threads in the main
+                interpreter
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.isolated = isolated and subinterpreters_available()
+        self._jobs: queue.SimpleQueue[_Job | None] = queue.SimpleQueue()
+        self._workers: list[threading.Thread] = []
+        # "module:qualname" of functions that could not be loaded in a subinterpreter
+        self._unsupported: set[str] = set()
+        self._closed = False
+
+    def _start(self) -> None:
+        for i in range(self.size):
+            worker = threading.Thread(target=self._work, name=f"interpreter-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        # Python aborts at exit while a subinterpreter is still alive
+        atexit.register(self.close)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run func(*args) on a worker and wait for its result without blocking the event loop.
+
+        Exceptions raised by func are re-raised here.
+        """
+        if self._closed:
+            raise RuntimeError("SubinterpreterPool is closed")
+        if not self._workers:
+            self._start()
+        job = _Job(func, args)
+        self._jobs.put(job)
+        metrics.set_gauge("interpreters.queued", self._jobs.qsize())
+        await job.done.wait()
+
+        metrics.increment("interpreters.isolated_calls" if job.isolated else "interpreters.thread_calls")
+        metrics.observe("interpreters.queue_wait_seconds", job.started_at - job.enqueued_at)
+        metrics.observe("interpreters.run_seconds", time.monotonic() - job.started_at)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Stop the workers once the queued calls have run, and destroy their subinterpreters."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _work(self) -> None:
+        """Worker thread: run jobs until close()."""
+        interpreter = channel = None
+        if self.isolated:
+            try:
+                interpreter = _interpreters.create(isolated=True)
+                _interpreters.run_string(interpreter, _SETUP_SCRIPT, {
+                    "path": os.pathsep.join(p for p in sys.path if p),
+                    "pathsep": os.pathsep,
+                    "package_name": _PACKAGE,
+                    "package_dir": _PACKAGE_DIR,
+                })
+                channel = _channels.create()
+            except Exception as e:
+                logger.warning(f"Could not create a subinterpreter, running in threads: {e}")
+                interpreter = None
+
+        while (job := self._jobs.get()) is not None:
+            job.started_at = time.monotonic()
+            try:
+                job.result = self._call(interpreter, channel, job)
+            except BaseException as e:
+                job.error = e
+            job.loop.create_task(job.finish())
+
+        if interpreter is not None:
+            _channels.destroy(channel)
+            _interpreters.destroy(interpreter)
+
+    def _call(self, interpreter: Any, channel: Any, job: _Job) -> Any:
+        key = f"{job.func.__module__}:{job.func.__qualname__}"
+        if interpreter is None or key in self._unsupported:
+            return job.func(*job.args)
+
+        request = pickle.dumps((job.func.__module__, job.func.__qualname__, job.args))
+        _interpreters.run_string(interpreter, _CALL_SCRIPT, {"request": request, "channel": int(channel)})
+        status, value = pickle.loads(_channels.recv(channel))
+        if status == "unsupported":
+            logger.warning(f"{key} cannot run in a subinterpreter ({value}); running it in a thread")
+            self._unsupported.add(key)
+            return job.func(*job.args)
+        if status == "error":
+            raise value
+        job.isolated = True
+        return value
@@ -0,0 +1,152 @@
+"""
+Helpers for talking to the OpenAI-compatible chat completions API.
+
+The streaming path used for interactive turns lives in the Inference node.
+This module holds the pieces shared by everything else that needs to call
+the model (summaries, titles, ...).
+"""
+import logging
+import socket
+from typing import Any
+
+from flowno.io import HttpClient, Headers
+from flowno.core.event_loop.selectors import SocketHandle
+
+from ..messages.domain_types import Messages, ApiConfig
+from ..messages.encoders import MessageJSONEncoder
+from .rate_limit import estimate_tokens
+from .scheduler import RequestScheduler, Priority
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionError(Exception):
+    """Raised when a non-streaming completion request fails."""
+
+
+class ApiError(Exception):
+    """Raised when the API answers a streaming request with an error status."""
+    def __init__(self, status: str, body: str | bytes, retry_after: float | None = None):
+        super().__init__(f"{status}: {body!r}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        """The numeric code of the HTTP status line (0 if it cannot be parsed)."""
+        parts = self.status.split()
+        return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+
+class AbortableHttpClient(HttpClient):
+    """
+    HttpClient whose streaming request can be aborted from another task.
+
+    HttpClient keeps the request's socket local to stream_request(), so it is
+    captured when the request starts. `abort()` shuts the socket down instead
+    of closing it: a task parked in recv() is woken by the end of stream and
+    unwinds normally, while closing would leave it registered on a dead file
+    descriptor.
+    """
+
+    def __init__(self, headers: Headers | None = None):
+        super().__init__(headers=headers)
+        self.aborted = False
+        self._sock: SocketHandle | None = None
+
+    def _reset_stream_tracking(self, sock: SocketHandle) -> None:
+        super()._reset_stream_tracking(sock)
+        self._sock = sock
+        if self.aborted:
+            self._shutdown()
+
+    def abort(self) -> None:
+        """Drop the connection of the current (or next) streaming request."""
+        self.aborted = True
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        if self._sock is None:
+            return
+        try:
+            self._sock.socket.shutdown(socket.SHUT_RDWR)
+        except OSError as e:
+            # Already disconnected
+            logger.debug(f"Error shutting down stream socket: {e}")
+
+
+def create_client(api_config: ApiConfig) -> HttpClient:
+    """
+    Create an HttpClient authorised for the configured API.
+
+    HttpClient keeps per-request stream state on the instance, so callers
+    that may run concurrently with the Inference node need their own client.
+
+    Args:
+        api_config: The API configuration to take the token from
+
+    Returns:
+        HttpClient: A client that encodes Message objects for the API
+    """
+    headers = Headers()
+    if api_config.token:
+        headers.set("Authorization", f"Bearer {api_config.token}")
+    client = HttpClient(headers=headers)
+    client.json_encoder = MessageJSONEncoder()
+    return client
+
+
+async def complete(
+    messages: Messages,
+    api_config: ApiConfig,
+    model: str | None = None,
+    max_tokens: int | None = None,
+    scheduler: RequestScheduler | None = None,
+    priority: Priority = Priority.BACKGROUND,
+) -> str:
+    """
+    Run a single non-streaming chat completion.
+
+    Args:
+        messages: The messages to send
+        api_config: API endpoint and credentials
+        model: Model override (defaults to api_config.model)
+        max_tokens: Optional cap on the length of the completion
+        scheduler: Optional scheduler the request is admitted by
+        priority: Priority class of the request (one-shot completions are
+            usually background work)
+
+    Returns:
+        str: The content of the first choice
+
+    Raises:
+        CompletionError: If the API returns an error or an unexpected body
+    """
+    client = create_client(api_config)
+    request: dict[str, Any] = {
+        "messages": messages,
+        "model": model or api_config.model,
+        "stream": False,
+    }
+    if max_tokens is not None:
+        request["max_tokens"] = max_tokens
+
+    if scheduler is not None:
+        await scheduler.acquire(
+            api_config.url, api_config.token, estimate_tokens(messages) + (max_tokens or 0), priority
+        )
+    try:
+        response = await client.post(api_config.url, json=request)
+    finally:
+        if scheduler is not None:
+            await scheduler.release(priority)
+    if not response.is_ok:
+        logger.error(f"Completion request failed: {response.status}")
+        raise CompletionError(f"Completion request failed: {response.status}")
+
+    try:
+        body = response.decode_json()
+        return body["choices"][0]["message"]["content"] or ""
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise CompletionError(f"Unexpected completion response: {e}") from e
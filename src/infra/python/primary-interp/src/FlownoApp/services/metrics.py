@@ -0,0 +1,92 @@
+"""
+In-process counters, gauges and timing summaries.
+
+Nodes and services record into the module-level `metrics` registry; the
+frontend can read a snapshot with a 'get-metrics' message.
+"""
+from dataclasses import dataclass
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Summary:
+    """Running count, total and maximum of an observed value."""
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Metrics:
+    """
+    A registry of named metrics.
+
+    Names are dotted paths such as "inference.retries". Metrics are created on
+    first use, so recording never fails. Recording and snapshots are
+    thread-safe: the outbox's writer thread records the encoder's metrics
+    while the event loop records and reads its own.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, float] = {}
+        self.summaries: dict[str, Summary] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add amount to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (e.g. a latency in seconds) of a summary."""
+        with self._lock:
+            summary = self.summaries.get(name)
+            if summary is None:
+                summary = self.summaries[name] = Summary()
+            summary.observe(value)
+
+    def snapshot(self) -> dict[str, dict[str, object]]:
+        """
+        Return a JSON-serializable copy of every metric.
+
+        Returns:
+            dict: {"counters": {...}, "gauges": {...}, "summaries": {name: {count, total, mean, max}}}
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "summaries": {
+                    name: {"count": s.count, "total": s.total, "mean": s.mean, "max": s.max}
+                    for name, s in self.summaries.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.summaries.clear()
+
+
+# Shared registry used throughout FlownoApp
+metrics = Metrics()
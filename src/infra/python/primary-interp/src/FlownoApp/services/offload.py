@@ -0,0 +1,232 @@
+"""
+Running CPU-bound synchronous code off the event loop.
+
+The Flowno event loop also serves IPC, so a node that computes for a while
+delays every other message. Decorating a synchronous function with
+`@cpu_bound` turns it into an awaitable that runs on a shared, bounded
+thread or process pool:
+
+    @cpu_bound(name="sentencizer")
+    def split_sentences(processor, chunk, ...):
+        ...
+
+    sentences = await split_sentences(processor, chunk, ...)
+
+Each decorated function limits how many of its calls are queued or running
+at once (`max_pending`), and records its queue depth, wait and run times
+under `offload.<name>.*`. Calls that have not started yet can be cancelled
+with `cancel_pending()`; their callers get OffloadCancelled.
+"""
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import types
+from typing import Any, Generic, Literal, ParamSpec, TypeVar
+
+from flowno import Condition, Event, current_event_loop
+
+from ..messages.domain_types import OffloadConfig
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+ExecutorKind = Literal["thread", "process"]
+
+_config = OffloadConfig()
+_executors: dict[str, Executor] = {}
+
+# Run first in every pool process: a bare package module stands in for the
+# app package, whose __init__ would create the app
+_PROCESS_SETUP = """
+import sys, types
+package = types.ModuleType({package!r})
+package.__path__ = [{package_dir!r}]
+sys.modules.setdefault({package!r}, package)
+"""
+
+
+class OffloadCancelled(Exception):
+    """Raised from an offloaded call that was cancelled before it started."""
+
+
+def configure(config: OffloadConfig) -> None:
+    """Set the pool sizes; pools that already exist keep their size."""
+    global _config
+    _config = config
+
+
+def get_executor(kind: ExecutorKind) -> Executor:
+    """Return the shared pool of a kind, creating it on first use."""
+    executor = _executors.get(kind)
+    if executor is not None:
+        return executor
+    if kind == "thread":
+        executor = ThreadPoolExecutor(_config.thread_workers, thread_name_prefix="offload")
+    elif kind == "process":
+        # Spawned, not forked: the embedding process runs other threads
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(os.environ.get("FLOWNO_WORKER_PYTHON") or sys.executable)
+        setup = _PROCESS_SETUP.format(
+            package=__name__.split(".")[0],
+            package_dir=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        executor = ProcessPoolExecutor(
+            _config.process_workers, mp_context=context, initializer=exec, initargs=(setup,)
+        )
+    else:
+        raise ValueError(f"Unknown executor kind: {kind}")
+    _executors[kind] = executor
+    return executor
+
+
+def shutdown() -> None:
+    """Shut down the shared pools, cancelling calls that have not started."""
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+
+async def wait_for_future(future: Future) -> None:
+    """Wait without blocking the event loop until a future finished by another thread is done."""
+    # The pool finishes the future on another thread; wake this task through the loop
+    loop = current_event_loop()
+    done = Event()
+
+    async def wake() -> None:
+        await done.set()
+
+    future.add_done_callback(lambda _: loop.create_task(wake()))
+    await done.wait()
+
+
+def _timed_call(target: Callable[..., R] | tuple[str, str], args: tuple, kwargs: dict) -> tuple[float, R]:
+    """Run a call on a pool worker and measure it; processes get the function by name."""
+    if isinstance(target, tuple):
+        module_name, qualname = target
+        func: Any = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            func = getattr(func, part)
+        # The module attribute is the decorated CpuBound
+        target = getattr(func, "func", func)
+    started = time.perf_counter()
+    result = target(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+class CpuBound(Generic[P, R]):
+    """
+    A synchronous function whose calls run on a pool and are awaited.
+
+    Created by `cpu_bound`. The undecorated function stays available as
+    `.func`. Functions run on the process pool must be defined at module
+    level, and their arguments and results must be picklable.
+    """
+
+    def __init__(
+        self,
+        func: Callable[P, R],
+        executor: ExecutorKind = "thread",
+        max_pending: int | None = None,
+        name: str | None = None,
+    ):
+        """
+        Args:
+            func: The synchronous function
+            executor: "thread" or "process"
+            max_pending: Calls of this function queued or running at once
+                (OffloadConfig.max_pending if None); further callers wait
+            name: Name of the metrics (the function's name if None)
+        """
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.executor = executor
+        self.max_pending = max_pending
+        self.name = name or func.__name__
+        self._pending: set[Future] = set()
+        self._waiting = 0
+        self._slots = Condition()
+
+    def __get__(self, obj: Any, objtype: type | None = None) -> Any:
+        # Decorated methods receive their instance like plain functions do
+        return self if obj is None else types.MethodType(self, obj)
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"offload.{self.name}.waiting", self._waiting)
+        metrics.set_gauge(f"offload.{self.name}.in_flight", len(self._pending))
+
+    def _submit(self, args: tuple, kwargs: dict) -> Future:
+        target: Callable[..., R] | tuple[str, str] = self.func
+        if self.executor == "process":
+            target = (self.func.__module__, self.func.__qualname__)
+        return get_executor(self.executor).submit(_timed_call, target, args, kwargs)
+
+    async def __call__(self, *args: P.args, **kwargs: P.kwargs) -> R:
+        limit = self.max_pending or _config.max_pending
+        async with self._slots:
+            self._waiting += 1
+            self._publish()
+            while len(self._pending) >= limit:
+                await self._slots.wait()
+            self._waiting -= 1
+            submitted = time.perf_counter()
+            future = self._submit(args, kwargs)
+            self._pending.add(future)
+            self._publish()
+
+        await wait_for_future(future)
+
+        async with self._slots:
+            self._pending.discard(future)
+            self._publish()
+            await self._slots.notify_all()
+
+        metrics.increment(f"offload.{self.name}.calls")
+        if future.cancelled():
+            metrics.increment(f"offload.{self.name}.cancelled")
+            raise OffloadCancelled(f"{self.name} was cancelled before it started")
+        if future.exception() is not None:
+            metrics.increment(f"offload.{self.name}.errors")
+            raise future.exception()
+        run_seconds, result = future.result()
+        metrics.observe(f"offload.{self.name}.run_seconds", run_seconds)
+        metrics.observe(f"offload.{self.name}.wait_seconds", time.perf_counter() - submitted - run_seconds)
+        return result
+
+    def cancel_pending(self) -> int:
+        """
+        Cancel the calls that are still queued in the pool.
+
+        Calls that already run cannot be interrupted and finish normally.
+
+        Returns:
+            int: Number of calls cancelled
+        """
+        return sum(future.cancel() for future in list(self._pending))
+
+
+def cpu_bound(
+    func: Callable[P, R] | None = None,
+    *,
+    executor: ExecutorKind = "thread",
+    max_pending: int | None = None,
+    name: str | None = None,
+) -> Any:
+    """
+    Mark a synchronous function as CPU-bound; calling it returns an awaitable.
+
+    Usable bare (`@cpu_bound`) or with arguments (`@cpu_bound(executor="process")`).
+    See CpuBound for the arguments.
+    """
+    def decorate(func: Callable[P, R]) -> CpuBound[P, R]:
+        return CpuBound(func, executor, max_pending, name)
+
+    return decorate(func) if func is not None else decorate
@@ -0,0 +1,163 @@
+"""
+The single path of every message sent to the frontend.
+
+Nodes and handlers used to call `nodejs_callback_bridge.send_message()`
+themselves, so encoding a large message, or a bridge that blocks (the shard
+socket's `sendall()` does once the primary interpreter stops reading),
+stalled whatever called it. Now they `await outbox.send(message)`. The
+message is queued, and a writer task hands the queued messages over in
+batches to the outbox's writer thread, which encodes and sends them in
+order. The event loop keeps serving other work while a batch is written.
+The bridge's thread-safe function is created for a single calling thread,
+so every message is sent from that one thread, never from a shared pool.
+
+Control messages (acknowledgements, errors, replies to settings changes)
+have a lane of their own, which the writer empties before it takes bulk
+messages (chunks, sentences, chat histories), so they are not held up
+behind a long response.
+
+A batch of more than one message crosses the bridge as one `batch`
+envelope (`{"type": "batch", "messages": [...]}`), which the Electron main
+process forwards to the renderer as is and the preload script unpacks.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+from typing import Any
+
+from flowno import spawn
+import nodejs_callback_bridge
+
+from ..messages.ipc_schema import BatchMessage
+from ..utils.bounded_queue import BoundedQueue
+from .metrics import metrics
+from .offload import wait_for_future
+
+logger = logging.getLogger(__name__)
+
+# Messages waiting for the writer before senders wait for room
+OUTBOX_SIZE = 256
+# Control messages waiting for the writer before senders wait for room
+CONTROL_LANE_SIZE = 64
+# Messages written ahead of the bulk lane
+CONTROL_MESSAGES = frozenset({"ack", "error", "generation-stopped", "api-config"})
+# Messages handed to the writer thread at a time
+MAX_BATCH = 64
+
+
+def message_type(message: Any) -> str | None:
+    """Return the type of a message object, or of a message forwarded as a dict."""
+    return message.get("type") if isinstance(message, dict) else getattr(message, "type", None)
+
+
+def write_batch(messages: list[Any], envelope: bool = True) -> int:
+    """
+    Encode and send messages; runs on the writer thread.
+
+    Args:
+        messages: The messages, in order
+        envelope: Send several messages as one batch envelope
+
+    Returns:
+        int: The number of messages the bridge failed to send
+    """
+    if envelope and len(messages) > 1:
+        try:
+            nodejs_callback_bridge.send_message(BatchMessage(type="batch", messages=messages))
+            return 0
+        except Exception as e:
+            # Send them one by one, so only the message at fault is lost
+            logger.error(f"Failed to send a batch of {len(messages)} messages: {e}")
+    errors = 0
+    for message in messages:
+        try:
+            nodejs_callback_bridge.send_message(message)
+        except Exception as e:
+            errors += 1
+            logger.error(f"Failed to send {message_type(message) or type(message).__name__}: {e}")
+    return errors
+
+
+class Outbox:
+    """
+    Bounded queues of outbound messages and the task that writes them.
+
+    Messages whose type is in `control_messages` go to the control lane,
+    all others to the bulk lane. `send()` waits only while the message's
+    lane is full. Each batch starts with the queued control messages and
+    is filled up with bulk messages. The writer is started by the first
+    message and stops once both lanes are empty. The lane depths are the
+    `queues.<name>.control.depth` and `queues.<name>.bulk.depth` gauges.
+    Batch sizes, the time the writer thread took per batch and the time per
+    lane from `send()` until a message was written are recorded in the
+    `<name>.batch_size`, `<name>.write_seconds` and
+    `<name>.<lane>.latency_seconds` summaries, and failed sends are counted
+    as `<name>.errors`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = OUTBOX_SIZE,
+        max_batch: int = MAX_BATCH,
+        name: str = "outbox",
+        control_messages: frozenset[str] = CONTROL_MESSAGES,
+        envelopes: bool = True,
+    ):
+        """
+        Args:
+            maxsize: Queued bulk messages before senders wait
+            max_batch: Messages written per batch
+            name: Name of the queues and the metrics
+            control_messages: Types of the messages written ahead of the others
+            envelopes: Send each batch as one envelope instead of message by message
+        """
+        self.name = name
+        self.max_batch = max_batch
+        self.envelopes = envelopes
+        self.control_messages = control_messages
+        # Each message with the time it was sent
+        self.control: BoundedQueue[tuple[Any, float]] = BoundedQueue(CONTROL_LANE_SIZE, "block", f"{name}.control")
+        self.bulk: BoundedQueue[tuple[Any, float]] = BoundedQueue(maxsize, "block", f"{name}.bulk")
+        self.writing = False
+        # One thread writes every batch, in order; it is started by the first one
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix=f"{name}-writer")
+
+    def __len__(self) -> int:
+        return len(self.control.items) + len(self.bulk.items)
+
+    async def send(self, message: Any) -> None:
+        """Queue a message for the frontend, waiting while its lane is full."""
+        lane = self.control if message_type(message) in self.control_messages else self.bulk
+        await lane.put((message, time.perf_counter()))
+        if not self.writing:
+            self.writing = True
+            await spawn(self._write())
+
+    async def _take(self, lane: BoundedQueue[tuple[Any, float]], count: int) -> list[tuple[Any, float]]:
+        return [await lane.get() for _ in range(min(len(lane.items), count))]
+
+    async def _write(self) -> None:
+        try:
+            while len(self):
+                control = await self._take(self.control, self.max_batch)
+                bulk = await self._take(self.bulk, self.max_batch - len(control))
+                metrics.observe(f"{self.name}.batch_size", len(control) + len(bulk))
+                started = time.perf_counter()
+                future = self._writer.submit(write_batch, [message for message, _ in control + bulk], self.envelopes)
+                await wait_for_future(future)
+                errors = future.result()
+                metrics.observe(f"{self.name}.write_seconds", time.perf_counter() - started)
+                if errors:
+                    metrics.increment(f"{self.name}.errors", errors)
+                written = time.perf_counter()
+                for lane, batch in (("control", control), ("bulk", bulk)):
+                    for _, sent_at in batch:
+                        metrics.observe(f"{self.name}.{lane}.latency_seconds", written - sent_at)
+        except Exception as e:
+            logger.error(f"{self.name} writer failed: {e}")
+        finally:
+            self.writing = False
+
+
+# Shared by every node and handler of the process
+outbox = Outbox()
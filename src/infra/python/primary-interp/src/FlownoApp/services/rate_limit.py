@@ -0,0 +1,76 @@
+"""
+Client-side rate limits of LLM API requests.
+
+Providers such as Groq limit requests and tokens per minute per API key.
+RequestScheduler (services/scheduler.py) uses these buckets to delay
+requests instead of sending a burst and failing it with 429s.
+"""
+import logging
+import time
+
+from ..messages.domain_types import Messages, RateLimitConfig
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters for English text
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format (role markers etc.)
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(messages: Messages) -> int:
+    """Estimate the prompt tokens of a list of messages without a tokenizer."""
+    return sum(len(msg.content) // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE for msg in messages)
+
+
+class TokenBucket:
+    """
+    A budget of `per_minute` units that refills continuously.
+
+    The bucket starts full and holds at most one minute's budget, so a quiet
+    client may burst up to the full per-minute limit.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (requests above capacity wait for a full bucket)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0.0) / self.rate
+
+    def consume(self, amount: float, now: float) -> None:
+        """Take amount units; the balance may go negative for oversized requests."""
+        self._refill(now)
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """Request and token buckets of one API profile."""
+
+    def __init__(self, config: RateLimitConfig):
+        self.requests = TokenBucket(config.requests_per_minute) if config.requests_per_minute else None
+        self.tokens = TokenBucket(config.tokens_per_minute) if config.tokens_per_minute else None
+
+    def delay_for(self, estimated_tokens: int, now: float) -> float:
+        """Seconds until a request of estimated_tokens fits into both budgets."""
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay_for(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay_for(estimated_tokens, now))
+        return delay
+
+    def consume(self, estimated_tokens: int, now: float) -> None:
+        if self.requests is not None:
+            self.requests.consume(1, now)
+        if self.tokens is not None:
+            self.tokens.consume(estimated_tokens, now)
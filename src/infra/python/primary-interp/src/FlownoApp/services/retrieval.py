@@ -0,0 +1,288 @@
+"""
+BM25 retrieval of relevant older turns for long conversations.
+
+Each chat session gets an incremental inverted index over its messages. The
+index only indexes the messages appended since the previous turn and scoring
+only touches the postings of the query terms, so the work per turn does not
+grow with the length of the chat. Checking that the history still extends
+what was indexed only compares the count and the last indexed message;
+code that edits or deletes earlier messages calls `forget()`.
+"""
+from collections import OrderedDict
+import logging
+import math
+
+import numpy as np
+
+from ..messages.domain_types import Message, Messages, AppState
+from ..utils.terms import STOP_WORDS, tokenize, tokenize_all
+from .interpreters import SubinterpreterPool
+
+logger = logging.getLogger(__name__)
+
+# Fewer new messages than this are tokenized on the event loop
+OFFLOAD_MIN_MESSAGES = 16
+
+class _Postings:
+    """Growable numpy arrays of (document, term frequency) pairs for one term."""
+    __slots__ = ("docs", "tfs", "size")
+
+    def __init__(self):
+        self.docs = np.empty(4, dtype=np.int32)
+        self.tfs = np.empty(4, dtype=np.float32)
+        self.size = 0
+
+    def append(self, doc: int, tf: int) -> None:
+        if self.size == len(self.docs):
+            self.docs = np.resize(self.docs, self.size * 2)
+            self.tfs = np.resize(self.tfs, self.size * 2)
+        self.docs[self.size] = doc
+        self.tfs[self.size] = tf
+        self.size += 1
+
+
+class BM25Index:
+    """
+    Append-only inverted index with Okapi BM25 scoring.
+
+    Documents are identified by their insertion position. Adding a document
+    costs O(its length); scoring a query costs O(postings of its terms).
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: list[str] = []
+        self._postings: dict[str, _Postings] = {}
+        self._lengths = np.empty(16, dtype=np.float32)
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: str, text: str, terms: list[str] | None = None) -> None:
+        """
+        Index one document.
+
+        Args:
+            doc_id: Identifier of the document (the message ID)
+            text: The document text
+            terms: tokenize(text), if it was already computed
+        """
+        doc = len(self.doc_ids)
+        if terms is None:
+            terms = tokenize(text)
+        counts: dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(doc, tf)
+
+        if doc == len(self._lengths):
+            self._lengths = np.resize(self._lengths, doc * 2)
+        self._lengths[doc] = len(terms)
+        self._total_length += len(terms)
+        self.doc_ids.append(doc_id)
+
+    def search(self, query: str, top_k: int, limit: int | None = None, start: int = 0) -> list[int]:
+        """
+        Find the documents most relevant to a query.
+
+        Args:
+            query: The query text
+            top_k: Maximum number of documents to return
+            limit: Only consider documents with a position below limit
+            start: Only consider documents at or after this position
+
+        Returns:
+            list[int]: Positions of the best matching documents, best first
+        """
+        num_docs = len(self.doc_ids)
+        if top_k <= 0 or num_docs == 0:
+            return []
+        limit = num_docs if limit is None else min(limit, num_docs)
+        avg_length = self._total_length / num_docs or 1.0
+
+        doc_parts: list[np.ndarray] = []
+        score_parts: list[np.ndarray] = []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = postings.docs[:postings.size]
+            tfs = postings.tfs[:postings.size]
+            # Postings are in insertion order, so [start, limit) is a slice
+            begin = int(np.searchsorted(docs, start))
+            end = int(np.searchsorted(docs, limit))
+            if begin >= end:
+                continue
+            docs, tfs = docs[begin:end], tfs[begin:end]
+            df = postings.size
+            idf = math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self._lengths[docs] / avg_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        if not doc_parts:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        np.add.at(scores, inverse, np.concatenate(score_parts))
+
+        if len(candidates) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [int(candidates[i]) for i in best]
+
+
+class HistoryRetriever:
+    """
+    Keeps a BM25Index per chat session and splices relevant older turns into
+    the context sent to the LLM.
+    """
+
+    def __init__(self, app_state: AppState, max_sessions: int = 32, pool: SubinterpreterPool | None = None):
+        """
+        Args:
+            app_state: Application state (for the current chat and ContextConfig)
+            max_sessions: Number of session indexes kept before the least
+                recently used one is dropped
+            pool: Optional pool that tokenizes large batches of new messages
+                off the event loop (see `prepare()`)
+        """
+        self.app_state = app_state
+        self.max_sessions = max_sessions
+        self.pool = pool
+        # session id -> (index, fingerprint of the last message it covers)
+        self._indexes: OrderedDict[str, tuple[BM25Index, tuple[str, str, str] | None]] = OrderedDict()
+
+    @staticmethod
+    def fingerprint(msg: Message) -> tuple[str, str, str]:
+        """The ID, role and content of a message."""
+        return (msg.id, msg.role, msg.content)
+
+    def _indexed(self, session_id: str, messages: Messages) -> BM25Index:
+        """
+        Return the session's index if it still covers a prefix of messages, else a new one.
+
+        The index is rebuilt if the history is shorter than what was indexed
+        or its last indexed message changed, for example after the last turn
+        was regenerated. The check costs O(1) in the length of the chat, so
+        edits of earlier messages have to be reported with `forget()`.
+        """
+        entry = self._indexes.get(session_id)
+        if entry is None:
+            return BM25Index()
+        self._indexes.move_to_end(session_id)
+        index, last = entry
+        indexed = len(index)
+        if indexed > len(messages) or (indexed and self.fingerprint(messages[indexed - 1]) != last):
+            logger.debug(f"History of {session_id} diverged from its index; rebuilding")
+            return BM25Index()
+        return index
+
+    def _keep(self, session_id: str, index: BM25Index, messages: Messages) -> None:
+        last = self.fingerprint(messages[len(index) - 1]) if len(index) else None
+        self._indexes[session_id] = (index, last)
+        self._indexes.move_to_end(session_id)
+        while len(self._indexes) > self.max_sessions:
+            self._indexes.popitem(last=False)
+
+    def index_for(self, session_id: str, messages: Messages) -> BM25Index:
+        """Return the session's index, indexing any messages appended since the last call."""
+        index = self._indexed(session_id, messages)
+        for msg in messages[len(index):]:
+            index.add(msg.id, msg.content)
+        self._keep(session_id, index, messages)
+        return index
+
+    async def prepare(self, messages: Messages, session_id: str | None = None) -> None:
+        """
+        Index a large batch of unindexed messages with the tokenizing done in the pool.
+
+        A session that was torn down is re-indexed from its whole history on
+        its next turn; tokenizing that in the pool keeps the event loop free.
+        Small batches are left to `select()`.
+        """
+        if self.pool is None or self.app_state.context_config.retrieval_top_k <= 0:
+            return
+        session_id = session_id or self.app_state.current_chat_id or "default"
+        index = self._indexed(session_id, messages)
+        pending = messages[len(index):]
+        if len(pending) < OFFLOAD_MIN_MESSAGES:
+            return
+        terms = await self.pool.run(tokenize_all, [msg.content for msg in pending])
+        for msg, msg_terms in zip(pending, terms):
+            index.add(msg.id, msg.content, msg_terms)
+        self._keep(session_id, index, messages)
+
+    def session_index(self, session_id: str) -> BM25Index | None:
+        """Return the session's index if one is kept."""
+        entry = self._indexes.get(session_id)
+        return entry[0] if entry is not None else None
+
+    def forget(self, session_id: str) -> None:
+        """
+        Drop the session's index; it is rebuilt when the session is used again.
+
+        Called when the session is torn down and whenever messages of its
+        history are edited or deleted.
+        """
+        self._indexes.pop(session_id, None)
+
+    def select(
+        self, messages: Messages, context: Messages, start: int = 0, session_id: str | None = None
+    ) -> Messages:
+        """
+        Replace the older part of context with the turns most relevant to the latest prompt.
+
+        Args:
+            messages: The full conversation history
+            context: The context built so far (system messages, optional summary
+                note, then conversation turns)
+            start: Position in messages of the first turn not covered by a
+                summary; earlier turns are never retrieved
+            session_id: Chat the history belongs to (defaults to the current chat)
+
+        Returns:
+            Messages: Leading system messages, the retrieved older turns in
+            chronological order and the recent window
+        """
+        config = self.app_state.context_config
+        if config.retrieval_top_k <= 0 or not messages:
+            return context
+
+        session_id = session_id or self.app_state.current_chat_id or "default"
+        index = self.index_for(session_id, messages)
+
+        recent_start = max(len(messages) - config.keep_recent, start)
+        query = next((m.content for m in reversed(messages) if m.role == "user"), "")
+        hits = index.search(query, config.retrieval_top_k, limit=recent_start, start=start)
+
+        # Expand each hit to its whole user/assistant exchange
+        selected: set[int] = set()
+        for hit in hits:
+            if messages[hit].role == "system":
+                continue
+            selected.add(hit)
+            partner = hit + 1 if messages[hit].role == "user" else hit - 1
+            if start <= partner < recent_start and messages[partner].role != "system":
+                selected.add(partner)
+
+        head_len = 0
+        while head_len < len(context) and context[head_len].role == "system":
+            head_len += 1
+        head = context[:head_len]
+        head_ids = {m.id for m in head}
+
+        retrieved = [messages[i] for i in sorted(selected) if messages[i].id not in head_ids]
+        recent = [m for m in messages[recent_start:] if m.id not in head_ids]
+        if retrieved:
+            logger.debug(f"Retrieved {len(retrieved)} older messages for {session_id}")
+        return head + retrieved + recent
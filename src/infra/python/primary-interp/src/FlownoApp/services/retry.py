@@ -0,0 +1,46 @@
+"""
+Retry decisions and backoff delays for LLM API requests.
+"""
+import random
+
+from ..messages.domain_types import RetryConfig
+from .llm_client import ApiError
+
+# Client-error statuses worth retrying (every 5xx is retried as well)
+RETRYABLE_STATUS_CODES = frozenset({408, 429})
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed request may succeed if it is sent again.
+
+    Connection failures, timeouts, 429 and 5xx responses are transient; any
+    other API error (bad request, authentication, ...) is not.
+    """
+    if isinstance(error, ApiError):
+        return error.status_code in RETRYABLE_STATUS_CODES or 500 <= error.status_code < 600
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def backoff_delay(config: RetryConfig, attempt: int, retry_after: float | None = None) -> float:
+    """
+    Delay before retry number attempt (0-based).
+
+    The delay doubles with each attempt up to config.max_delay, and a random
+    fraction of up to config.jitter is taken off so that clients failing
+    together do not retry together. A Retry-After hint from the server is
+    honoured if it is longer, but is still capped at max_delay.
+
+    Args:
+        config: The retry policy
+        attempt: How many retries were already made
+        retry_after: Seconds the server asked to wait, if any
+
+    Returns:
+        float: Seconds to wait
+    """
+    delay = min(config.max_delay, config.base_delay * (2 ** attempt))
+    delay *= 1.0 - config.jitter * random.random()
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, config.max_delay))
+    return delay
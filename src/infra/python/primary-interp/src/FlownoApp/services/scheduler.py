@@ -0,0 +1,208 @@
+"""
+Admission control for every LLM API request.
+
+Interactive turns and background work (summaries, titles, prefetch) share
+one endpoint and one rate budget. All requests go through RequestScheduler,
+which admits interactive requests first, defers background requests while
+a foreground turn is waiting or about to start, limits the number of
+concurrent requests per priority class and keeps each API profile under its
+rate limits.
+"""
+from collections import deque
+from collections.abc import Callable
+from enum import IntEnum
+import logging
+import time
+
+from flowno import Condition, sleep
+
+from ..messages.domain_types import RateLimitConfig
+from .metrics import metrics
+from .rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# How long an announced foreground turn keeps background requests deferred
+# if no interactive request follows it
+FOREGROUND_GRACE = 5.0
+# How often a deferred background request checks whether the foreground turn was admitted
+FOREGROUND_POLL = 0.05
+# How often a request delayed by the rate budget checks whether it was cancelled
+CANCEL_POLL = 0.05
+
+
+class AdmissionCancelled(Exception):
+    """Raised by `RequestScheduler.acquire()` when the caller stopped waiting for admission."""
+
+
+class Priority(IntEnum):
+    """Priority classes of LLM requests; lower values are admitted first."""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class RequestScheduler:
+    """
+    Admits LLM requests by priority, concurrency and rate limits.
+
+    Callers `acquire()` before sending a request and `release()` once the
+    response was read. Within a class, requests are admitted in arrival
+    order, so small requests cannot starve a large one. A background request
+    is only admitted while no interactive request is waiting and every
+    foreground turn announced with `expect_foreground()` was admitted. Background jobs
+    that are already running are not interrupted.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        """
+        Args:
+            config: Rate budgets (None disables a budget) and per-class concurrency limits
+        """
+        self.config = config
+        self._limiters: dict[tuple[str, str], RateLimiter] = {}
+        self._condition = Condition()
+        self._queues: dict[Priority, deque[object]] = {p: deque() for p in Priority}
+        self._running: dict[Priority, int] = {p: 0 for p in Priority}
+        # Deadlines of announced foreground turns that were not admitted yet, oldest first
+        self._announced: deque[float] = deque()
+
+    @property
+    def rate_limited(self) -> bool:
+        return bool(self.config.requests_per_minute or self.config.tokens_per_minute)
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting to be admitted."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def limiter_for(self, api_url: str, api_token: str) -> RateLimiter:
+        """Return the limiter of the profile identified by endpoint and token."""
+        key = (api_url, api_token)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = RateLimiter(self.config)
+        return limiter
+
+    def concurrency_limit(self, priority: Priority) -> int:
+        if priority is Priority.INTERACTIVE:
+            return self.config.interactive_concurrency
+        return self.config.background_concurrency
+
+    def expect_foreground(self) -> None:
+        """
+        Announce that an interactive request is about to be made.
+
+        Called when the user sends a prompt, before the context for the turn
+        is built, so background work queued in the meantime does not take the
+        endpoint or the rate budget from it. Each announcement is matched by
+        the next interactive admission, so prompts sent in quick succession
+        each keep background work deferred until their own turn starts.
+        """
+        self._announced.append(time.monotonic() + FOREGROUND_GRACE)
+
+    def _blocked(self, priority: Priority, ticket: object) -> bool:
+        """Whether the request must wait for another request to be admitted or released."""
+        if self._queues[priority][0] is not ticket:
+            return True
+        if self._running[priority] >= self.concurrency_limit(priority):
+            return True
+        return priority is Priority.BACKGROUND and bool(self._queues[Priority.INTERACTIVE])
+
+    def _delay(self, priority: Priority, limiter: RateLimiter | None, estimated_tokens: int) -> float:
+        """Seconds the request must wait for the foreground grace period or the rate budget."""
+        now = time.monotonic()
+        delay = 0.0
+        while self._announced and self._announced[0] <= now:
+            self._announced.popleft()
+        if priority is Priority.BACKGROUND and self._announced:
+            delay = min(self._announced[-1] - now, FOREGROUND_POLL)
+        if limiter is not None:
+            delay = max(delay, limiter.delay_for(estimated_tokens, now))
+        return delay
+
+    def _publish(self) -> None:
+        for priority in Priority:
+            name = priority.name.lower()
+            metrics.set_gauge(f"scheduler.{name}.queue_depth", len(self._queues[priority]))
+            metrics.set_gauge(f"scheduler.{name}.running", self._running[priority])
+
+    async def acquire(
+        self,
+        api_url: str,
+        api_token: str,
+        estimated_tokens: int,
+        priority: Priority = Priority.INTERACTIVE,
+        cancelled: Callable[[], bool] | None = None,
+    ) -> float:
+        """
+        Wait until a request may be sent and charge it to the profile's budgets.
+
+        Every successful call must be paired with a `release()` of the same priority.
+
+        Args:
+            api_url: The endpoint the request is sent to
+            api_token: The API token the request is sent with
+            estimated_tokens: Estimated prompt tokens plus the completion budget
+            priority: The request's priority class
+            cancelled: Optional check made whenever the request wakes up; once
+                it returns True the request leaves the queue. Callers call
+                `wake()` after it changed so a blocked request notices.
+
+        Returns:
+            float: Seconds the request waited
+
+        Raises:
+            AdmissionCancelled: `cancelled` returned True before the request was admitted
+        """
+        started = time.monotonic()
+        limiter = self.limiter_for(api_url, api_token) if self.rate_limited else None
+        ticket = object()
+        queue = self._queues[priority]
+        queue.append(ticket)
+        self._publish()
+        try:
+            while True:
+                async with self._condition:
+                    while not (cancelled is not None and cancelled()) and self._blocked(priority, ticket):
+                        await self._condition.wait()
+                    if cancelled is not None and cancelled():
+                        raise AdmissionCancelled()
+                    delay = self._delay(priority, limiter, estimated_tokens)
+                    if delay <= 0:
+                        if limiter is not None:
+                            limiter.consume(estimated_tokens, time.monotonic())
+                        queue.popleft()
+                        self._running[priority] += 1
+                        if priority is Priority.INTERACTIVE and self._announced:
+                            self._announced.popleft()
+                        await self._condition.notify_all()
+                        break
+                # Time-based waits happen outside the lock so that other
+                # classes can still be admitted meanwhile
+                logger.debug(f"Delaying {priority.name.lower()} request by {delay:.2f}s")
+                await sleep(delay if cancelled is None else min(delay, CANCEL_POLL))
+        except BaseException:
+            if ticket in queue:
+                queue.remove(ticket)
+                # The requests behind it may be admissible now
+                async with self._condition:
+                    await self._condition.notify_all()
+            raise
+        finally:
+            self._publish()
+
+        waited = time.monotonic() - started
+        metrics.observe(f"scheduler.{priority.name.lower()}.wait_s", waited)
+        return waited
+
+    async def wake(self) -> None:
+        """Make waiting requests re-check their `cancelled` condition."""
+        async with self._condition:
+            await self._condition.notify_all()
+
+    async def release(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Mark a request admitted by `acquire()` as finished."""
+        async with self._condition:
+            self._running[priority] -= 1
+            await self._condition.notify_all()
+        self._publish()
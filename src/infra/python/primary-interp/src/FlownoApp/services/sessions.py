@@ -0,0 +1,304 @@
+"""
+Concurrent generation across chat sessions.
+
+The Flowno graph contains one generation lane (GUIChat, ChatHistory,
+ContextWindow, Inference, ...) per allowed concurrent generation.
+SessionRouter hands each prompt to a free lane, so a long answer in one chat
+does not hold up a prompt sent in another. Prompts of the same chat are still
+answered one after the other.
+
+The working state of each chat (its history and retrieval index) is built by
+SessionManager when the chat is used and torn down again once it is idle.
+"""
+from collections import OrderedDict, deque
+from collections.abc import Callable
+import logging
+import time
+
+from flowno import Condition, sleep
+
+from ..messages.domain_types import ChatSession, Message, Messages, SessionConfig
+from ..utils.memory import deep_sizeof
+from .generation import GenerationControl
+from .metrics import metrics
+from .retrieval import HistoryRetriever
+
+logger = logging.getLogger(__name__)
+
+# First message of every new chat history
+SYSTEM_PROMPT = "You are a helpful assistant."
+# Upper bound on the time between two idle checks
+REAP_INTERVAL = 30.0
+
+
+class SessionState:
+    """Working state of a live chat session."""
+
+    def __init__(self, chat_id: str | None, messages: Messages):
+        self.chat_id = chat_id
+        self.messages = messages
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    """
+    Builds the working state of a chat on demand and tears it down again.
+
+    At most config.max_live_sessions sessions are kept; beyond that the least
+    recently used idle session is torn down, as is any session that has been
+    idle for longer than config.idle_timeout. Teardown saves the history's
+    turns to the chat's ChatSession, which a rebuilt session loads them from,
+    and drops the chat's retrieval index. The chat without an ID (prompts sent
+    before any chat was loaded) is never torn down.
+    """
+
+    def __init__(
+        self,
+        config: SessionConfig,
+        store: dict[str, ChatSession] | None = None,
+        retriever: HistoryRetriever | None = None,
+    ):
+        """
+        Args:
+            config: Pool size and idle timeout
+            store: Saved chats by ID (AppState.active_sessions)
+            retriever: Optional retriever whose per-chat indexes belong to the sessions
+        """
+        self.config = config
+        self.store = store if store is not None else {}
+        self.retriever = retriever
+        # Least recently used first
+        self._live: OrderedDict[str | None, SessionState] = OrderedDict()
+
+    def __contains__(self, chat_id: str | None) -> bool:
+        return chat_id in self._live
+
+    @property
+    def live(self) -> int:
+        """Number of live sessions."""
+        return len(self._live)
+
+    def get(self, chat_id: str | None) -> SessionState:
+        """Return the live session of a chat, building it if needed."""
+        state = self._live.get(chat_id)
+        if state is None:
+            state = self._live[chat_id] = self._build(chat_id)
+            metrics.increment("sessions.built")
+            metrics.set_gauge("sessions.live", len(self._live))
+            logger.debug(f"Built session of chat {chat_id} with {len(state.messages)} messages")
+        else:
+            self._live.move_to_end(chat_id)
+        state.last_used = time.monotonic()
+        return state
+
+    def _build(self, chat_id: str | None) -> SessionState:
+        messages = [Message("system-0", "system", SYSTEM_PROMPT)]
+        session = self.store.get(chat_id) if chat_id is not None else None
+        if session is not None:
+            messages.extend(msg for msg in session.messages if msg.role != "system")
+        return SessionState(chat_id, messages)
+
+    def sync(self, chat_id: str | None) -> None:
+        """Save the turns of a live session to its ChatSession."""
+        state = self._live.get(chat_id)
+        if state is None or chat_id is None:
+            return
+        session = self.store.get(chat_id)
+        if session is None:
+            session = self.store[chat_id] = ChatSession(id=chat_id, name=f"Chat {chat_id[:8]}")
+        session.messages = [msg for msg in state.messages if msg.role != "system"]
+
+    def history_changed(self, chat_id: str | None) -> None:
+        """Drop derived state of a chat whose earlier messages were edited or deleted."""
+        if self.retriever is not None and chat_id is not None:
+            self.retriever.forget(chat_id)
+
+    def memory_usage(self, chat_id: str | None) -> int:
+        """Estimated bytes held by a live session (0 if it is not live)."""
+        state = self._live.get(chat_id)
+        if state is None:
+            return 0
+        seen: set[int] = set()
+        size = deep_sizeof(state, seen)
+        if self.retriever is not None and chat_id is not None:
+            index = self.retriever.session_index(chat_id)
+            if index is not None:
+                size += deep_sizeof(index, seen)
+        return size
+
+    def teardown(self, chat_id: str | None) -> int:
+        """
+        Save and drop a live session.
+
+        Returns:
+            int: Estimated bytes the session held
+        """
+        size = self.memory_usage(chat_id)
+        self.sync(chat_id)
+        del self._live[chat_id]
+        if self.retriever is not None and chat_id is not None:
+            self.retriever.forget(chat_id)
+        metrics.increment("sessions.torn_down")
+        metrics.observe("sessions.session_bytes", size)
+        metrics.set_gauge("sessions.live", len(self._live))
+        logger.debug(f"Tore down session of chat {chat_id} ({size} bytes)")
+        return size
+
+    def trim(self, in_use: Callable[[str | None], bool], now: float | None = None) -> list[str]:
+        """
+        Tear down idle sessions beyond the pool size or past the idle timeout.
+
+        Args:
+            in_use: Whether a chat has a prompt waiting or being answered
+            now: Current time.monotonic() (for tests)
+
+        Returns:
+            list[str]: IDs of the chats that were torn down
+        """
+        now = time.monotonic() if now is None else now
+        timeout = self.config.idle_timeout
+        excess = len(self._live) - self.config.max_live_sessions
+        torn_down: list[str] = []
+        for chat_id, state in list(self._live.items()):
+            if chat_id is None or in_use(chat_id):
+                continue
+            if excess > 0 or (timeout is not None and now - state.last_used >= timeout):
+                self.teardown(chat_id)
+                torn_down.append(chat_id)
+                excess -= 1
+        return torn_down
+
+    def clear(self, in_use: Callable[[str | None], bool]) -> None:
+        """Drop every idle session without saving it (after all chats were deleted)."""
+        for chat_id in list(self._live):
+            if chat_id is not None and not in_use(chat_id):
+                del self._live[chat_id]
+                if self.retriever is not None:
+                    self.retriever.forget(chat_id)
+        metrics.set_gauge("sessions.live", len(self._live))
+
+    def publish_memory(self) -> None:
+        """Report the memory held by live sessions as gauges."""
+        sizes = [self.memory_usage(chat_id) for chat_id in self._live]
+        metrics.set_gauge("sessions.memory_bytes", sum(sizes))
+        metrics.set_gauge("sessions.bytes_per_session", sum(sizes) / len(sizes) if sizes else 0)
+
+
+class GenerationLane:
+    """
+    One slot of the graph that can run a generation.
+
+    The router sets `chat_id` when it hands the lane a prompt; the lane's
+    nodes read it to pick the chat history and to tag what they send to the
+    frontend. `previous_chat_id` is the chat of the prompt before, whose
+    answer ChatHistory records when the lane starts its next turn.
+    """
+
+    def __init__(self, index: int, router: "SessionRouter"):
+        self.index = index
+        self.router = router
+        self.control = GenerationControl()
+        self.chat_id: str | None = None
+        self.previous_chat_id: str | None = None
+        self.busy = False
+
+    def __repr__(self) -> str:
+        return f"GenerationLane({self.index}, chat_id={self.chat_id!r})"
+
+
+class SessionRouter:
+    """
+    Distributes prompts over a fixed number of generation lanes.
+
+    A chat is owned by the lane that answered its last prompt until that
+    lane's ChatHistory has recorded the answer, so the next prompt of the
+    chat always sees the full history. Prompts are otherwise dispatched in
+    arrival order to whichever lane asks first.
+    """
+
+    def __init__(self, lane_count: int, sessions: SessionManager | None = None):
+        """
+        Args:
+            lane_count: Maximum number of generations that run at the same time
+            sessions: Manager of the chats' working state (a default one if None)
+        """
+        if lane_count < 1:
+            raise ValueError("lane_count must be at least 1")
+        self.lanes = [GenerationLane(i, self) for i in range(lane_count)]
+        self.sessions = sessions if sessions is not None else SessionManager(SessionConfig())
+        self._pending: deque[tuple[str | None, Message]] = deque()
+        self._owners: dict[str | None, GenerationLane] = {}
+        self._condition = Condition()
+
+    @property
+    def waiting(self) -> int:
+        """Number of prompts waiting for a lane."""
+        return len(self._pending)
+
+    def history(self, chat_id: str | None) -> Messages:
+        """Return the message history of a chat, building its session if needed."""
+        return self.sessions.get(chat_id).messages
+
+    def in_use(self, chat_id: str | None) -> bool:
+        """Whether a prompt of the chat is waiting or its last answer is not recorded yet."""
+        return chat_id in self._owners or any(pending == chat_id for pending, _ in self._pending)
+
+    def lanes_for(self, chat_id: str | None) -> list[GenerationLane]:
+        """Lanes currently generating an answer for chat_id."""
+        return [lane for lane in self.lanes if lane.chat_id == chat_id and lane.control.is_active]
+
+    def _publish(self) -> None:
+        metrics.set_gauge("sessions.waiting_prompts", len(self._pending))
+        metrics.set_gauge("sessions.busy_lanes", sum(lane.busy for lane in self.lanes))
+
+    async def submit(self, chat_id: str | None, prompt: Message) -> None:
+        """Queue a prompt of a chat for the next lane that may answer it."""
+        async with self._condition:
+            self._pending.append((chat_id, prompt))
+            self._publish()
+            await self._condition.notify_all()
+
+    def _take(self, lane: GenerationLane) -> tuple[str | None, Message] | None:
+        for item in self._pending:
+            owner = self._owners.get(item[0])
+            if owner is None or owner is lane:
+                self._pending.remove(item)
+                return item
+        return None
+
+    async def next_prompt(self, lane: GenerationLane) -> Message:
+        """
+        Wait for the next prompt this lane may answer.
+
+        Called by the lane's GUIChat once the previous response was streamed.
+        """
+        async with self._condition:
+            lane.busy = False
+            self._publish()
+            while (item := self._take(lane)) is None:
+                await self._condition.wait()
+            chat_id, prompt = item
+            self._owners[chat_id] = lane
+            lane.previous_chat_id, lane.chat_id = lane.chat_id, chat_id
+            lane.control.chat_id = chat_id
+            lane.busy = True
+            self._publish()
+        logger.debug(f"Lane {lane.index} answers {prompt.id} of chat {chat_id}")
+        return prompt
+
+    async def release(self, lane: GenerationLane, chat_id: str | None) -> None:
+        """Give up ownership of a chat whose last answer the lane has recorded."""
+        async with self._condition:
+            if self._owners.get(chat_id) is lane:
+                del self._owners[chat_id]
+                await self._condition.notify_all()
+        self.sessions.trim(self.in_use)
+
+    async def reap_idle(self) -> None:
+        """Periodically tear down idle sessions and report session memory; runs forever."""
+        config = self.sessions.config
+        interval = min(REAP_INTERVAL, config.idle_timeout) if config.idle_timeout else REAP_INTERVAL
+        while True:
+            await sleep(interval)
+            self.sessions.trim(self.in_use)
+            self.sessions.publish_memory()
@@ -0,0 +1,298 @@
+"""
+Sharded mode: chats generate in worker processes across CPU cores.
+
+With SessionConfig.shards > 0 the primary interpreter starts that many
+worker processes (FlownoApp/worker.py), each running its own ChatApp and
+Flowno graph with its own GIL. ShardRouter assigns every chat to a worker by
+consistent hashing of the chat ID, forwards the frontend's messages to the
+owning worker and merges the workers' outbound messages back into the
+NodeJS bridge. Chat list, configuration and metrics requests stay in the
+primary interpreter.
+"""
+from bisect import bisect
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import hashlib
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any
+
+from flowno import Event, SocketHandle, sleep, spawn
+
+from ..ipc import shard_bridge
+from ..messages.domain_types import AppState, ChatSession
+from ..messages.ipc_schema import ErrorResponse, ErrorPayload
+from .metrics import metrics
+from .offload import wait_for_future
+from .outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+# Script run by every worker process
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "worker.py")
+# Messages answered by the worker that owns the chat
+CHAT_MESSAGES = frozenset({"new-prompt", "stop-generation", "load-chat"})
+# Messages every worker must see; the primary interpreter answers them itself
+BROADCAST_MESSAGES = frozenset({"set-api-config", "delete-all-chats", "set-speech"})
+# Worker replies to broadcast messages, which were already answered
+SUPPRESSED_REPLIES = frozenset({"all-chats-deleted"})
+# Sentence IDs remembered for routing their 'sentence-done'
+MAX_TRACKED_SENTENCES = 4096
+# Seconds after startup until messages for the workers stop waiting for them to connect
+READY_TIMEOUT = 30.0
+# How often a message waiting for the workers checks whether they connected
+READY_POLL = 0.05
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto shards.
+
+    Every shard owns `replicas` points on a ring of 64-bit hashes, and a key
+    belongs to the shard owning the first point at or after the key's hash.
+    Changing the number of shards only moves the keys of the shards added or
+    removed.
+    """
+
+    def __init__(self, shards: int, replicas: int = 64):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        points = sorted(
+            (self.hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+    def shard_for(self, key: str | None) -> int:
+        """Return the shard a key belongs to (None is hashed like "")."""
+        position = bisect(self._hashes, self.hash(key or "")) % len(self._hashes)
+        return self._shards[position]
+
+
+class ShardConnection:
+    """
+    The primary interpreter's end of one worker process.
+
+    The socket is blocking, since the event loop reads the worker's output
+    from it at the same time. Messages to the worker are therefore written
+    by a thread of the connection's own, in order, and `send()` waits for
+    that without blocking the event loop, even when the worker stops
+    reading.
+    """
+
+    def __init__(self, index: int, handle: SocketHandle, process: subprocess.Popen | None = None):
+        self.index = index
+        self.handle = handle
+        self.process = process
+        self.alive = True
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix=f"shard-{index}-writer")
+
+    async def send(self, message: dict[str, Any]) -> None:
+        """Forward a message to the worker."""
+        future = self._writer.submit(self.handle.socket.sendall, shard_bridge.encode_line(message))
+        await wait_for_future(future)
+        future.result()
+        metrics.increment(f"shards.{self.index}.inbound")
+
+    def close(self) -> None:
+        """Stop the writer thread; messages already submitted are still written."""
+        self._writer.shutdown(wait=False)
+
+
+class ShardRouter:
+    """
+    Routes IPC messages between the NodeJS bridge and the shard workers.
+
+    `dispatch()` replaces ChatApp.handle_message as the bridge's listener.
+    Prompts and stop requests are sent to the worker that owns their chat,
+    with the chat ID filled in (the primary interpreter tracks the current
+    chat). 'sentence-done' goes to the worker that sent the sentence.
+    """
+
+    def __init__(
+        self,
+        app_state: AppState,
+        shards: int,
+        handle_locally: Callable[[dict[str, Any]], Awaitable[None]],
+    ):
+        """
+        Args:
+            app_state: The primary interpreter's application state
+            shards: Number of worker processes
+            handle_locally: Handler for messages the primary interpreter answers
+        """
+        self.app_state = app_state
+        self.ring = HashRing(shards)
+        self.shard_count = shards
+        self.handle_locally = handle_locally
+        self.connections: dict[int, ShardConnection] = {}
+        self._sentences: OrderedDict[str, int] = OrderedDict()
+        self._ready = Event()
+        self._ready_deadline = time.monotonic() + READY_TIMEOUT
+
+    def shard_for(self, chat_id: str | None) -> int:
+        return self.ring.shard_for(chat_id)
+
+    def _worker_command(self, host: str, port: int, shard: int) -> list[str]:
+        python = os.environ.get("FLOWNO_WORKER_PYTHON") or sys.executable
+        return [python, WORKER_SCRIPT, host, str(port), str(shard)]
+
+    async def start(self) -> None:
+        """Start the worker processes and wait until each has connected."""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(self.shard_count)
+        host, port = listener.getsockname()
+
+        # Workers must import the same code, and must not shard themselves
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p), FLOWNO_SHARDS="0")
+        processes = [
+            subprocess.Popen(self._worker_command(host, port, shard), env=env)
+            for shard in range(self.shard_count)
+        ]
+        atexit.register(self.stop)
+
+        server = SocketHandle(listener)
+        while len(self.connections) < self.shard_count:
+            handle, _ = await server.accept()
+            # Blocking, so the connection's writer thread can write while the loop reads
+            handle.socket.setblocking(True)
+            messages = shard_bridge.read_lines(handle)
+            hello = await messages.__anext__()
+            shard = int(hello["shard"])
+            self.connections[shard] = ShardConnection(shard, handle, processes[shard])
+            await spawn(self._pump_outbound(self.connections[shard], messages))
+            logger.info(f"Shard {shard} connected")
+        listener.close()
+        metrics.set_gauge("shards.alive", len(self.connections))
+        await self._ready.set()
+
+    def stop(self) -> None:
+        """Terminate the worker processes."""
+        for connection in self.connections.values():
+            connection.close()
+            if connection.process is not None and connection.process.poll() is None:
+                connection.process.terminate()
+
+    async def _pump_outbound(self, connection: ShardConnection, messages) -> None:
+        """Forward a worker's messages to the frontend until it disconnects."""
+        async for envelope in messages:
+            # The worker's outbox batches its messages; the primary's batches them again
+            batch = envelope.get("messages") if envelope.get("type") == "batch" else [envelope]
+            for message in batch if isinstance(batch, list) else []:
+                message_type = message.get("type")
+                if message_type in SUPPRESSED_REPLIES:
+                    continue
+                if message_type == "ack" and message.get("payload", {}).get("originalMessageType") in BROADCAST_MESSAGES:
+                    continue
+                if message_type == "sentence":
+                    self._track_sentence(message.get("payload", {}).get("id"), connection.index)
+                metrics.increment(f"shards.{connection.index}.outbound")
+                await outbox.send(message)
+
+        connection.alive = False
+        metrics.increment("shards.crashed")
+        metrics.set_gauge("shards.alive", sum(c.alive for c in self.connections.values()))
+        logger.error(f"Shard {connection.index} disconnected")
+
+    def _track_sentence(self, sentence_id: str | None, shard: int) -> None:
+        if sentence_id is None:
+            return
+        self._sentences[sentence_id] = shard
+        while len(self._sentences) > MAX_TRACKED_SENTENCES:
+            self._sentences.popitem(last=False)
+
+    async def _send(self, shard: int, message: dict[str, Any]) -> None:
+        connection = self.connections.get(shard)
+        if connection is None or not connection.alive:
+            logger.error(f"Shard {shard} is not running; dropping {message.get('type')}")
+            await outbox.send(ErrorResponse(
+                type="error",
+                payload=ErrorPayload(
+                    message=f"The worker for this chat is not running (shard {shard})",
+                    originalMessageType=message.get("type"),
+                ),
+            ))
+            return
+        await connection.send(message)
+
+    def _route_chat_message(self, message: dict[str, Any]) -> str | None:
+        """Fill in the chat ID of a chat message and return it."""
+        message_type = message["type"]
+        if message_type == "new-prompt":
+            content = message.get("content")
+            if not isinstance(content, dict):
+                return self.app_state.current_chat_id
+            chat_id = content.get("chatId") or self.app_state.current_chat_id
+            content["chatId"] = chat_id
+            return chat_id
+        payload = message.get("payload") or {}
+        if message_type == "stop-generation":
+            chat_id = payload.get("chatId") or self.app_state.current_chat_id
+            message["payload"] = {"chatId": chat_id}
+            return chat_id
+        # load-chat: the primary interpreter keeps track of the current chat
+        chat_id = payload.get("chatId")
+        if chat_id:
+            self.app_state.current_chat_id = chat_id
+            self.app_state.active_sessions.setdefault(chat_id, ChatSession(id=chat_id, name=f"Chat {chat_id[:8]}"))
+        return chat_id
+
+    async def _wait_ready(self) -> bool:
+        """
+        Wait until every worker connected, at most until READY_TIMEOUT after startup.
+
+        Returns:
+            bool: False if some workers are still missing
+        """
+        while not self._ready.is_set():
+            if time.monotonic() >= self._ready_deadline:
+                return False
+            await sleep(READY_POLL)
+        return True
+
+    async def dispatch(self, message: dict[str, Any]) -> None:
+        """
+        Route one message from the frontend.
+
+        Messages for the workers wait while the workers start. If they did
+        not all connect in time, messages for the missing ones get an error
+        reply instead of waiting forever; messages the primary interpreter
+        answers never wait.
+
+        Args:
+            message: The raw message dictionary from the frontend
+        """
+        message_type = message.get("type")
+        if message_type in CHAT_MESSAGES or message_type in BROADCAST_MESSAGES or message_type == "sentence-done":
+            if not await self._wait_ready():
+                missing = sorted(set(range(self.shard_count)) - set(self.connections))
+                logger.error(f"Shards {missing} did not connect within {READY_TIMEOUT}s; routing {message_type} anyway")
+        if message_type in CHAT_MESSAGES:
+            chat_id = self._route_chat_message(message)
+            await self._send(self.shard_for(chat_id), message)
+        elif message_type == "sentence-done":
+            sentence_id = (message.get("payload") or {}).get("id")
+            shard = self._sentences.pop(sentence_id, None)
+            if shard is not None:
+                await self._send(shard, message)
+            else:
+                logger.warning(f"Received completion for unknown sentence: id={sentence_id}")
+        elif message_type in BROADCAST_MESSAGES:
+            for shard in range(self.shard_count):
+                await self._send(shard, message)
+            await self.handle_locally(message)
+        else:
+            await self.handle_locally(message)
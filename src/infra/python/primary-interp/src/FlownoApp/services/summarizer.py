@@ -0,0 +1,166 @@
+"""
+Background summarization of old conversation turns.
+
+Once a history grows past ContextConfig.summary_threshold, the oldest turns
+are folded into a single system note so that the request sent for each turn
+stays roughly the same size however long the conversation gets.
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+
+from flowno import spawn
+from flowno.core.event_loop.tasks import TaskHandle
+
+from ..messages.domain_types import Message, Messages, ApiConfig, ContextConfig
+from .llm_client import complete
+from .scheduler import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an "
+    "assistant. Merge the previous summary (if any) with the new turns into one "
+    "concise summary. Keep names, facts, decisions, open questions and anything "
+    "the user asked to remember. Reply with the summary only."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+class HistorySummarizer:
+    """
+    Produces and caches summaries of the oldest turns of a conversation.
+
+    Summaries always cover a block-aligned prefix of the conversation (after the
+    leading system messages) and are cached against a hash of the exact messages
+    they cover, so the same summary is reused across turns and sessions until a
+    new block is completed. Summarization runs as a background task, one job at
+    a time; until it finishes the previous summary (or the full history) is sent.
+    """
+
+    def __init__(
+        self,
+        api_config: ApiConfig,
+        context_config: ContextConfig,
+        max_cached: int = 256,
+        scheduler: RequestScheduler | None = None,
+    ):
+        """
+        Args:
+            api_config: API endpoint used for summary requests
+            context_config: Thresholds and the optional cheaper summary model
+            max_cached: Maximum number of summaries kept in memory
+            scheduler: Optional scheduler shared with the other LLM requests
+        """
+        self.api_config = api_config
+        self.context_config = context_config
+        self.scheduler = scheduler
+        self.max_cached = max_cached
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._job_key: str | None = None
+        self._job: TaskHandle[None] | None = None
+
+    @staticmethod
+    def range_keys(body: Messages, block: int, limit: int) -> list[tuple[int, str]]:
+        """
+        Hash every block-aligned prefix of body up to limit messages.
+
+        Args:
+            body: Conversation messages after the leading system messages
+            block: Block size the summarized prefix is aligned to
+            limit: Maximum number of messages a summary may cover
+
+        Returns:
+            list[tuple[int, str]]: (prefix length, sha256 of the prefix) pairs
+        """
+        hasher = hashlib.sha256()
+        keys: list[tuple[int, str]] = []
+        for index, msg in enumerate(body[:max(limit, 0)]):
+            hasher.update(f"{msg.id}\0{msg.role}\0{msg.content}\0".encode("utf-8"))
+            if (index + 1) % block == 0:
+                keys.append((index + 1, hasher.hexdigest()))
+        return keys
+
+    async def compact(self, messages: Messages) -> Messages:
+        """
+        Replace the oldest turns with a cached summary when one is available.
+
+        Schedules a background summarization job for the newest complete block
+        if it has not been summarized yet.
+
+        Args:
+            messages: The full conversation history
+
+        Returns:
+            Messages: Leading system messages, the summary note (if any) and the
+            turns not covered by the summary
+        """
+        config = self.context_config
+        if len(messages) <= config.summary_threshold:
+            return messages
+
+        head_len = 0
+        while head_len < len(messages) and messages[head_len].role == "system":
+            head_len += 1
+        head, body = messages[:head_len], messages[head_len:]
+
+        keys = self.range_keys(body, max(config.summary_block, 1), len(body) - config.keep_recent)
+        if not keys:
+            return messages
+
+        covered, covered_key, summary = 0, None, None
+        for length, key in reversed(keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                covered, covered_key, summary = length, key, self._cache[key]
+                break
+
+        target_length, target_key = keys[-1]
+        if covered < target_length and self._job_key is None:
+            self._job_key = target_key
+            self._job = await spawn(self._summarize(target_key, summary, body[covered:target_length]))
+
+        if summary is None or covered_key is None:
+            return messages
+
+        note = Message(f"summary-{covered_key[:12]}", "system", f"{SUMMARY_PREFIX}\n{summary}")
+        return head + [note] + body[covered:]
+
+    async def wait_for_job(self) -> None:
+        """Wait until the background summarization job (if any) has finished."""
+        job = self._job
+        if job is not None:
+            await job.join()
+
+    async def _summarize(self, key: str, previous_summary: str | None, turns: Messages) -> None:
+        """
+        Background job that summarizes turns on top of the previous summary.
+
+        Args:
+            key: Cache key of the prefix this summary will cover
+            previous_summary: Summary of the prefix before turns, if any
+            turns: The turns not yet covered by previous_summary
+        """
+        try:
+            transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in turns)
+            if previous_summary:
+                transcript = f"Previous summary:\n{previous_summary}\n\nNew turns:\n{transcript}"
+
+            summary = await complete(
+                [
+                    Message("summary-instructions", "system", SUMMARY_INSTRUCTIONS),
+                    Message("summary-input", "user", transcript),
+                ],
+                self.api_config,
+                model=self.context_config.summary_model,
+                scheduler=self.scheduler,
+            )
+            self._cache[key] = summary.strip()
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+            logger.info(f"Cached history summary {key[:12]} ({len(turns)} new turns)")
+        except Exception as e:
+            # Summaries are an optimization; the full history is sent meanwhile.
+            logger.warning(f"History summarization failed: {e}")
+        finally:
+            self._job_key = None
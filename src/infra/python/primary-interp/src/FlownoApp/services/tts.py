@@ -0,0 +1,139 @@
+"""
+Local speech synthesis for pre-rendering sentence audio.
+
+A TTS engine turns sentence text into audio bytes. Engines are registered
+by name and chosen with SpeechConfig.engine; `SentenceSpeaker` renders a
+few sentences ahead of playback on the offload thread pool, so the audio
+is ready when the frontend asks for the next sentence.
+
+Only the deterministic "stub" engine ships with the app. A real backend
+registers itself with `register_engine()`:
+
+    register_engine("piper", lambda voice: PiperEngine(voice))
+
+Once `configure()` has set up an AudioCache, every engine is wrapped in a
+CachedEngine, so a sentence already rendered with the same engine and voice
+is not synthesized again.
+"""
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+import array
+import hashlib
+import io
+import logging
+import math
+import wave
+
+from ..messages.domain_types import SpeechConfig
+from .audio_cache import AudioCache
+from .offload import cpu_bound
+
+logger = logging.getLogger(__name__)
+
+
+class TTSEngine(ABC):
+    """A speech synthesis backend for one voice."""
+
+    name: str = "engine"
+    # MIME type of the audio synthesize() returns
+    media_type: str = "audio/wav"
+
+    def __init__(self, voice: str = "default"):
+        self.voice = voice
+
+    @abstractmethod
+    def synthesize(self, text: str) -> bytes:
+        """
+        Render a sentence. Called on an offload thread, never on the event loop.
+
+        Returns:
+            bytes: The encoded audio
+        """
+
+
+class StubEngine(TTSEngine):
+    """
+    Renders a quiet tone instead of speech; the same text and voice always
+    give the same bytes. For tests and for running without a real backend.
+    """
+
+    name = "stub"
+    sample_rate = 16000
+    seconds_per_char = 0.06
+
+    def synthesize(self, text: str) -> bytes:
+        digest = hashlib.sha1(f"{self.voice}\0{text}".encode("utf-8")).digest()
+        frequency = 220 + digest[0]
+        frames = int(self.sample_rate * max(0.2, len(text) * self.seconds_per_char))
+        step = 2 * math.pi * frequency / self.sample_rate
+        samples = array.array("h", (int(2000 * math.sin(step * i)) for i in range(frames)))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            out.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+
+class CachedEngine(TTSEngine):
+    """Looks sentences up in an AudioCache before asking the wrapped engine."""
+
+    def __init__(self, engine: TTSEngine, cache: AudioCache):
+        super().__init__(engine.voice)
+        self.engine = engine
+        self.cache = cache
+        self.name = engine.name
+        self.media_type = engine.media_type
+
+    def synthesize(self, text: str) -> bytes:
+        key = self.cache.key(self.engine.name, self.voice, text)
+        audio = self.cache.get(key)
+        if audio is None:
+            audio = self.engine.synthesize(text)
+            self.cache.put(key, audio)
+        return audio
+
+
+_factories: dict[str, Callable[[str], TTSEngine]] = {"stub": StubEngine}
+_engines: dict[tuple[str, str], TTSEngine] = {}
+_cache: AudioCache | None = None
+
+
+def configure(speech: SpeechConfig) -> None:
+    """Set up the audio cache; engines created before keep their setting."""
+    global _cache
+    if speech.cache_memory_bytes <= 0 and speech.cache_dir is None:
+        _cache = None
+        return
+    _cache = AudioCache(max(0, speech.cache_memory_bytes), speech.cache_dir, speech.cache_disk_bytes)
+
+
+def register_engine(name: str, factory: Callable[[str], TTSEngine]) -> None:
+    """Make an engine available as SpeechConfig.engine; the factory gets the voice."""
+    _factories[name] = factory
+
+
+def get_engine(name: str, voice: str = "default") -> TTSEngine:
+    """
+    Return the engine for a name and voice, creating it on first use.
+
+    Raises:
+        ValueError: If no engine of that name is registered
+    """
+    engine = _engines.get((name, voice))
+    if engine is None:
+        factory = _factories.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown TTS engine: {name}")
+        engine = factory(voice)
+        if _cache is not None:
+            engine = CachedEngine(engine, _cache)
+        _engines[(name, voice)] = engine
+        logger.info(f"Created TTS engine {name} with voice {voice}")
+    return engine
+
+
+@cpu_bound(name="tts")
+def synthesize(engine: TTSEngine, text: str) -> bytes:
+    return engine.synthesize(text)
@@ -0,0 +1,108 @@
+"""
+AsyncQueue with a size limit and an explicit overflow policy.
+"""
+from collections.abc import Callable
+import logging
+from typing import Literal, TypeVar
+
+from flowno import AsyncQueue
+from flowno.core.event_loop.queues import QueueClosedError
+
+from ..services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OverflowPolicy = Literal["block", "drop_oldest", "coalesce"]
+
+
+class BoundedQueue(AsyncQueue[T]):
+    """
+    An AsyncQueue holding at most `maxsize` items.
+
+    What `put()` does when the queue is full depends on the policy:
+
+    - "block": wait until the consumer takes an item (backpressure)
+    - "drop_oldest": discard the oldest queued item
+    - "coalesce": merge the new item into the newest queued one with
+      `merge(newest, item)`; if that returns None the items cannot be
+      merged and the put blocks
+
+    The queue depth is published as the `queues.<name>.depth` gauge; full
+    puts, dropped and coalesced items are counted under `queues.<name>.*`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        policy: OverflowPolicy = "block",
+        name: str = "queue",
+        merge: Callable[[T, T], T | None] | None = None,
+    ):
+        """
+        Args:
+            maxsize: Maximum number of queued items
+            policy: What a put into a full queue does
+            name: Name of the metrics
+            merge: Combines two items (required for "coalesce")
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if policy == "coalesce" and merge is None:
+            raise ValueError("the coalesce policy needs a merge function")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.name = name
+        self.merge = merge
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"queues.{self.name}.depth", len(self.items))
+
+    async def put(self, item: T) -> None:
+        """
+        Put an item into the queue, applying the overflow policy if it is full.
+
+        Raises:
+            QueueClosedError: If the queue is closed
+        """
+        async with self._lock:
+            if self._closed:
+                raise QueueClosedError("Cannot put item into closed queue")
+            if len(self.items) >= self.maxsize:
+                metrics.increment(f"queues.{self.name}.full")
+                if self.policy == "drop_oldest":
+                    self.items.popleft()
+                    metrics.increment(f"queues.{self.name}.dropped")
+                elif self.policy == "coalesce":
+                    merged = self.merge(self.items[-1], item)
+                    if merged is not None:
+                        self.items[-1] = merged
+                        metrics.increment(f"queues.{self.name}.coalesced")
+                        return
+            while len(self.items) >= self.maxsize:
+                await self._not_full.wait()
+                if self._closed:
+                    raise QueueClosedError("Cannot put item into closed queue")
+            self.items.append(item)
+            self._publish()
+            await self._not_empty.notify()
+
+    async def get(self) -> T:
+        item = await super().get()
+        self._publish()
+        return item
+
+    async def reset(self, item: T) -> None:
+        """
+        Discard every queued item and queue `item` instead, even if the queue is full.
+
+        Used to hand the consumer a final item (such as an error) ahead of
+        anything still buffered.
+        """
+        async with self._lock:
+            self.items.clear()
+            self.items.append(item)
+            self._publish()
+            await self._not_empty.notify()
+            await self._not_full.notify_all()
@@ -0,0 +1,132 @@
+"""
+Merges consecutive response chunks into fewer frontend messages.
+
+Every message crosses the NodeJS bridge and makes the renderer update and
+re-render the whole response, so a fast model streaming one message per
+token costs far more than the text is worth. The coalescer holds the chunks
+of a response back for a short interval and sends them as one chunk.
+"""
+from collections.abc import Awaitable, Callable
+from dataclasses import replace
+import logging
+import time
+
+from flowno import sleep, spawn
+
+from ..messages.domain_types import StreamingConfig
+from ..messages.ipc_schema import ChunkedResponse
+from ..services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest gap in the moving average of the gaps between chunks
+GAP_SMOOTHING = 0.2
+
+
+class ChunkCoalescer:
+    """
+    Buffers the chunks of one response and sends them merged.
+
+    With `coalesce` off every chunk is sent as it comes and only counted.
+    Otherwise a chunk that arrives at least one interval after the last
+    message is sent at once, so slow streams are not delayed. Faster chunks
+    are buffered until the interval is up, the buffered text reaches
+    `max_bytes`, or a chunk carries a finish reason. The interval follows
+    the token rate: it is `chunks_per_flush` times the average gap between
+    chunks, kept between `min_interval` and `max_interval`.
+
+    The merged chunk keeps the id of its first chunk and lists the ids of
+    all of them in `chunk_ids`, which sentence events refer to. Messages
+    sent are counted as `<name>.bridge_calls`, chunks received as
+    `<name>.chunks`, and per response the messages are recorded in the
+    `<name>.bridge_calls_per_response` summary.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[ChunkedResponse], Awaitable[None]],
+        config: StreamingConfig,
+        name: str = "gui_chat",
+    ):
+        """
+        Args:
+            send: Sends one message to the frontend
+            config: Intervals and size threshold of the buffering
+            name: Name of the metrics
+        """
+        self.send = send
+        self.config = config
+        self.name = name
+        self.interval = config.min_interval
+        self._pending: list[ChunkedResponse] = []
+        self._pending_bytes = 0
+        self._last_flush = 0.0
+        self._last_chunk: float | None = None
+        self._gap: float | None = None
+        self._timer_running = False
+        self._calls = 0
+
+    def _observe_gap(self, now: float) -> None:
+        if self._last_chunk is not None:
+            gap = now - self._last_chunk
+            self._gap = gap if self._gap is None else GAP_SMOOTHING * gap + (1 - GAP_SMOOTHING) * self._gap
+            interval = self.config.chunks_per_flush * self._gap
+            self.interval = min(max(interval, self.config.min_interval), self.config.max_interval)
+            metrics.set_gauge(f"{self.name}.flush_interval", self.interval)
+        self._last_chunk = now
+
+    async def add(self, chunk: ChunkedResponse) -> None:
+        """Buffer a chunk, sending the buffer if one of the flush conditions is met."""
+        metrics.increment(f"{self.name}.chunks")
+        if self._pending and self._pending[0].response_id != chunk.response_id:
+            await self.close()
+        now = time.monotonic()
+        self._observe_gap(now)
+        self._pending.append(chunk)
+        self._pending_bytes += len(chunk.content.encode("utf-8"))
+        if (
+            not self.config.coalesce
+            or chunk.finish_reason is not None
+            or self._pending_bytes >= self.config.max_bytes
+            or now - self._last_flush >= self.interval
+        ):
+            await self.flush()
+        elif not self._timer_running:
+            self._timer_running = True
+            await spawn(self._flush_later(self._last_flush + self.interval - now))
+
+    async def _flush_later(self, delay: float) -> None:
+        await sleep(delay)
+        self._timer_running = False
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Send the buffered chunks as one message."""
+        if not self._pending:
+            return
+        chunks = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        if len(chunks) == 1:
+            merged = chunks[0]
+        else:
+            merged = replace(
+                chunks[0],
+                content="".join(chunk.content for chunk in chunks),
+                finish_reason=chunks[-1].finish_reason,
+                chunk_ids=[chunk.id for chunk in chunks],
+            )
+        await self.send(merged)
+        self._last_flush = time.monotonic()
+        self._calls += 1
+        metrics.increment(f"{self.name}.bridge_calls")
+        if merged.finish_reason is not None:
+            await self.close()
+
+    async def close(self) -> None:
+        """Send what is buffered and record the messages the response took."""
+        await self.flush()
+        if self._calls:
+            metrics.observe(f"{self.name}.bridge_calls_per_response", self._calls)
+            logger.debug(f"{self.name}: response sent in {self._calls} messages")
+        self._calls = 0
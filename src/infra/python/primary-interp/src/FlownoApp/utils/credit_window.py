@@ -0,0 +1,146 @@
+"""
+Flow control by credits: at most N items sent and not yet acknowledged.
+"""
+from collections.abc import Callable, Iterable
+import logging
+import time
+from typing import Generic, TypeVar
+
+from flowno import Condition, sleep
+
+from ..services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How often `run_expiry()` checks whether a timeout was set while there is none
+IDLE_POLL = 1.0
+
+
+class CreditWindow(Generic[T]):
+    """
+    Tracks items that were sent to a consumer and await its acknowledgement.
+
+    The sender calls `acquire()` before sending, which waits while `size`
+    items are in flight, then `add()`s the item. Each acknowledgement
+    (`release()`) returns a credit. Items not acknowledged within `timeout`
+    seconds are given up by `expire()`, so a lost acknowledgement cannot
+    stall the sender for good; `run_expiry()` does this periodically.
+
+    The number of items in flight is published as the `<name>.in_flight`
+    gauge. Acknowledgement times are recorded in the `<name>.ack_seconds`
+    summary, and expired items and waits for a credit are counted as
+    `<name>.ack_timeouts` and `<name>.credit_waits`.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        timeout: float | None = None,
+        name: str = "credits",
+        on_release: Callable[[str, T], None] | None = None,
+    ):
+        """
+        Args:
+            size: Items in flight at once
+            timeout: Seconds an item may stay unacknowledged (forever if None)
+            name: Name of the metrics
+            on_release: Called with the key and item of every item that leaves the window
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.timeout = timeout
+        self.name = name
+        self.on_release = on_release
+        # Item and time sent, oldest first
+        self.in_flight: dict[str, tuple[T, float]] = {}
+        self._credits = Condition()
+
+    def __len__(self) -> int:
+        return len(self.in_flight)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.in_flight
+
+    def items(self) -> list[tuple[str, T]]:
+        """Return the keys and items in flight, oldest first."""
+        return [(key, item) for key, (item, _) in self.in_flight.items()]
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.in_flight", len(self.in_flight))
+
+    async def acquire(self) -> None:
+        """Wait until fewer than `size` items are in flight."""
+        async with self._credits:
+            if len(self.in_flight) >= self.size:
+                metrics.increment(f"{self.name}.credit_waits")
+            while len(self.in_flight) >= self.size:
+                await self._credits.wait()
+
+    def add(self, key: str, item: T) -> None:
+        """Record an item as sent; call after `acquire()`."""
+        self.in_flight[key] = (item, time.monotonic())
+        self._publish()
+
+    async def release(self, keys: Iterable[str]) -> list[T]:
+        """
+        Remove items from the window and hand their credits back.
+
+        Returns:
+            list: The items that were in flight (unknown keys are ignored)
+        """
+        released = []
+        for key in keys:
+            if key in self.in_flight:
+                item = self.in_flight.pop(key)[0]
+                released.append(item)
+                if self.on_release is not None:
+                    self.on_release(key, item)
+        if released:
+            self._publish()
+            async with self._credits:
+                await self._credits.notify_all()
+        return released
+
+    async def acknowledge(self, key: str) -> bool:
+        """
+        Release an item the consumer is done with.
+
+        Returns:
+            bool: False if the item was not in flight (it expired or was released)
+        """
+        entry = self.in_flight.get(key)
+        if entry is None:
+            return False
+        metrics.observe(f"{self.name}.ack_seconds", time.monotonic() - entry[1])
+        await self.release([key])
+        return True
+
+    async def expire(self) -> list[T]:
+        """Release the items that have been in flight for longer than `timeout`."""
+        if self.timeout is None:
+            return []
+        deadline = time.monotonic() - self.timeout
+        expired = [key for key, (_, sent_at) in self.in_flight.items() if sent_at <= deadline]
+        if expired:
+            metrics.increment(f"{self.name}.ack_timeouts", len(expired))
+            logger.warning(f"{self.name}: {len(expired)} items were not acknowledged within {self.timeout}s")
+        return await self.release(expired)
+
+    async def run_expiry(self) -> None:
+        """
+        Expire unacknowledged items whenever the oldest one is due; runs forever.
+
+        `timeout` may be changed while it runs. Without one nothing expires,
+        and it checks every IDLE_POLL seconds whether one was set since.
+        """
+        while True:
+            if self.timeout is None:
+                await sleep(IDLE_POLL)
+                continue
+            await self.expire()
+            oldest = min((sent_at for _, sent_at in self.in_flight.values()), default=time.monotonic())
+            # Items added while sleeping are due no earlier than a full timeout from now
+            await sleep(max(oldest + self.timeout - time.monotonic(), 0.01))
@@ -0,0 +1,46 @@
+"""
+Rough memory accounting for Python object graphs.
+"""
+import sys
+from typing import Any
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """
+    Estimate the bytes held by obj and everything reachable from it.
+
+    Follows containers, instance __dict__s and __slots__; objects reachable
+    along several paths are counted once. Pass the same `seen` set to
+    several calls to avoid counting shared objects twice. Numpy arrays that
+    own their data report it through sys.getsizeof.
+
+    Args:
+        obj: The root object
+        seen: IDs of objects that were already counted
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        if hasattr(current, "__dict__") and not isinstance(current, type):
+            stack.append(vars(current))
+        for slot in getattr(type(current), "__slots__", ()):
+            if hasattr(current, slot):
+                stack.append(getattr(current, slot))
+    return size
@@ -0,0 +1,183 @@
+"""
+Interruptible consumption of async iterators on the Flowno event loop.
+"""
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any, Generic, TypeVar
+
+from flowno import AsyncQueue, sleep, spawn
+from flowno.core.event_loop.tasks import TaskHandle
+
+from .bounded_queue import BoundedQueue
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_ITEM = "item"
+_END = "end"
+_ERROR = "error"
+
+
+class StreamStalled(TimeoutError):
+    """Raised from a StreamPump whose source missed its first-item or inter-item deadline."""
+
+
+class StreamPump(Generic[T], AsyncIterator[T]):
+    """
+    Reads a source async iterator in its own task and hands the items over a queue.
+
+    The consumer iterates the pump instead of the source. Because the consumer
+    only ever waits on the queue, another task can interrupt it with
+    `interrupt()` even while the source is blocked on the network.
+
+    `interrupt()` also calls `on_interrupt`, which must make the source's
+    pending read return (e.g. by shutting down its socket). The reader task
+    then sees the pump was abandoned, closes the source and exits instead of
+    staying parked on a connection nobody reads anymore.
+
+    When deadlines are given, a watchdog task interrupts the pump with
+    StreamStalled if the first item takes longer than `first_item_timeout`
+    or the gap between two items exceeds `item_timeout`.
+
+    With `maxsize`, the reader stops reading the source while that many
+    items are waiting for the consumer, so a slow consumer holds back the
+    source instead of letting the buffer grow.
+
+    Flowno's TaskHandle.cancel() is not used because it is not safe for tasks
+    parked on a socket.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[T],
+        on_interrupt: Callable[[], None] | None = None,
+        first_item_timeout: float | None = None,
+        item_timeout: float | None = None,
+        maxsize: int | None = None,
+        name: str = "stream_pump",
+    ):
+        """
+        Args:
+            source: The async iterator to read
+            on_interrupt: Called by `interrupt()` to abort the source's pending read
+            first_item_timeout: Seconds allowed until the source yields its first item
+            item_timeout: Seconds allowed between two items
+            maxsize: Items buffered for the consumer (unbounded if None)
+            name: Name of the buffer's metrics (with maxsize)
+        """
+        self._source = source
+        self._on_interrupt = on_interrupt
+        self._queue: AsyncQueue[tuple[str, Any]] = (
+            BoundedQueue(maxsize, "block", name) if maxsize is not None else AsyncQueue()
+        )
+        self._abandoned = False
+        self._done = False
+        self._reader: TaskHandle[None] | None = None
+        self.first_item_timeout = first_item_timeout
+        self.item_timeout = item_timeout
+        self.started_at = time.monotonic()
+        self.first_item_at: float | None = None
+        self.last_item_at: float | None = None
+
+    async def start(self) -> "StreamPump[T]":
+        """Spawn the reader task (and the watchdog, if deadlines are set). Returns self for chaining."""
+        self.started_at = time.monotonic()
+        self._reader = await spawn(self._read())
+        if self.first_item_timeout is not None or self.item_timeout is not None:
+            await spawn(self._watch())
+        return self
+
+    def _deadline(self) -> float | None:
+        """When the source must deliver its next item, or None if it may take forever."""
+        if self.last_item_at is None:
+            if self.first_item_timeout is None:
+                return None
+            return self.started_at + self.first_item_timeout
+        if self.item_timeout is None:
+            return None
+        return self.last_item_at + self.item_timeout
+
+    async def _watch(self) -> None:
+        """Interrupt the pump once the source misses its deadline."""
+        while not (self._done or self._abandoned):
+            deadline = self._deadline()
+            if deadline is None:
+                # Only a first-item deadline was set and it was met
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                waiting_for = "first item" if self.last_item_at is None else "next item"
+                elapsed = time.monotonic() - (self.last_item_at or self.started_at)
+                await self.interrupt(StreamStalled(f"No {waiting_for} for {elapsed:.1f}s"))
+                return
+            await sleep(remaining)
+
+    async def wait_closed(self) -> None:
+        """Wait until the reader task has finished and closed the source."""
+        if self._reader is not None:
+            await self._reader.join()
+
+    async def _read(self) -> None:
+        try:
+            async for item in self._source:
+                if self._abandoned:
+                    break
+                self.last_item_at = time.monotonic()
+                if self.first_item_at is None:
+                    self.first_item_at = self.last_item_at
+                await self._queue.put((_ITEM, item))
+            if not self._abandoned:
+                await self._queue.put((_END, None))
+        except Exception as e:
+            if not self._abandoned:
+                await self._queue.put((_ERROR, e))
+            else:
+                logger.debug(f"Abandoned stream failed after interrupt: {e}")
+        finally:
+            self._done = True
+            aclose = getattr(self._source, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception as e:
+                    logger.debug(f"Error closing abandoned stream: {e}")
+
+    async def interrupt(self, reason: Exception) -> None:
+        """
+        Make the consumer raise `reason` and abandon the source.
+
+        Args:
+            reason: The exception raised from the consumer's pending `__anext__`
+        """
+        if self._abandoned:
+            return
+        self._abandoned = True
+        if self._on_interrupt is not None:
+            try:
+                self._on_interrupt()
+            except Exception as e:
+                logger.debug(f"Error aborting stream source: {e}")
+        if isinstance(self._queue, BoundedQueue):
+            # Buffered items are never read now; this also frees a reader blocked on a full buffer
+            await self._queue.reset((_ERROR, reason))
+        else:
+            await self._queue.put((_ERROR, reason))
+
+    @property
+    def abandoned(self) -> bool:
+        """Whether the pump was interrupted or the consumer stopped early."""
+        return self._abandoned
+
+    def __aiter__(self) -> "StreamPump[T]":
+        return self
+
+    async def __anext__(self) -> T:
+        kind, value = await self._queue.get()
+        if kind == _ITEM:
+            return value
+        self._abandoned = True
+        if kind == _END:
+            raise StopAsyncIteration
+        raise value
@@ -0,0 +1,26 @@
+"""
+Splitting text into search terms.
+
+Kept free of third-party imports so it can be loaded in a subinterpreter
+(see services/interpreters.py).
+"""
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no signal for retrieval
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do for from have how i if in is it me my "
+    "of on or so that the this to was we what when where which who why will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase a text and split it into indexable terms."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def tokenize_all(texts: list[str]) -> list[list[str]]:
+    """Tokenize several texts at once."""
+    return [tokenize(text) for text in texts]
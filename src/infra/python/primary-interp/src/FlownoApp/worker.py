@@ -0,0 +1,59 @@
+"""
+Entry point of a shard worker process.
+
+ShardRouter (services/sharding.py) starts this file as a script, not as a
+module, because importing the FlownoApp package creates the app and the
+shard bridge has to be installed as `nodejs_callback_bridge` before that:
+
+    python FlownoApp/worker.py <host> <port> <shard index>
+
+The worker connects back to the primary interpreter, then runs its own
+ChatApp and Flowno graph.
+"""
+import importlib.util
+import logging
+import os
+import socket
+import sys
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def install_bridge() -> ModuleType:
+    """Load ipc/shard_bridge.py on its own and install it as nodejs_callback_bridge."""
+    path = os.path.join(PACKAGE_DIR, "ipc", "shard_bridge.py")
+    spec = importlib.util.spec_from_file_location("nodejs_callback_bridge", path)
+    assert spec is not None and spec.loader is not None
+    bridge = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bridge)
+    sys.modules["nodejs_callback_bridge"] = bridge
+    return bridge
+
+
+def main(argv: list[str]) -> None:
+    host, port, shard = argv[0], int(argv[1]), int(argv[2])
+    # Running a script puts its directory first on sys.path; FlownoApp's
+    # subpackages must only be importable through the package
+    sys.path = [p for p in sys.path if os.path.abspath(p or ".") != PACKAGE_DIR]
+
+    bridge = install_bridge()
+    bridge.connect(socket.create_connection((host, port)))
+    bridge.send_message({"type": "shard-hello", "shard": shard})
+
+    from FlownoApp import app
+
+    async def serve() -> None:
+        """Handle messages from the primary interpreter; exit once it disconnects."""
+        await bridge.pump_inbound()
+        raise SystemExit(0)
+
+    app.f.create_task(serve())
+    logger.info(f"Shard {shard} running")
+    app.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
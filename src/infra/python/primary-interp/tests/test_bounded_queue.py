@@ -0,0 +1,159 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, sleep, spawn
+
+from FlownoApp.messages.ipc_schema import SentenceEvent, SentenceEventPayload
+from FlownoApp.nodes.gui_io import merge_sentences
+from FlownoApp.services.metrics import metrics
+from FlownoApp.utils.bounded_queue import BoundedQueue
+from FlownoApp.utils.stream_pump import StreamPump
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+def join(a, b):
+    return None if "|" in a + b else a + b
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+class TestBoundedQueue:
+    def test_block_waits_for_the_consumer(self):
+        queue = BoundedQueue(2, "block", "test")
+        order = []
+
+        async def producer():
+            for i in range(4):
+                await queue.put(i)
+                order.append(f"put {i}")
+
+        async def scenario():
+            handle = await spawn(producer())
+            await sleep(0.01)
+            order.append(f"depth {len(queue)}")
+            for _ in range(4):
+                order.append(f"got {await queue.get()}")
+            await handle.join()
+
+        run(scenario())
+        assert order[:3] == ["put 0", "put 1", "depth 2"]
+        assert [entry for entry in order if entry.startswith("got")] == ["got 0", "got 1", "got 2", "got 3"]
+        assert metrics.snapshot()["counters"]["queues.test.full"] >= 1
+
+    def test_drop_oldest_keeps_the_newest_items(self):
+        queue = BoundedQueue(2, "drop_oldest", "test")
+
+        async def scenario():
+            for i in range(5):
+                await queue.put(i)
+            return [await queue.get() for _ in range(len(queue))]
+
+        assert run(scenario()) == [3, 4]
+        assert metrics.snapshot()["counters"]["queues.test.dropped"] == 3
+        assert metrics.snapshot()["gauges"]["queues.test.depth"] == 0
+
+    def test_coalesce_merges_into_the_newest_item(self):
+        queue = BoundedQueue(2, "coalesce", "test", join)
+
+        async def scenario():
+            for item in "abcde":
+                await queue.put(item)
+            return [await queue.get() for _ in range(len(queue))]
+
+        assert run(scenario()) == ["a", "bcde"]
+        assert metrics.snapshot()["counters"]["queues.test.coalesced"] == 3
+
+    def test_coalesce_blocks_when_items_cannot_be_merged(self):
+        queue = BoundedQueue(1, "coalesce", "test", join)
+        got = []
+
+        async def scenario():
+            await queue.put("a")
+            handle = await spawn(queue.put("|"))
+            await sleep(0.01)
+            assert len(queue) == 1
+            got.append(await queue.get())
+            await handle.join()
+            got.append(await queue.get())
+
+        run(scenario())
+        assert got == ["a", "|"]
+
+    def test_coalesce_requires_merge(self):
+        with pytest.raises(ValueError):
+            BoundedQueue(1, "coalesce")
+
+    def test_reset_replaces_the_items_and_frees_blocked_producers(self):
+        queue = BoundedQueue(1, "block", "test")
+
+        async def scenario():
+            await queue.put("stale")
+            handle = await spawn(queue.put("late"))
+            await sleep(0.01)
+            await queue.reset("final")
+            first = await queue.get()
+            await handle.join()
+            return first
+
+        assert run(scenario()) == "final"
+
+
+class TestBoundedStreamPump:
+    def test_interrupt_frees_a_reader_blocked_on_a_full_buffer(self):
+        closed = []
+
+        class Source:
+            def __init__(self):
+                self.i = 0
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                self.i += 1
+                return self.i
+
+            async def aclose(self):
+                closed.append(self.i)
+
+        async def scenario():
+            pump = await StreamPump(Source(), maxsize=3, name="test").start()
+            first = await pump.__anext__()
+            await sleep(0.01)
+            await pump.interrupt(ConnectionError("stop"))
+            with pytest.raises(ConnectionError):
+                await pump.__anext__()
+            await pump.wait_closed()
+            return first
+
+        assert run(scenario()) == 1
+        # The reader stopped a few items ahead of the consumer
+        assert closed and closed[0] <= 6
+
+
+class TestMergeSentences:
+    def sentence(self, text, chunk_id):
+        payload = SentenceEventPayload(id=f"s-{chunk_id}", chunk_ids=[chunk_id], text=text, audio="", order=0)
+        return SentenceEvent(type="sentence", payload=payload)
+
+    def test_sentences_of_one_chat_and_epoch_are_joined(self):
+        merged = merge_sentences(("a", 0, self.sentence("One.", "c1")), ("a", 0, self.sentence("Two.", "c2")))
+        assert merged[2].payload.text == "One. Two."
+        assert merged[2].payload.chunk_ids == ["c1", "c2"]
+        assert merged[2].payload.id == "s-c1"
+
+    def test_sentences_of_different_chats_or_epochs_are_kept_apart(self):
+        one = ("a", 0, self.sentence("One.", "c1"))
+        assert merge_sentences(one, ("b", 0, self.sentence("Two.", "c2"))) is None
+        assert merge_sentences(one, ("a", 1, self.sentence("Two.", "c2"))) is None
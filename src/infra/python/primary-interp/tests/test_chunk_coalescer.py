@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock
+import json
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, sleep
+
+from FlownoApp.messages.domain_types import StreamingConfig
+from FlownoApp.messages.encoders import NodeJSMessageJSONEncoder
+from FlownoApp.messages.ipc_schema import ChunkedResponse
+from FlownoApp.services.metrics import metrics
+from FlownoApp.utils.chunk_coalescer import ChunkCoalescer
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+def chunk(i, content="tok ", response_id="r1", finish_reason=None):
+    return ChunkedResponse("chunk", f"c{i}", response_id, content, finish_reason)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+class TestChunkCoalescer:
+    def coalesce(self, config, scenario):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        coalescer = ChunkCoalescer(send, config, name="test")
+        run(scenario(coalescer))
+        return sent
+
+    def test_disabled_sends_every_chunk(self):
+        async def scenario(coalescer):
+            for i in range(3):
+                await coalescer.add(chunk(i, finish_reason="stop" if i == 2 else None))
+
+        sent = self.coalesce(StreamingConfig(coalesce=False), scenario)
+        assert [c.id for c in sent] == ["c0", "c1", "c2"]
+        assert all(c.chunk_ids is None for c in sent)
+        assert metrics.snapshot()["summaries"]["test.bridge_calls_per_response"]["max"] == 3
+
+    def test_burst_is_sent_as_one_chunk(self):
+        async def scenario(coalescer):
+            for i in range(5):
+                await coalescer.add(chunk(i, finish_reason="stop" if i == 4 else None))
+
+        sent = self.coalesce(StreamingConfig(coalesce=True, min_interval=1, max_interval=1), scenario)
+        # The first chunk goes out at once, the rest waits for the finish reason
+        assert [(c.id, c.content, c.chunk_ids, c.finish_reason) for c in sent] == [
+            ("c0", "tok ", None, None),
+            ("c1", "tok " * 4, ["c1", "c2", "c3", "c4"], "stop"),
+        ]
+        counters = metrics.snapshot()["counters"]
+        assert (counters["test.chunks"], counters["test.bridge_calls"]) == (5, 2)
+
+    def test_buffered_chunks_are_sent_after_the_interval(self):
+        async def scenario(coalescer):
+            for i in range(3):
+                await coalescer.add(chunk(i))
+            await sleep(0.1)
+
+        sent = self.coalesce(StreamingConfig(coalesce=True, min_interval=0.05, max_interval=0.05), scenario)
+        assert [c.chunk_ids for c in sent] == [None, ["c1", "c2"]]
+
+    def test_byte_threshold_and_new_responses_flush(self):
+        async def scenario(coalescer):
+            await coalescer.add(chunk(0))
+            await coalescer.add(chunk(1, "x" * 8))
+            await coalescer.add(chunk(2))
+            await coalescer.add(chunk(3, response_id="r2"))
+            await coalescer.close()
+
+        sent = self.coalesce(StreamingConfig(coalesce=True, min_interval=1, max_interval=1, max_bytes=8), scenario)
+        assert [(c.id, c.response_id) for c in sent] == [("c0", "r1"), ("c1", "r1"), ("c2", "r1"), ("c3", "r2")]
+
+    def test_interval_follows_the_token_rate(self):
+        config = StreamingConfig(coalesce=True, min_interval=0.01, max_interval=0.2, chunks_per_flush=4)
+
+        async def scenario(coalescer):
+            for i in range(4):
+                await coalescer.add(chunk(i))
+                await sleep(0.02)
+            return coalescer.interval
+
+        async def discard(message):
+            pass
+
+        coalescer = ChunkCoalescer(discard, config)
+        interval = run(scenario(coalescer))
+        assert 0.06 < interval < 0.2
+
+    def test_merged_ids_are_encoded(self):
+        merged = ChunkedResponse("chunk", "c1", "r1", "ab", chunk_ids=["c1", "c2"])
+        assert json.loads(NodeJSMessageJSONEncoder().encode(merged))["chunk_ids"] == ["c1", "c2"]
+        assert "chunk_ids" not in json.loads(NodeJSMessageJSONEncoder().encode(chunk(0)))
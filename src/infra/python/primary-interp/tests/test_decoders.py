@@ -0,0 +1,123 @@
+from unittest.mock import AsyncMock, MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop
+
+from FlownoApp.ipc.handler import handle_message
+from FlownoApp.ipc.registry import MESSAGE_HANDLERS, MESSAGE_SCHEMAS
+from FlownoApp.messages.decoders import DecodeError, decode, decoder_for
+from FlownoApp.messages.domain_types import AppState
+from FlownoApp.messages.ipc_schema import (
+    ChatLoadedResponse, NewPromptMessage, SentenceEvent, SetApiConfigRequest, StopGenerationRequest,
+)
+from FlownoApp.services import outbox
+from FlownoApp.services.metrics import metrics
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+def error(cls, message):
+    with pytest.raises(DecodeError) as e:
+        decode(cls, message)
+    return str(e.value)
+
+
+class TestDecoders:
+    def test_every_handled_message_has_a_schema(self):
+        assert MESSAGE_SCHEMAS.keys() == MESSAGE_HANDLERS.keys()
+
+    def test_decoders_are_compiled_once_per_class(self):
+        assert decoder_for(NewPromptMessage) is decoder_for(NewPromptMessage)
+        assert decoder_for(NewPromptMessage).__name__ == "decode_NewPromptMessage"
+
+    def test_messages_are_decoded_with_defaults_and_unknown_keys_ignored(self):
+        # As ChatWindow sends it, with an id next to the type
+        prompt = decode(NewPromptMessage, {
+            "id": "m1", "type": "new-prompt", "content": {"id": "m1", "role": "user", "content": "Hi"},
+        })
+        assert (prompt.content.id, prompt.content.content, prompt.content.chatId) == ("m1", "Hi", None)
+
+        assert decode(StopGenerationRequest, {"type": "stop-generation"}).payload is None
+        assert decode(StopGenerationRequest, {"type": "stop-generation", "payload": {"chatId": "c"}}).payload.chatId == "c"
+
+        config = decode(SetApiConfigRequest, {"type": "set-api-config", "payload": {"temperature": 1, "max_tokens": 64}})
+        assert (config.payload.temperature, config.payload.max_tokens, config.payload.url) == (1.0, 64, None)
+
+    def test_nested_lists_are_decoded(self):
+        loaded = decode(ChatLoadedResponse, {
+            "type": "chat-loaded", "payload": {"chatId": "c", "messages": [{"id": "m0", "role": "user", "content": "Hi"}]},
+        })
+        assert loaded.payload.messages[0].content == "Hi"
+        event = decode(SentenceEvent, {
+            "type": "sentence",
+            "payload": {"id": "s0", "chunk_ids": ["c0"], "text": "One.", "audio": "", "order": 0,
+                        "audio_ref": {"path": "/tmp/s0.wav", "size": 4, "media_type": "audio/wav"}},
+        })
+        assert event.payload.audio_ref.size == 4
+
+    def test_errors_name_the_field_at_fault(self):
+        assert error(NewPromptMessage, {"type": "new-prompt"}) == "content: missing"
+        assert error(StopGenerationRequest, {"type": "stop"}) == "type: expected 'stop-generation', got 'stop'"
+        assert error(SetApiConfigRequest, {"type": "set-api-config", "payload": {"max_tokens": True}}) == (
+            "payload.max_tokens: expected number, got boolean"
+        )
+        messages = [{"id": "m0", "role": "user", "content": "Hi"}, {"id": 1, "role": "user", "content": "Hi"}]
+        assert error(ChatLoadedResponse, {"type": "chat-loaded", "payload": {"chatId": "c", "messages": messages}}) == (
+            "payload.messages[1].id: expected string, got number"
+        )
+        assert error(StopGenerationRequest, ["stop-generation"]) == "expected object, got array"
+
+
+class TestHandleMessage:
+    @pytest.fixture
+    def bridge(self, monkeypatch):
+        metrics.reset()
+        bridge = MagicMock()
+        monkeypatch.setattr(outbox, "nodejs_callback_bridge", bridge)
+        return bridge
+
+    def test_handlers_get_decoded_messages(self, bridge):
+        context = MagicMock(app_state=AppState(current_chat_id="current"), router=MagicMock(submit=AsyncMock()))
+
+        run(handle_message({"type": "new-prompt", "content": {"id": "m1", "role": "system", "content": "Hi"}}, context))
+
+        chat_id, message = context.router.submit.await_args.args
+        assert (chat_id, message.id, message.role, message.content) == ("current", "m1", "user", "Hi")
+
+    def test_prompts_with_another_or_no_role_are_stored_as_user(self, bridge):
+        context = MagicMock(app_state=AppState(current_chat_id="current"), router=MagicMock(submit=AsyncMock()))
+
+        run(handle_message({"type": "new-prompt", "content": {"id": "m1", "role": "assistant", "content": "Hi"}}, context))
+        run(handle_message({"type": "new-prompt", "content": {"id": "m2", "content": "Hi"}}, context))
+
+        roles = [call.args[1].role for call in context.router.submit.await_args_list]
+        assert roles == ["user", "user"]
+        bridge.send_message.assert_not_called()
+
+    def test_invalid_messages_are_answered_with_an_error(self, bridge):
+        context = MagicMock(app_state=AppState())
+
+        run(handle_message({"type": "load-chat", "payload": {"chatId": None}}, context))
+
+        reply = bridge.send_message.call_args.args[0]
+        assert (reply.type, reply.payload.originalMessageType) == ("error", "load-chat")
+        assert reply.payload.message == "Invalid load-chat message: payload.chatId: expected string, got null"
+        assert metrics.snapshot()["counters"]["ipc.load-chat.invalid"] == 1
+        assert context.app_state.current_chat_id is None
+
+    def test_empty_chat_id_is_answered_with_an_error(self, bridge):
+        context = MagicMock(app_state=AppState())
+
+        run(handle_message({"type": "load-chat", "payload": {"chatId": ""}}, context))
+
+        reply = bridge.send_message.call_args.args[0]
+        assert (reply.type, reply.payload.originalMessageType) == ("error", "load-chat")
+        assert "Missing chat ID" in reply.payload.message
+        assert context.app_state.current_chat_id is None
@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, sleep, spawn
+
+from FlownoApp.ipc.dispatch import PriorityDispatcher
+from FlownoApp.services.metrics import metrics
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+class TestPriorityDispatcher:
+    def test_control_messages_overtake_queued_bulk_messages(self):
+        handled = []
+
+        async def handle(message):
+            handled.append(message["type"] + message.get("n", ""))
+            if message["type"] == "load-chat":
+                await sleep(0.02)
+
+        dispatcher = PriorityDispatcher(handle, name="test")
+
+        async def scenario():
+            for n in "123":
+                await spawn(dispatcher.dispatch({"type": "load-chat", "n": n}))
+            await sleep(0.01)
+            await dispatcher.dispatch({"type": "stop-generation"})
+            await sleep(0.1)
+
+        run(scenario())
+        assert handled == ["load-chat1", "stop-generation", "load-chat2", "load-chat3"]
+        summaries = metrics.snapshot()["summaries"]
+        assert summaries["test.control.latency_seconds"]["max"] < 0.01
+        assert summaries["test.bulk.latency_seconds"]["count"] == 3
+        assert not dispatcher.draining
+
+    def test_a_failing_handler_does_not_stop_the_lane(self):
+        handled = []
+
+        async def handle(message):
+            if message["type"] == "bad":
+                raise ValueError("bad message")
+            handled.append(message["type"])
+
+        dispatcher = PriorityDispatcher(handle)
+
+        async def scenario():
+            await dispatcher.dispatch({"type": "bad"})
+            await dispatcher.dispatch({"type": "new-prompt"})
+            await sleep(0.01)
+
+        run(scenario())
+        assert handled == ["new-prompt"]
+
+    def test_batches_are_handled_in_order(self):
+        handled = []
+
+        async def handle(message):
+            handled.append(message["type"])
+            if message["type"] == "load-chat":
+                await sleep(0.02)
+
+        dispatcher = PriorityDispatcher(handle, name="test")
+
+        async def scenario():
+            await dispatcher.dispatch({"type": "batch", "messages": [
+                {"type": "load-chat"}, {"type": "get-api-config"}, {"type": "get-chat-list"},
+            ]})
+            await sleep(0.005)
+            # A batch of control messages does not wait for the bulk lane
+            await dispatcher.dispatch({"type": "batch", "messages": [
+                {"type": "get-api-config"}, {"type": "set-speech"},
+            ]})
+            await sleep(0.1)
+
+        run(scenario())
+        assert handled == ["load-chat", "get-api-config", "set-speech", "get-api-config", "get-chat-list"]
+        assert metrics.snapshot()["summaries"]["test.batch_size"]["count"] == 2
+
+    def test_malformed_batches_are_dropped(self):
+        handled = []
+
+        async def handle(message):
+            handled.append(message["type"])
+
+        dispatcher = PriorityDispatcher(handle)
+
+        async def scenario():
+            await dispatcher.dispatch({"type": "batch", "messages": "get-chat-list"})
+            await dispatcher.dispatch({"type": "batch", "messages": ["get-chat-list", {"type": "get-chat-list"}]})
+            await sleep(0.01)
+
+        run(scenario())
+        assert handled == ["get-chat-list"]
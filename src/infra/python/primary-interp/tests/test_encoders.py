@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock
+import json
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+
+from FlownoApp.messages import encoders
+from FlownoApp.messages.domain_types import Message
+from FlownoApp.messages.encoders import NodeJSMessageJSONEncoder, serializer_for
+from FlownoApp.messages.ipc_schema import (
+    AudioRef, BatchMessage, ChatLoadedPayload, ChatLoadedResponse, ChunkedResponse,
+    NewResponseMessage, NewResponsePayload, SentenceEvent, SentenceEventPayload,
+)
+
+
+def encode(message, fast=False):
+    return json.loads(NodeJSMessageJSONEncoder(fast=fast).encode(message))
+
+
+class TestSerializers:
+    def test_serializers_are_compiled_once_per_class(self):
+        serialize = serializer_for(ChunkedResponse)
+        assert serialize is serializer_for(ChunkedResponse)
+        assert serialize.__name__ == "serialize_ChunkedResponse"
+        assert serializer_for(dict) is None
+
+    def test_unset_optional_fields_are_left_out(self):
+        assert encode(ChunkedResponse("chunk", "c0", "r1", "Hi")) == {
+            "type": "chunk", "id": "c0", "response_id": "r1", "content": "Hi",
+        }
+        chunk = ChunkedResponse("chunk", "c0", "r1", "Hi", "stop", "chat", ["c0", "c1"])
+        assert encode(chunk)["chunk_ids"] == ["c0", "c1"]
+        response = NewResponseMessage("new-response", NewResponsePayload("r1", "assistant", ""))
+        assert encode(response) == {"type": "new-response", "response": {"id": "r1", "role": "assistant", "content": ""}}
+
+    def test_nested_dataclasses_are_serialized(self):
+        payload = SentenceEventPayload("s0", ["c0"], "One.", "", 0, audio_ref=AudioRef("/tmp/s0.wav", 4, "audio/wav"))
+        event = encode(SentenceEvent("sentence", payload))
+        assert event["payload"]["audio_ref"] == {"path": "/tmp/s0.wav", "size": 4, "media_type": "audio/wav"}
+        # Other optional fields are sent as null, as the frontend expects
+        assert event["payload"]["chat_id"] is None
+
+        loaded = ChatLoadedResponse("chat-loaded", ChatLoadedPayload("chat", [Message("m0", "user", "Hi")]))
+        batch = encode(BatchMessage("batch", [loaded, {"type": "ack"}]))
+        assert batch["messages"][0]["payload"]["messages"] == [{"id": "m0", "role": "user", "content": "Hi"}]
+
+        # Values of other types than the annotated ones are left to the encoder
+        forwarded = ChatLoadedResponse("chat-loaded", {"chatId": "chat", "messages": []})
+        assert encode(forwarded)["payload"] == {"chatId": "chat", "messages": []}
+
+    def test_fast_backend_encodes_the_same_messages(self):
+        pytest.importorskip("orjson")
+        messages = [
+            ChunkedResponse("chunk", "c0", "r1", "Hi", chunk_ids=["c0"]),
+            ChatLoadedResponse("chat-loaded", ChatLoadedPayload("chat", [Message("m0", "user", "Hi")])),
+            {"type": "sentence", "payload": {"id": "s0"}},
+        ]
+        assert NodeJSMessageJSONEncoder(fast=True).fast
+        assert [encode(m, fast=True) for m in messages] == [encode(m) for m in messages]
+
+    def test_fast_backend_needs_orjson(self, monkeypatch):
+        monkeypatch.setattr(encoders, "orjson", None)
+        assert not NodeJSMessageJSONEncoder(fast=True).fast
@@ -0,0 +1,235 @@
+import pytest
+from unittest.mock import MagicMock
+import socket
+import sys
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from flowno import EventLoop, sleep, spawn
+from flowno.core.event_loop.selectors import SocketHandle
+
+from FlownoApp.services.generation import GenerationControl, GenerationCancelled
+from FlownoApp.services.llm_client import AbortableHttpClient
+from FlownoApp.nodes.inference import stream_completion
+from FlownoApp.utils.stream_pump import StreamPump, StreamStalled
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class SocketSource:
+    """A stream read from one end of a socket pair, like a streaming HTTP body."""
+
+    def __init__(self, items: list[str]):
+        self.ours, self.theirs = socket.socketpair()
+        self.ours.setblocking(False)
+        self.theirs.settimeout(1)
+        for item in items:
+            self.theirs.sendall(item.encode())
+
+    async def read(self):
+        handle = SocketHandle(self.ours)
+        while True:
+            data = await handle.recv(1024)
+            if not data:
+                return
+            yield data.decode()
+
+    def abort(self):
+        self.ours.shutdown(socket.SHUT_RDWR)
+
+    def peer_disconnected(self) -> bool:
+        """Whether the other end sees the connection as closed."""
+        return self.theirs.recv(1024) == b""
+
+
+async def finite_source(items):
+    for item in items:
+        yield item
+
+
+class TestStreamPump:
+    def test_pump_forwards_items_and_ends(self):
+        async def scenario():
+            pump = await StreamPump(finite_source([1, 2, 3])).start()
+            return [item async for item in pump]
+
+        assert run(scenario()) == [1, 2, 3]
+
+    def test_pump_forwards_source_errors(self):
+        async def failing_source():
+            yield 1
+            raise ConnectionResetError("reset")
+
+        async def scenario():
+            pump = await StreamPump(failing_source()).start()
+            received = []
+            with pytest.raises(ConnectionResetError):
+                async for item in pump:
+                    received.append(item)
+            return received
+
+        assert run(scenario()) == [1]
+
+    def test_interrupt_aborts_stalled_source(self):
+        """Interrupting wakes the consumer and drops the connection the reader is parked on."""
+        source = SocketSource(["a"])
+
+        async def scenario():
+            pump = await StreamPump(source.read(), on_interrupt=source.abort).start()
+
+            async def interrupter():
+                await sleep(0.01)
+                await pump.interrupt(TimeoutError("stalled"))
+
+            await spawn(interrupter())
+            received = []
+            with pytest.raises(TimeoutError):
+                async for item in pump:
+                    received.append(item)
+            await pump.wait_closed()
+            return received, pump.abandoned
+
+        received, abandoned = run(scenario())
+        assert received == ["a"]
+        assert abandoned
+        assert source.peer_disconnected()
+
+
+class TestStallDeadlines:
+    def collect(self, pump):
+        async def scenario():
+            await pump.start()
+            received = []
+            try:
+                async for item in pump:
+                    received.append(item)
+            except StreamStalled as e:
+                received.append(e)
+            await pump.wait_closed()
+            return received
+
+        return run(scenario())
+
+    def test_missing_first_item_stalls(self):
+        source = SocketSource([])
+        pump = StreamPump(source.read(), on_interrupt=source.abort, first_item_timeout=0.05)
+
+        received = self.collect(pump)
+
+        assert len(received) == 1 and isinstance(received[0], StreamStalled)
+        assert "first item" in str(received[0])
+        assert source.peer_disconnected()
+
+    def test_gap_between_items_stalls(self):
+        source = SocketSource(["a"])
+        pump = StreamPump(
+            source.read(), on_interrupt=source.abort, first_item_timeout=1.0, item_timeout=0.05
+        )
+
+        received = self.collect(pump)
+
+        assert received[0] == "a"
+        assert isinstance(received[1], StreamStalled)
+        assert pump.first_item_at is not None
+        assert source.peer_disconnected()
+
+    def test_timely_stream_is_not_interrupted(self):
+        async def slow_source():
+            for item in ["a", "b", "c"]:
+                await sleep(0.01)
+                yield item
+
+        pump = StreamPump(slow_source(), first_item_timeout=0.5, item_timeout=0.5)
+
+        assert self.collect(pump) == ["a", "b", "c"]
+
+
+class TestAbortableHttpClient:
+    def test_abort_drops_connection_waiting_for_headers(self):
+        """A request whose server never answers is disconnected by abort()."""
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        url = f"http://127.0.0.1:{listener.getsockname()[1]}/v1/chat/completions"
+        client = AbortableHttpClient()
+
+        async def scenario():
+            source = stream_completion(client, url, {"stream": True})
+            pump = await StreamPump(source, on_interrupt=client.abort).start()
+            await sleep(0.05)
+            await pump.interrupt(GenerationCancelled())
+            with pytest.raises(GenerationCancelled):
+                async for _ in pump:
+                    pass
+            await pump.wait_closed()
+
+        run(scenario())
+
+        conn, _ = listener.accept()
+        conn.settimeout(1)
+        received = b""
+        while chunk := conn.recv(1024):
+            received += chunk
+        assert received.startswith(b"POST /v1/chat/completions")
+        conn.close()
+        listener.close()
+
+
+class TestGenerationControl:
+    def test_request_stop_without_generation(self):
+        control = GenerationControl()
+        assert run(control.request_stop()) is False
+        assert not control.is_active
+
+    def test_request_stop_interrupts_and_waits_for_finish(self):
+        control = GenerationControl()
+        source = SocketSource(["partial"])
+        events = []
+
+        async def generation():
+            control.begin("response-1")
+            pump = await StreamPump(source.read(), on_interrupt=source.abort).start()
+            control.attach(pump)
+            try:
+                async for item in pump:
+                    events.append(item)
+            except GenerationCancelled:
+                events.append("cancelled")
+            finally:
+                await control.finish()
+
+        async def scenario():
+            await spawn(generation())
+            await sleep(0.01)
+            stopped = await control.request_stop()
+            events.append("stop returned")
+            return stopped
+
+        assert run(scenario()) is True
+        assert events == ["partial", "cancelled", "stop returned"]
+        assert not control.is_active
+        assert source.peer_disconnected()
+
+    def test_request_stop_ends_a_wait_between_attempts(self):
+        control = GenerationControl()
+        events = []
+
+        async def generation():
+            control.begin("response-1")
+            started = time.monotonic()
+            await control.sleep(5.0)
+            events.append(control.stop_requested and time.monotonic() - started < 1.0)
+            await control.finish()
+
+        async def scenario():
+            await spawn(generation())
+            await sleep(0.01)
+            return await control.request_stop()
+
+        assert run(scenario()) is True
+        assert events == [True]
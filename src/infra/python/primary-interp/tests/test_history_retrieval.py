@@ -0,0 +1,140 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from FlownoApp.messages.domain_types import Message, AppState, ContextConfig
+from FlownoApp.services.retrieval import BM25Index, HistoryRetriever, tokenize
+
+
+class TestBM25Index:
+    def test_tokenize_drops_case_punctuation_and_stop_words(self):
+        """Terms are lowercased alphanumerics without stop words."""
+        assert tokenize("What is the Capital of France?") == ["capital", "france"]
+
+    def test_search_ranks_matching_documents_first(self):
+        """Documents sharing rare query terms score highest."""
+        index = BM25Index()
+        index.add("d0", "Paris is the capital of France")
+        index.add("d1", "Bananas are a good source of potassium")
+        index.add("d2", "The Eiffel tower is in Paris")
+
+        assert index.search("capital of france", top_k=1) == [0]
+        assert set(index.search("paris", top_k=5)) == {0, 2}
+        assert index.search("quantum chromodynamics", top_k=5) == []
+
+    def test_search_respects_limit(self):
+        """Documents at or after the limit are never returned."""
+        index = BM25Index()
+        for i in range(10):
+            index.add(f"d{i}", "python packaging")
+
+        hits = index.search("python", top_k=10, limit=4)
+        assert sorted(hits) == [0, 1, 2, 3]
+        hits = index.search("python", top_k=10, limit=6, start=3)
+        assert sorted(hits) == [3, 4, 5]
+
+    def test_postings_grow_past_initial_capacity(self):
+        """Adding many documents keeps all postings and lengths."""
+        index = BM25Index()
+        for i in range(100):
+            index.add(f"d{i}", f"common term{i}")
+
+        assert len(index) == 100
+        assert index.search("term57", top_k=1) == [57]
+        assert len(index.search("common", top_k=100)) == 100
+
+
+class TestHistoryRetriever:
+    def make_history(self) -> list[Message]:
+        history = [Message("system-0", "system", "You are a helpful assistant.")]
+        topics = ["sourdough bread recipe", "rust borrow checker", "tax deadlines"]
+        for i in range(12):
+            topic = topics[i % len(topics)]
+            history.append(Message(f"u{i}", "user", f"Question {i} about {topic}"))
+            history.append(Message(f"a{i}", "assistant", f"Answer {i} about {topic}"))
+        history.append(Message("u-last", "user", "Remind me about the sourdough starter"))
+        return history
+
+    def test_disabled_retrieval_returns_context_unchanged(self):
+        retriever = HistoryRetriever(AppState(context_config=ContextConfig(retrieval_top_k=0)))
+        history = self.make_history()
+
+        assert retriever.select(history, history) is history
+
+    def test_select_splices_relevant_exchanges_before_recent_window(self):
+        state = AppState(current_chat_id="chat-1", context_config=ContextConfig(keep_recent=3, retrieval_top_k=2))
+        retriever = HistoryRetriever(state)
+        history = self.make_history()
+
+        context = retriever.select(history, history)
+
+        assert context[0] == history[0]
+        assert context[-3:] == history[-3:]
+        retrieved = context[1:-3]
+        assert retrieved, "expected at least one retrieved exchange"
+        assert all("sourdough" in m.content for m in retrieved)
+        # Retrieved messages keep their chronological order
+        positions = [history.index(m) for m in retrieved]
+        assert positions == sorted(positions)
+
+    def test_index_updates_incrementally_and_rebuilds_on_divergence(self):
+        state = AppState(current_chat_id="chat-1", context_config=ContextConfig(retrieval_top_k=2))
+        retriever = HistoryRetriever(state)
+        history = self.make_history()
+
+        index = retriever.index_for("chat-1", history[:10])
+        assert len(index) == 10
+        assert retriever.index_for("chat-1", history) is index
+        assert len(index) == len(history)
+
+        edited = history[:5] + [Message("edited", "user", "changed")]
+        rebuilt = retriever.index_for("chat-1", edited)
+        assert rebuilt is not index
+        assert rebuilt.doc_ids == [m.id for m in edited]
+
+    def test_index_rebuilds_when_the_last_indexed_message_changes(self):
+        """A regenerated last turn is detected without hashing the history."""
+        state = AppState(current_chat_id="chat-1", context_config=ContextConfig(retrieval_top_k=2))
+        retriever = HistoryRetriever(state)
+        history = self.make_history()
+
+        index = retriever.index_for("chat-1", history)
+        edited = history[:-1] + [Message(history[-1].id, history[-1].role, "regenerated answer about gardening")]
+        rebuilt = retriever.index_for("chat-1", edited)
+
+        assert rebuilt is not index
+        assert rebuilt.search("gardening", top_k=1) == [len(history) - 1]
+
+    def test_earlier_edits_are_reported_through_forget(self):
+        state = AppState(current_chat_id="chat-1", context_config=ContextConfig(retrieval_top_k=2))
+        retriever = HistoryRetriever(state)
+        history = self.make_history()
+
+        index = retriever.index_for("chat-1", history)
+        edited = list(history)
+        edited[3] = Message(history[3].id, "user", "rewritten question about gardening")
+        # Only the count and the last message are compared
+        assert retriever.index_for("chat-1", edited) is index
+
+        retriever.forget("chat-1")
+        rebuilt = retriever.index_for("chat-1", edited)
+        assert rebuilt is not index
+        assert rebuilt.search("gardening", top_k=1) == [3]
+
+    def test_select_skips_turns_covered_by_summary(self):
+        """Turns before the summary boundary are never retrieved."""
+        state = AppState(current_chat_id="chat-1", context_config=ContextConfig(keep_recent=3, retrieval_top_k=4))
+        retriever = HistoryRetriever(state)
+        history = self.make_history()
+        start = 13
+        note = Message("summary-x", "system", "summary")
+        context = history[:1] + [note] + history[start:]
+
+        result = retriever.select(history, context, start)
+
+        assert result[:2] == [history[0], note]
+        assert result[-3:] == history[-3:]
+        assert all(history.index(m) >= start for m in result[2:])
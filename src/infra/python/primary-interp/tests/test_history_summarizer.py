@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock, patch
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from flowno import EventLoop
+
+from FlownoApp.messages.domain_types import Message, ApiConfig, ContextConfig
+from FlownoApp.services import summarizer as summarizer_module
+from FlownoApp.services.summarizer import HistorySummarizer, SUMMARY_PREFIX
+
+
+def make_history(num_turns: int) -> list[Message]:
+    """Build a history of a system prompt followed by alternating user/assistant turns."""
+    history = [Message("system-0", "system", "You are a helpful assistant.")]
+    for i in range(num_turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append(Message(f"msg-{i}", role, f"turn {i}"))
+    return history
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class TestHistorySummarizer:
+    def make_summarizer(self, **config):
+        context_config = ContextConfig(summary_threshold=10, keep_recent=4, summary_block=4, **config)
+        return HistorySummarizer(ApiConfig(), context_config)
+
+    def test_short_history_is_unchanged(self):
+        """Histories under the threshold pass through without scheduling work."""
+        summarizer = self.make_summarizer()
+        history = make_history(5)
+
+        with patch.object(summarizer_module, "complete") as complete:
+            result = run(summarizer.compact(history))
+
+        assert result == history
+        complete.assert_not_called()
+
+    def test_range_keys_are_block_aligned_and_stable(self):
+        """Prefix hashes only depend on the covered messages."""
+        history = make_history(20)
+        keys = HistorySummarizer.range_keys(history[1:], block=4, limit=12)
+
+        assert [length for length, _ in keys] == [4, 8, 12]
+        # Appending more turns does not change the hashes of earlier prefixes
+        longer = HistorySummarizer.range_keys(make_history(30)[1:], block=4, limit=12)
+        assert keys == longer
+
+    def test_summary_replaces_oldest_turns_once_cached(self):
+        """The first long call schedules a summary; the next call uses it."""
+        summarizer = self.make_summarizer()
+        history = make_history(20)
+        calls = []
+
+        async def fake_complete(messages, api_config, model=None, max_tokens=None, scheduler=None):
+            calls.append(messages)
+            return "the user counted turns"
+
+        async def scenario():
+            first = await summarizer.compact(history)
+            await summarizer.wait_for_job()
+            second = await summarizer.compact(history)
+            return first, second
+
+        with patch.object(summarizer_module, "complete", fake_complete):
+            first, second = run(scenario())
+
+        # Full history is sent until the summary is ready
+        assert first == history
+        assert len(calls) == 1
+
+        # 20 turns - 4 recent = 16 covered turns (four blocks of 4)
+        assert second[0] == history[0]
+        assert second[1].role == "system"
+        assert second[1].content == f"{SUMMARY_PREFIX}\nthe user counted turns"
+        assert second[2:] == history[17:]
+
+    def test_failed_summary_falls_back_to_full_history(self):
+        """Summarization errors are swallowed and the history is sent as-is."""
+        summarizer = self.make_summarizer()
+        history = make_history(20)
+
+        async def failing_complete(messages, api_config, model=None, max_tokens=None, scheduler=None):
+            raise RuntimeError("boom")
+
+        async def scenario():
+            await summarizer.compact(history)
+            await summarizer.wait_for_job()
+            return await summarizer.compact(history)
+
+        with patch.object(summarizer_module, "complete", failing_complete):
+            result = run(scenario())
+
+        assert result == history
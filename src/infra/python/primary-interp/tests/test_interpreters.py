@@ -0,0 +1,95 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, spawn
+
+from FlownoApp.messages.domain_types import Message, AppState, ContextConfig
+from FlownoApp.services.interpreters import SubinterpreterPool, subinterpreters_available
+from FlownoApp.services.metrics import metrics
+from FlownoApp.services.retrieval import BM25Index, HistoryRetriever
+from FlownoApp.utils.terms import tokenize_all
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+@pytest.fixture
+def pool():
+    pool = SubinterpreterPool(2)
+    yield pool
+    pool.close()
+
+
+class TestSubinterpreterPool:
+    def test_runs_functions_and_returns_their_results(self, pool):
+        assert run(pool.run(tokenize_all, ["Hello World", "the cat"])) == [["hello", "world"], ["cat"]]
+
+    def test_concurrent_calls_each_get_their_own_result(self, pool):
+        async def scenario():
+            handles = [await spawn(pool.run(tokenize_all, [f"word{i}"])) for i in range(6)]
+            return [await handle.join() for handle in handles]
+
+        assert run(scenario()) == [[[f"word{i}"]] for i in range(6)]
+
+    def test_exceptions_are_raised_in_the_caller(self, pool):
+        with pytest.raises(ValueError):
+            run(pool.run(int, "not a number"))
+
+    @pytest.mark.skipif(not subinterpreters_available(), reason="needs subinterpreters")
+    def test_pure_python_runs_isolated(self, pool):
+        metrics.reset()
+        run(pool.run(tokenize_all, ["text"]))
+        assert metrics.snapshot()["counters"]["interpreters.isolated_calls"] == 1
+
+    def test_modules_that_cannot_load_in_a_subinterpreter_fall_back_to_threads(self, pool):
+        """retrieval imports numpy, which does not support subinterpreters."""
+        index = BM25Index()
+        index.add("d0", "text")
+        metrics.reset()
+
+        assert run(pool.run(BM25Index.__len__, index)) == 1
+        assert run(pool.run(BM25Index.__len__, index)) == 1
+        assert metrics.snapshot()["counters"]["interpreters.thread_calls"] == 2
+
+    def test_closed_pool_refuses_work(self):
+        pool = SubinterpreterPool(1)
+        pool.close()
+        with pytest.raises(RuntimeError):
+            run(pool.run(tokenize_all, []))
+
+
+class TestRetrieverPrepare:
+    def make_history(self, turns):
+        messages = [Message("system-0", "system", "You are a helpful assistant.")]
+        for i in range(turns):
+            messages.append(Message(f"u{i}", "user", f"question {i} about topic{i}"))
+            messages.append(Message(f"a{i}", "assistant", f"answer {i} about topic{i}"))
+        return messages
+
+    def test_prepare_indexes_long_histories_in_the_pool(self, pool):
+        app_state = AppState(context_config=ContextConfig(retrieval_top_k=2, keep_recent=4))
+        with_pool = HistoryRetriever(app_state, pool=pool)
+        without_pool = HistoryRetriever(app_state)
+        messages = self.make_history(20)
+        messages.append(Message("u-last", "user", "tell me about topic3"))
+
+        run(with_pool.prepare(messages, "chat"))
+
+        assert len(with_pool.session_index("chat")) == len(messages)
+        assert with_pool.select(messages, messages, session_id="chat") == without_pool.select(
+            messages, messages, session_id="chat"
+        )
+
+    def test_prepare_leaves_short_batches_to_select(self, pool):
+        app_state = AppState(context_config=ContextConfig(retrieval_top_k=2))
+        retriever = HistoryRetriever(app_state, pool=pool)
+
+        run(retriever.prepare(self.make_history(2), "chat"))
+
+        assert retriever.session_index("chat") is None
@@ -0,0 +1,115 @@
+from unittest.mock import MagicMock
+import sys
+import threading
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, sleep, spawn
+
+from FlownoApp.messages.domain_types import OffloadConfig
+from FlownoApp.services import offload
+from FlownoApp.services.metrics import metrics
+from FlownoApp.services.offload import OffloadCancelled, cpu_bound
+from FlownoApp.utils.terms import tokenize_all
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    metrics.reset()
+    yield
+    offload.shutdown()
+
+
+class TestCpuBound:
+    def test_runs_off_the_event_loop_thread(self):
+        @cpu_bound
+        def thread_name():
+            return threading.current_thread().name
+
+        assert run(thread_name()).startswith("offload")
+        assert metrics.snapshot()["summaries"]["offload.thread_name.run_seconds"]["count"] == 1
+
+    def test_exceptions_are_raised_in_the_caller(self):
+        @cpu_bound
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            run(fail())
+        assert metrics.snapshot()["counters"]["offload.fail.errors"] == 1
+
+    def test_methods_receive_their_instance(self):
+        class Doubler:
+            factor = 2
+
+            @cpu_bound
+            def double(self, x):
+                return x * self.factor
+
+        assert run(Doubler().double(21)) == 42
+
+    def test_max_pending_bounds_calls_in_flight(self):
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        @cpu_bound(max_pending=2)
+        def work(i):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return i
+
+        async def scenario():
+            handles = [await spawn(work(i)) for i in range(6)]
+            return [await handle.join() for handle in handles]
+
+        assert run(scenario()) == list(range(6))
+        assert peak <= 2
+        assert metrics.snapshot()["gauges"]["offload.work.in_flight"] == 0
+
+    def test_cancel_pending_cancels_queued_calls(self):
+        offload.configure(OffloadConfig(thread_workers=1))
+        release = threading.Event()
+
+        @cpu_bound
+        def block():
+            release.wait(5)
+            return "ran"
+
+        async def scenario():
+            first = await spawn(block())
+            second = await spawn(block())
+            while len(block._pending) < 2:
+                await sleep(0.001)
+            assert block.cancel_pending() == 1
+            release.set()
+            results = [await first.join()]
+            try:
+                await second.join()
+            except OffloadCancelled:
+                results.append("cancelled")
+            return results
+
+        try:
+            assert run(scenario()) == ["ran", "cancelled"]
+        finally:
+            offload.configure(OffloadConfig())
+        assert metrics.snapshot()["counters"]["offload.block.cancelled"] == 1
+
+    def test_process_pool_runs_module_level_functions(self):
+        split = cpu_bound(tokenize_all, executor="process", name="split")
+        assert run(split(["Hello world"])) == [["hello", "world"]]
+
@@ -0,0 +1,163 @@
+from unittest.mock import MagicMock
+import sys
+import threading
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, sleep, spawn
+
+from FlownoApp.messages.ipc_schema import BatchMessage
+from FlownoApp.services import outbox as outbox_module
+from FlownoApp.services.metrics import metrics
+from FlownoApp.services.outbox import Outbox
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+
+
+class Bridge:
+    """Records messages and bridge crossings; sending blocks while `gate` is closed."""
+
+    def __init__(self):
+        self.sent = []
+        self.crossings = 0
+        self.threads = set()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def send_message(self, message):
+        self.gate.wait(5)
+        messages = message.messages if isinstance(message, BatchMessage) else [message]
+        if "bad" in messages:
+            raise ValueError("cannot encode")
+        self.threads.add(threading.current_thread().name)
+        self.crossings += 1
+        self.sent.extend(messages)
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    bridge = Bridge()
+    monkeypatch.setattr(outbox_module, "nodejs_callback_bridge", bridge)
+    return bridge
+
+
+class TestOutbox:
+    def test_messages_are_written_in_order_off_the_event_loop(self, bridge):
+        outbox = Outbox(name="test")
+
+        async def scenario():
+            for i in range(10):
+                await outbox.send(i)
+            await sleep(0.1)
+
+        run(scenario())
+        assert bridge.sent == list(range(10))
+        assert threading.current_thread().name not in bridge.threads
+        assert not outbox.writing
+        summaries = metrics.snapshot()["summaries"]
+        assert summaries["test.bulk.latency_seconds"]["count"] == 10
+        assert summaries["test.batch_size"]["max"] > 1
+
+    def test_every_batch_is_sent_from_the_same_thread(self, bridge):
+        outbox = Outbox(max_batch=1, name="test")
+
+        async def scenario():
+            for i in range(20):
+                await outbox.send(i)
+                if i % 5 == 0:
+                    await sleep(0.01)
+            await sleep(0.1)
+
+        run(scenario())
+        assert bridge.sent == list(range(20))
+        assert len(bridge.threads) == 1
+        assert metrics.snapshot()["summaries"]["test.write_seconds"]["count"] == 20
+
+    def test_blocked_bridge_holds_back_only_the_senders(self, bridge):
+        outbox = Outbox(maxsize=2, max_batch=1, name="test")
+        bridge.gate.clear()
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await sleep(0.01)
+
+        async def scenario():
+            await spawn(ticker())
+            started = time.monotonic()
+            # One message is being written, two are queued, the fourth waits for room
+            for i in range(3):
+                await outbox.send(i)
+            sender = await spawn(outbox.send(3))
+            await sleep(0.1)
+            depth = len(outbox)
+            bridge.gate.set()
+            await sender.join()
+            await sleep(0.1)
+            return started, depth
+
+        started, depth = run(scenario())
+        assert depth == 2
+        assert len(ticks) == 5 and ticks[-1] - started < 0.1
+        assert bridge.sent == [0, 1, 2, 3]
+        assert metrics.snapshot()["counters"]["queues.test.bulk.full"] >= 1
+
+    def test_control_messages_are_written_ahead_of_bulk_messages(self, bridge):
+        outbox = Outbox(max_batch=4, name="test")
+        bridge.gate.clear()
+
+        async def scenario():
+            for i in range(10):
+                await outbox.send({"type": "chunk", "id": i})
+            await sleep(0.05)
+            await outbox.send({"type": "ack"})
+            bridge.gate.set()
+            await sleep(0.1)
+
+        run(scenario())
+        # The first chunk was being written when the acknowledgement was queued
+        assert [message.get("id", "ack") for message in bridge.sent] == [0, "ack", 1, 2, 3, 4, 5, 6, 7, 8, 9]
+        assert metrics.snapshot()["summaries"]["test.control.latency_seconds"]["count"] == 1
+
+    def test_failed_sends_are_counted_and_skipped(self, bridge):
+        outbox = Outbox(name="test")
+
+        async def scenario():
+            for message in ("a", "bad", "b"):
+                await outbox.send(message)
+            await sleep(0.1)
+
+        run(scenario())
+        assert bridge.sent == ["a", "b"]
+        assert metrics.snapshot()["counters"]["test.errors"] == 1
+
+    def test_batches_cross_the_bridge_in_one_envelope(self, bridge):
+        bridge.gate.clear()
+
+        async def scenario(outbox):
+            for i in range(9):
+                await outbox.send(i)
+            bridge.gate.set()
+            await sleep(0.1)
+
+        run(scenario(Outbox(max_batch=4, name="test")))
+        # The first message is written alone, the others four at a time
+        assert (bridge.sent, bridge.crossings) == (list(range(9)), 3)
+
+        bridge.sent.clear()
+        bridge.crossings = 0
+        bridge.gate.clear()
+        run(scenario(Outbox(max_batch=4, name="test", envelopes=False)))
+        assert (bridge.sent, bridge.crossings) == (list(range(9)), 9)
@@ -0,0 +1,30 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from FlownoApp.messages.domain_types import Message
+from FlownoApp.services.rate_limit import TokenBucket, estimate_tokens
+
+
+class TestTokenBucket:
+    def test_bucket_starts_full_and_refills_at_rate(self):
+        bucket = TokenBucket(per_minute=60)  # one unit per second
+        assert bucket.delay_for(60, now=bucket.updated) == 0.0
+
+        bucket.consume(60, now=bucket.updated)
+        assert bucket.delay_for(1, now=bucket.updated) == 1.0
+        assert bucket.delay_for(1, now=bucket.updated + 0.5) == 0.5
+        assert bucket.delay_for(1, now=bucket.updated + 1.0) == 0.0
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        bucket = TokenBucket(per_minute=60)
+        bucket.consume(30, now=bucket.updated)
+        # 100 units can never fit; it is admitted once the bucket is full again
+        assert bucket.delay_for(100, now=bucket.updated) == 30.0
+
+    def test_estimate_tokens(self):
+        messages = [Message("u1", "user", "x" * 40), Message("a1", "assistant", "")]
+        assert estimate_tokens(messages) == 10 + 4 + 4
@@ -0,0 +1,196 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from flowno import EventLoop, sleep, spawn
+
+from FlownoApp.messages.domain_types import RateLimitConfig
+from FlownoApp.services.scheduler import AdmissionCancelled, RequestScheduler, Priority
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class TestRateLimits:
+    def test_unlimited_scheduler_admits_immediately(self):
+        scheduler = RequestScheduler(RateLimitConfig())
+        assert run(scheduler.acquire("url", "token", 10_000)) < 0.05
+
+    def test_requests_over_budget_are_delayed_not_failed(self):
+        # 6000 tokens per minute = 100 per second
+        scheduler = RequestScheduler(RateLimitConfig(tokens_per_minute=6000))
+        waits = []
+
+        async def scenario():
+            waits.append(await scheduler.acquire("url", "token", 6000))
+            waits.append(await scheduler.acquire("url", "token", 10))
+
+        run(scenario())
+        assert waits[0] < 0.05
+        assert 0.08 <= waits[1] < 0.5
+
+    def test_profiles_have_separate_budgets(self):
+        scheduler = RequestScheduler(RateLimitConfig(requests_per_minute=1))
+        waits = []
+
+        async def scenario():
+            waits.append(await scheduler.acquire("url-a", "token", 1))
+            waits.append(await scheduler.acquire("url-b", "token", 1))
+
+        run(scenario())
+        assert all(w < 0.05 for w in waits)
+
+    def test_queue_depth_counts_waiting_requests(self):
+        scheduler = RequestScheduler(RateLimitConfig(tokens_per_minute=6000))
+        depths = []
+
+        async def scenario():
+            await scheduler.acquire("url", "token", 6000)
+            first = await spawn(scheduler.acquire("url", "token", 5))
+            second = await spawn(scheduler.acquire("url", "token", 5))
+            depths.append(scheduler.waiting)
+            await first.join()
+            await second.join()
+            depths.append(scheduler.waiting)
+
+        run(scenario())
+        assert depths == [2, 0]
+
+
+class TestPriorities:
+    def test_concurrency_is_limited_per_class(self):
+        scheduler = RequestScheduler(RateLimitConfig(background_concurrency=1))
+        order = []
+
+        async def job(name):
+            await scheduler.acquire("url", "token", 1, Priority.BACKGROUND)
+            order.append(f"{name} start")
+            await sleep(0.02)
+            order.append(f"{name} end")
+            await scheduler.release(Priority.BACKGROUND)
+
+        async def scenario():
+            await spawn(job("a"))
+            await spawn(job("b"))
+
+        run(scenario())
+        assert order == ["a start", "a end", "b start", "b end"]
+
+    def test_interactive_request_overtakes_queued_background_work(self):
+        scheduler = RequestScheduler(RateLimitConfig(background_concurrency=1))
+        order = []
+
+        async def request(name, priority, duration):
+            await scheduler.acquire("url", "token", 1, priority)
+            order.append(name)
+            await sleep(duration)
+            await scheduler.release(priority)
+
+        async def scenario():
+            await spawn(request("background-1", Priority.BACKGROUND, 0.05))
+            await sleep(0.01)
+            # Queued behind the running background job
+            await spawn(request("background-2", Priority.BACKGROUND, 0.0))
+            await sleep(0.01)
+            await spawn(request("interactive", Priority.INTERACTIVE, 0.0))
+
+        run(scenario())
+        assert order == ["background-1", "interactive", "background-2"]
+
+    def test_background_waits_for_announced_foreground_turn(self):
+        scheduler = RequestScheduler(RateLimitConfig())
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire("url", "token", 1, priority)
+            order.append(name)
+            await scheduler.release(priority)
+
+        async def scenario():
+            scheduler.expect_foreground()
+            await spawn(request("background", Priority.BACKGROUND))
+            await sleep(0.02)
+            await request("interactive", Priority.INTERACTIVE)
+
+        run(scenario())
+        assert order == ["interactive", "background"]
+
+    def test_cancelled_request_leaves_the_queue_when_woken(self):
+        scheduler = RequestScheduler(RateLimitConfig(interactive_concurrency=1))
+        stopped = False
+        events = []
+
+        async def waiting_request():
+            try:
+                await scheduler.acquire("url", "token", 1, cancelled=lambda: stopped)
+                events.append("admitted")
+            except AdmissionCancelled:
+                events.append("cancelled")
+
+        async def scenario():
+            nonlocal stopped
+            await scheduler.acquire("url", "token", 1)
+            await spawn(waiting_request())
+            await sleep(0.01)
+            stopped = True
+            await scheduler.wake()
+            await sleep(0.01)
+            events.append(scheduler.waiting)
+
+        run(scenario())
+        assert events == ["cancelled", 0]
+
+    def test_cancelled_interactive_request_unblocks_background_work(self):
+        scheduler = RequestScheduler(RateLimitConfig(interactive_concurrency=1))
+        stopped = False
+        order = []
+
+        async def interactive():
+            try:
+                await scheduler.acquire("url", "token", 1, cancelled=lambda: stopped)
+            except AdmissionCancelled:
+                order.append("interactive cancelled")
+
+        async def background():
+            await scheduler.acquire("url", "token", 1, Priority.BACKGROUND)
+            order.append("background")
+            await scheduler.release(Priority.BACKGROUND)
+
+        async def scenario():
+            nonlocal stopped
+            await scheduler.acquire("url", "token", 1)
+            await spawn(interactive())
+            await spawn(background())
+            await sleep(0.01)
+            stopped = True
+            await scheduler.wake()
+            await sleep(0.01)
+            order.append("first interactive still running")
+            await scheduler.release()
+
+        run(scenario())
+        assert order == ["interactive cancelled", "background", "first interactive still running"]
+
+    def test_every_announced_foreground_turn_defers_background_work(self):
+        scheduler = RequestScheduler(RateLimitConfig())
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire("url", "token", 1, priority)
+            order.append(name)
+            await scheduler.release(priority)
+
+        async def scenario():
+            scheduler.expect_foreground()
+            scheduler.expect_foreground()
+            await request("interactive-1", Priority.INTERACTIVE)
+            await spawn(request("background", Priority.BACKGROUND))
+            await sleep(0.1)
+            await request("interactive-2", Priority.INTERACTIVE)
+
+        run(scenario())
+        assert order == ["interactive-1", "interactive-2", "background"]
@@ -0,0 +1,84 @@
+from unittest.mock import MagicMock, patch
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+from FlownoApp.messages.domain_types import Message, ApiConfig, RetryConfig
+from FlownoApp.nodes.inference import build_request, new_id, parse_retry_after
+from FlownoApp.services import retry as retry_module
+from FlownoApp.services.llm_client import ApiError
+from FlownoApp.services.metrics import Metrics
+from FlownoApp.services.retry import is_retryable, backoff_delay
+
+
+class TestRetryPolicy:
+    def test_transient_failures_are_retryable(self):
+        assert is_retryable(ConnectionResetError("reset"))
+        assert is_retryable(TimeoutError("slow"))
+        assert is_retryable(ApiError("HTTP/1.1 429 Too Many Requests", b""))
+        assert is_retryable(ApiError("HTTP/1.1 503 Service Unavailable", b""))
+
+    def test_permanent_failures_are_not_retryable(self):
+        assert not is_retryable(ApiError("HTTP/1.1 400 Bad Request", b""))
+        assert not is_retryable(ApiError("HTTP/1.1 401 Unauthorized", b""))
+        assert not is_retryable(ApiError("", b""))
+        assert not is_retryable(ValueError("bug"))
+
+    def test_backoff_doubles_and_is_capped(self):
+        config = RetryConfig(base_delay=0.5, max_delay=3.0, jitter=0.0)
+        assert [backoff_delay(config, n) for n in range(4)] == [0.5, 1.0, 2.0, 3.0]
+
+    def test_jitter_only_shortens_the_delay(self):
+        config = RetryConfig(base_delay=1.0, max_delay=10.0, jitter=0.5)
+        with patch.object(retry_module.random, "random", return_value=1.0):
+            assert backoff_delay(config, 1) == 1.0
+        with patch.object(retry_module.random, "random", return_value=0.0):
+            assert backoff_delay(config, 1) == 2.0
+
+    def test_retry_after_is_honoured_up_to_max_delay(self):
+        config = RetryConfig(base_delay=0.5, max_delay=5.0, jitter=0.0)
+        assert backoff_delay(config, 0, retry_after=2.0) == 2.0
+        assert backoff_delay(config, 0, retry_after=60.0) == 5.0
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+        assert parse_retry_after(None) is None
+
+
+class TestResumeRequest:
+    def test_partial_answer_is_sent_as_assistant_prefix(self):
+        messages = [Message("u1", "user", "Count to five")]
+        request = build_request(messages, ApiConfig(model="m"), "response-1", partial="1, 2, ")
+
+        assert request["model"] == "m"
+        assert request["messages"][:-1] == messages
+        assert request["messages"][-1] == Message("response-1-partial", "assistant", "1, 2, ")
+        # The conversation itself is not modified
+        assert len(messages) == 1
+
+    def test_first_attempt_sends_conversation_unchanged(self):
+        messages = [Message("u1", "user", "Hi")]
+        assert build_request(messages, None, "response-1")["messages"] == messages
+
+    def test_ids_created_in_the_same_millisecond_are_unique(self):
+        ids = [new_id("response") for _ in range(1000)]
+        assert len(set(ids)) == len(ids)
+        assert all(i.startswith("response-") for i in ids)
+
+
+class TestMetrics:
+    def test_snapshot_reports_counters_gauges_and_summaries(self):
+        registry = Metrics()
+        registry.increment("inference.retries")
+        registry.increment("inference.retries", 2)
+        registry.set_gauge("queue.depth", 4)
+        registry.observe("inference.retry_delay_s", 0.5)
+        registry.observe("inference.retry_delay_s", 1.5)
+
+        snapshot = registry.snapshot()
+        assert snapshot["counters"] == {"inference.retries": 3}
+        assert snapshot["gauges"] == {"queue.depth": 4}
+        assert snapshot["summaries"]["inference.retry_delay_s"] == {
+            "count": 2, "total": 2.0, "mean": 1.0, "max": 1.5,
+        }
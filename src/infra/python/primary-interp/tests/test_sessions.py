@@ -0,0 +1,188 @@
+from unittest.mock import MagicMock
+import sys
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, FlowHDL, node, sleep, spawn
+
+from FlownoApp.messages.domain_types import AppState, ChatSession, ContextConfig, Message, SessionConfig
+from FlownoApp.messages.ipc_schema import ChunkedResponse
+from FlownoApp.nodes.chat_history import ChatHistory
+from FlownoApp.nodes.gui_io import GUIChat, PromptRouter
+from FlownoApp.nodes.inference import ChunkContents
+from FlownoApp.services.retrieval import HistoryRetriever
+from FlownoApp.services.sessions import SessionRouter, SessionManager, GenerationLane
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class TestSessionRouter:
+    def test_prompts_of_different_chats_go_to_different_lanes(self):
+        router = SessionRouter(2)
+        taken = []
+
+        async def scenario():
+            await router.submit("a", Message("p1", "user", "hi"))
+            await router.submit("b", Message("p2", "user", "hi"))
+            for lane in router.lanes:
+                taken.append((lane.index, (await router.next_prompt(lane)).id, lane.chat_id))
+
+        run(scenario())
+        assert taken == [(0, "p1", "a"), (1, "p2", "b")]
+        assert router.lanes[1].control.chat_id == "b"
+
+    def test_next_prompt_of_a_chat_waits_for_its_lane(self):
+        router = SessionRouter(2)
+        first, second = router.lanes
+        taken = []
+
+        async def take(lane: GenerationLane):
+            taken.append((lane.index, (await router.next_prompt(lane)).id))
+
+        async def scenario():
+            await router.submit("a", Message("p1", "user", "hi"))
+            await take(first)
+            await router.submit("a", Message("p2", "user", "again"))
+            # The first lane still holds the unrecorded answer of chat a
+            waiting = await spawn(take(second))
+            await sleep(0.05)
+            taken.append(("waiting", router.waiting))
+            await take(first)
+            await router.submit("a", Message("p3", "user", "third"))
+            await router.release(first, "a")
+            await waiting.join()
+
+        run(scenario())
+        assert taken == [(0, "p1"), ("waiting", 1), (0, "p2"), (1, "p3")]
+
+    def test_histories_are_kept_per_chat(self):
+        router = SessionRouter(1)
+        router.history("a").append(Message("p1", "user", "hi"))
+        assert [m.id for m in router.history("a")] == ["system-0", "p1"]
+        assert [m.id for m in router.history("b")] == ["system-0"]
+
+    def test_lane_count_must_be_positive(self):
+        with pytest.raises(ValueError):
+            SessionRouter(0)
+
+
+def never_in_use(chat_id):
+    return False
+
+
+class TestSessionManager:
+    def test_session_is_built_from_the_saved_chat(self):
+        store = {"a": ChatSession("a", "A", [Message("u1", "user", "hello")])}
+        sessions = SessionManager(SessionConfig(), store)
+        assert [m.id for m in sessions.get("a").messages] == ["system-0", "u1"]
+        assert "a" in sessions and sessions.live == 1
+
+    def test_teardown_saves_turns_and_drops_the_index(self):
+        store: dict[str, ChatSession] = {}
+        retriever = HistoryRetriever(AppState(context_config=ContextConfig(retrieval_top_k=2)))
+        sessions = SessionManager(SessionConfig(), store, retriever)
+        messages = sessions.get("a").messages
+        messages.append(Message("u1", "user", "what is a flow graph " * 50))
+        retriever.index_for("a", messages)
+        size = sessions.memory_usage("a")
+        assert size > 1000
+
+        assert sessions.teardown("a") == size
+        assert "a" not in sessions
+        assert retriever.session_index("a") is None
+        assert [m.id for m in store["a"].messages] == ["u1"]
+        # Rebuilding restores the history
+        assert [m.id for m in sessions.get("a").messages] == ["system-0", "u1"]
+
+    def test_least_recently_used_idle_sessions_are_torn_down(self):
+        sessions = SessionManager(SessionConfig(max_live_sessions=2, idle_timeout=None))
+        for chat_id in ["a", "b", "c"]:
+            sessions.get(chat_id)
+        sessions.get("a")
+        assert sessions.trim(lambda chat_id: chat_id == "b") == ["c"]
+        assert sessions.live == 2
+
+    def test_sessions_idle_past_the_timeout_are_torn_down(self):
+        sessions = SessionManager(SessionConfig(idle_timeout=10.0))
+        sessions.get(None)
+        sessions.get("a")
+        sessions.get("b").last_used += 5
+        now = sessions.get("a").last_used + 10
+        assert sessions.trim(never_in_use, now) == ["a"]
+        # The chat without an ID is never torn down
+        assert None in sessions and "b" in sessions
+
+    def test_router_keeps_chats_in_use_live(self):
+        router = SessionRouter(1, SessionManager(SessionConfig(max_live_sessions=1)))
+        lane = router.lanes[0]
+
+        async def scenario():
+            await router.submit("a", Message("a1", "user", "hi"))
+            await router.next_prompt(lane)
+            router.history("a")
+            router.history("b")
+            await router.release(lane, "b")
+
+        run(scenario())
+        # Chat a still waits for its answer to be recorded, so only b goes
+        assert "a" in router.sessions and "b" not in router.sessions
+
+
+class Finished(BaseException):
+    """Ends the flow once the scenario is done."""
+
+
+class TestConcurrentLanes:
+    def test_chats_generate_concurrently_with_tagged_chunks(self):
+        router = SessionRouter(2)
+        chunks: list[tuple[float, ChunkedResponse]] = []
+        started = time.monotonic()
+
+        @node
+        async def FakeInference(messages: list[Message], lane: GenerationLane):
+            for i in range(3):
+                await sleep(0.1)
+                chunk = ChunkedResponse("chunk", f"c{i}", f"r-{lane.chat_id}", f"{i}", chat_id=lane.chat_id)
+                chunks.append((time.monotonic() - started, chunk))
+                yield chunk
+
+        with FlowHDL() as f:
+            f.router = PromptRouter(router)
+            for lane in router.lanes:
+                i = lane.index
+                setattr(f, f"gui_chat_{i}", GUIChat(f.router, lane, getattr(f, f"inference_{i}")))
+                setattr(f, f"inference_{i}", FakeInference(getattr(f, f"history_{i}"), lane))
+                setattr(f, f"contents_{i}", ChunkContents(getattr(f, f"inference_{i}")))
+                setattr(f, f"history_{i}", ChatHistory(
+                    getattr(f, f"gui_chat_{i}"), getattr(f, f"contents_{i}"), lane
+                ))
+
+        async def scenario():
+            await router.submit("a", Message("a1", "user", "first"))
+            await router.submit("b", Message("b1", "user", "second"))
+            await sleep(0.6)
+            await router.submit("a", Message("a2", "user", "third"))
+            await sleep(0.6)
+            raise Finished()
+
+        f.create_task(scenario())
+        with pytest.raises(Finished):
+            f.run_until_complete()
+
+        first_a = [t for t, c in chunks if c.chat_id == "a"][:3]
+        first_b = [t for t, c in chunks if c.chat_id == "b"]
+        # Both answers were streamed at the same time, not one after the other
+        assert len(first_b) == 3
+        assert max(first_a[-1], first_b[-1]) < 0.5
+
+        # The answers were recorded in their own chat's history
+        assert [m.content for m in router.history("a")] == [
+            "You are a helpful assistant.", "first", "012", "third"
+        ]
+        assert [m.content for m in router.history("b")][:2] == ["You are a helpful assistant.", "second"]
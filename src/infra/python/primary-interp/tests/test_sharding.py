@@ -0,0 +1,210 @@
+from unittest.mock import MagicMock
+import json
+import socket
+import sys
+import threading
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, SocketHandle, sleep, spawn
+
+from FlownoApp.ipc import shard_bridge
+from FlownoApp.messages.domain_types import AppState
+from FlownoApp.services import outbox, sharding
+from FlownoApp.services.sharding import HashRing, ShardConnection, ShardRouter
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class TestHashRing:
+    def test_keys_are_spread_over_all_shards(self):
+        ring = HashRing(4)
+        counts = [0] * 4
+        for i in range(4000):
+            counts[ring.shard_for(f"chat-{i}")] += 1
+        assert all(600 < count < 1400 for count in counts)
+
+    def test_adding_a_shard_only_moves_keys_to_it(self):
+        before, after = HashRing(3), HashRing(4)
+        for i in range(1000):
+            key = f"chat-{i}"
+            assert after.shard_for(key) in (before.shard_for(key), 3)
+
+    def test_requires_a_shard(self):
+        with pytest.raises(ValueError):
+            HashRing(0)
+
+
+class TestShardRouter:
+    @pytest.fixture
+    def bridge(self, monkeypatch):
+        bridge = MagicMock()
+        monkeypatch.setattr(outbox, "nodejs_callback_bridge", bridge)
+        return bridge
+
+    def make_router(self, shards=2):
+        """A router whose workers are the far ends of socket pairs."""
+        handled = []
+
+        async def handle_locally(message):
+            handled.append(message)
+
+        app_state = AppState(current_chat_id="current")
+        router = ShardRouter(app_state, shards, handle_locally)
+        workers = []
+        for shard in range(shards):
+            primary, worker = socket.socketpair()
+            router.connections[shard] = ShardConnection(shard, SocketHandle(primary))
+            workers.append(worker)
+        run(router._ready.set())
+        return router, workers, handled
+
+    def received(self, worker):
+        worker.setblocking(False)
+        try:
+            data = worker.recv(65536)
+        except BlockingIOError:
+            return []
+        return [json.loads(line) for line in data.splitlines()]
+
+    def test_prompts_go_to_the_shard_owning_their_chat(self, bridge):
+        router, workers, handled = self.make_router()
+        chat = next(f"chat-{i}" for i in range(100) if router.shard_for(f"chat-{i}") == 1)
+
+        run(router.dispatch({"type": "new-prompt", "content": {"id": "p1", "content": "hi", "chatId": chat}}))
+        run(router.dispatch({"type": "stop-generation", "payload": {"chatId": chat}}))
+
+        assert self.received(workers[0]) == []
+        assert [m["type"] for m in self.received(workers[1])] == ["new-prompt", "stop-generation"]
+        assert handled == []
+
+    def test_messages_without_chat_use_the_current_chat(self, bridge):
+        router, workers, _ = self.make_router()
+        owner = router.shard_for("current")
+
+        run(router.dispatch({"type": "new-prompt", "content": {"id": "p1", "content": "hi"}}))
+        run(router.dispatch({"type": "stop-generation", "payload": None}))
+
+        messages = self.received(workers[owner])
+        assert messages[0]["content"]["chatId"] == "current"
+        assert messages[1]["payload"] == {"chatId": "current"}
+
+    def test_load_chat_switches_the_current_chat(self, bridge):
+        router, workers, handled = self.make_router()
+
+        run(router.dispatch({"type": "load-chat", "payload": {"chatId": "other"}}))
+
+        assert router.app_state.current_chat_id == "other"
+        assert "other" in router.app_state.active_sessions
+        assert self.received(workers[router.shard_for("other")])[0]["type"] == "load-chat"
+
+    def test_broadcasts_are_sent_to_every_shard_and_answered_once(self, bridge):
+        router, workers, handled = self.make_router()
+
+        run(router.dispatch({"type": "delete-all-chats"}))
+
+        assert all(self.received(worker) == [{"type": "delete-all-chats"}] for worker in workers)
+        assert handled == [{"type": "delete-all-chats"}]
+
+    def test_other_messages_are_handled_locally(self, bridge):
+        router, workers, handled = self.make_router()
+
+        run(router.dispatch({"type": "get-chat-list"}))
+
+        assert handled == [{"type": "get-chat-list"}]
+        assert all(self.received(worker) == [] for worker in workers)
+
+    def test_worker_output_is_forwarded_and_sentence_done_returns_to_its_sender(self, bridge):
+        router, workers, _ = self.make_router()
+        primary, worker = socket.socketpair()
+        connection = router.connections[1] = ShardConnection(1, SocketHandle(primary))
+        worker.sendall(shard_bridge.encode_line({"type": "sentence", "payload": {"id": "s1"}}))
+        worker.sendall(shard_bridge.encode_line({"type": "all-chats-deleted"}))
+        worker.close()
+
+        async def scenario():
+            pump = await spawn(router._pump_outbound(connection, shard_bridge.read_lines(connection.handle)))
+            await pump.join()
+
+        run(scenario())
+
+        assert [call.args[0]["type"] for call in bridge.send_message.call_args_list] == ["sentence"]
+        assert not connection.alive
+
+        # The worker is gone, so its sentence's completion gets an error reply
+        run(router.dispatch({"type": "sentence-done", "payload": {"id": "s1"}}))
+        assert bridge.send_message.call_args.args[0].type == "error"
+
+    def test_worker_batches_are_unpacked(self, bridge):
+        router, _, _ = self.make_router()
+        primary, worker = socket.socketpair()
+        connection = router.connections[1] = ShardConnection(1, SocketHandle(primary))
+        batch = {"type": "batch", "messages": [
+            {"type": "sentence", "payload": {"id": "s1"}},
+            {"type": "all-chats-deleted"},
+            {"type": "sentence", "payload": {"id": "s2"}},
+        ]}
+        worker.sendall(shard_bridge.encode_line(batch))
+        worker.close()
+
+        async def scenario():
+            pump = await spawn(router._pump_outbound(connection, shard_bridge.read_lines(connection.handle)))
+            await pump.join()
+            await sleep(0.05)
+
+        run(scenario())
+
+        sent = [call.args[0] for call in bridge.send_message.call_args_list]
+        messages = [m for message in sent for m in getattr(message, "messages", [message])]
+        assert [m["payload"]["id"] for m in messages] == ["s1", "s2"]
+
+    def test_messages_for_workers_that_never_connect_get_an_error_reply(self, bridge):
+        handled = []
+
+        async def handle_locally(message):
+            handled.append(message)
+
+        router = ShardRouter(AppState(current_chat_id="current"), 2, handle_locally)
+        router._ready_deadline = time.monotonic() + 0.05
+
+        started = time.monotonic()
+        run(router.dispatch({"type": "get-chat-list"}))
+        assert time.monotonic() - started < 0.05
+        assert handled == [{"type": "get-chat-list"}]
+
+        run(router.dispatch({"type": "stop-generation", "payload": None}))
+        reply = bridge.send_message.call_args.args[0]
+        assert reply.type == "error"
+        assert reply.payload.originalMessageType == "stop-generation"
+
+    def test_sending_to_a_worker_that_does_not_read_leaves_the_loop_running(self):
+        primary, worker = socket.socketpair()
+        connection = ShardConnection(0, SocketHandle(primary))
+        message = {"type": "new-prompt", "content": {"content": "x" * 4_000_000}}
+        ticks = []
+        received = bytearray()
+
+        def read_all():
+            while chunk := worker.recv(65536):
+                received.extend(chunk)
+                if received.endswith(b"\n"):
+                    break
+
+        async def scenario():
+            sending = await spawn(connection.send(message))
+            for _ in range(5):
+                await sleep(0.01)
+                ticks.append(sending.is_finished)
+            threading.Thread(target=read_all, daemon=True).start()
+            await sending.join()
+
+        run(scenario())
+        connection.close()
+        assert ticks == [False] * 5
+        assert json.loads(received) == message
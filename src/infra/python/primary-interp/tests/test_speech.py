@@ -0,0 +1,358 @@
+from unittest.mock import AsyncMock, MagicMock
+import base64
+import json
+import os
+import sys
+import time
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import pytest
+from flowno import EventLoop, FlowHDL, Stream, node, sleep, spawn
+
+from FlownoApp.ipc.handler import handle_message
+from FlownoApp.messages.domain_types import AppState, SpeechConfig
+from FlownoApp.messages.encoders import NodeJSMessageJSONEncoder
+from FlownoApp.messages.ipc_schema import ChunkedResponse, SentenceEvent, SentenceEventPayload
+from FlownoApp.nodes import gui_io
+from FlownoApp.nodes.gui_io import SentenceSpeaker, merge_sentences, take_batch
+from FlownoApp.nodes.sentencizer import ChunkSentences
+from FlownoApp.services import outbox
+from FlownoApp.services.audio_spool import AudioSpool
+from FlownoApp.services.metrics import metrics
+from FlownoApp.services.tts import StubEngine
+from FlownoApp.utils import credit_window
+from FlownoApp.utils.bounded_queue import BoundedQueue
+from FlownoApp.utils.credit_window import CreditWindow
+
+
+def run(coro, wait_for_spawned_tasks=True):
+    return EventLoop().run_until_complete(coro, join=True, wait_for_spawned_tasks=wait_for_spawned_tasks)
+
+
+def segment(text_chunks, speech, collect=True):
+    """Run ChunkSentences over one response and return the chunks sent and the sentences yielded."""
+    sent = []
+    sentences = []
+
+    @node
+    async def Response():
+        for i, text in enumerate(text_chunks):
+            finish_reason = "stop" if i == len(text_chunks) - 1 else None
+            sent.append(text)
+            yield ChunkedResponse("chunk", f"c{i}", "r1", text, finish_reason)
+
+    @node(stream_in=["events"])
+    async def Collect(events: Stream[SentenceEvent]):
+        async for event in events:
+            sentences.append(event.payload.text)
+
+    with FlowHDL() as f:
+        f.response = Response()
+        f.sentences = ChunkSentences(f.response, speech)
+        # A stream that never yields never starts its consumer
+        if collect:
+            f.collect = Collect(f.sentences)
+    f.run_until_complete()
+    return sent, sentences
+
+
+class TestChunkSentences:
+    def test_disabled_speech_skips_segmentation(self):
+        metrics.reset()
+        sent, sentences = segment(["Hello there. ", "How are you?"], SpeechConfig(enabled=False), collect=False)
+        assert sent == ["Hello there. ", "How are you?"]
+        assert sentences == []
+        assert not [name for name in metrics.snapshot()["counters"] if name.startswith("offload.sentencizer")]
+
+    def test_enabled_speech_yields_sentences(self):
+        _, sentences = segment(["Hello there. ", "How are you?"], SpeechConfig(enabled=True))
+        assert " ".join(sentences) == "Hello there. How are you?"
+
+
+class TestSetSpeech:
+    @pytest.fixture
+    def bridge(self, monkeypatch):
+        bridge = MagicMock()
+        monkeypatch.setattr(outbox, "nodejs_callback_bridge", bridge)
+        return bridge
+
+    def speaker(self):
+        return MagicMock(cancel_all=AsyncMock(return_value=0))
+
+    def test_turning_speech_off_drops_pending_sentences(self, bridge):
+        context = MagicMock(app_state=AppState(), sentence_speaker=self.speaker())
+
+        run(handle_message({"type": "set-speech", "payload": {"enabled": False}}, context))
+
+        assert context.app_state.speech_config.enabled is False
+        context.sentence_speaker.cancel_all.assert_awaited_once()
+        ack = bridge.send_message.call_args.args[0]
+        assert (ack.type, ack.payload.originalMessageType) == ("ack", "set-speech")
+
+    def test_turning_speech_on(self, bridge):
+        context = MagicMock(app_state=AppState(speech_config=SpeechConfig(enabled=False)), sentence_speaker=self.speaker())
+
+        run(handle_message({"type": "set-speech", "payload": {"enabled": True}}, context))
+
+        assert context.app_state.speech_config.enabled is True
+        context.sentence_speaker.cancel_all.assert_not_awaited()
+
+    def test_enabled_must_be_a_boolean(self, bridge):
+        context = MagicMock(app_state=AppState())
+
+        run(handle_message({"type": "set-speech", "payload": {"enabled": "no"}}, context))
+
+        assert context.app_state.speech_config.enabled is True
+        error = bridge.send_message.call_args.args[0]
+        assert error.payload.message == "Invalid set-speech message: payload.enabled: expected boolean, got string"
+
+
+class TestCreditWindow:
+    @pytest.fixture(autouse=True)
+    def fresh_metrics(self):
+        metrics.reset()
+
+    def test_sender_waits_for_an_acknowledgement(self):
+        window = CreditWindow(2, name="test")
+        order = []
+
+        async def send(key):
+            await window.acquire()
+            window.add(key, key)
+            order.append(f"sent {key}")
+
+        async def scenario():
+            await send("a")
+            await send("b")
+            blocked = await spawn(send("c"))
+            await sleep(0.01)
+            order.append("ack a")
+            assert await window.acknowledge("a")
+            await blocked.join()
+
+        run(scenario())
+        assert order == ["sent a", "sent b", "ack a", "sent c"]
+        assert [key for key, _ in window.items()] == ["b", "c"]
+        counters = metrics.snapshot()["counters"]
+        assert counters["test.credit_waits"] == 1
+
+    def test_unacknowledged_items_expire(self):
+        window = CreditWindow(1, timeout=0.05, name="test")
+
+        async def scenario():
+            await window.acquire()
+            window.add("a", "sentence")
+            assert await window.expire() == []
+            await sleep(0.06)
+            expired = await window.expire()
+            # A late acknowledgement is ignored
+            return expired, await window.acknowledge("a")
+
+        assert run(scenario()) == (["sentence"], False)
+        assert len(window) == 0
+        assert metrics.snapshot()["counters"]["test.ack_timeouts"] == 1
+
+    def test_expiry_frees_a_blocked_sender(self):
+        window = CreditWindow(1, timeout=0.05, name="test")
+
+        async def scenario():
+            await spawn(window.run_expiry())
+            await window.acquire()
+            window.add("lost", "lost")
+            started = time.monotonic()
+            await window.acquire()
+            return time.monotonic() - started
+
+        waited = run(scenario(), wait_for_spawned_tasks=False)
+        assert 0.04 < waited < 1
+        assert "lost" not in window
+
+    def test_timeout_set_after_expiry_started_takes_effect(self, monkeypatch):
+        monkeypatch.setattr(credit_window, "IDLE_POLL", 0.01)
+        window = CreditWindow(1, name="test")
+
+        async def scenario():
+            await spawn(window.run_expiry())
+            await window.acquire()
+            window.add("lost", "lost")
+            await sleep(0.02)
+            # As SentenceSpeaker does once it gets its speech settings
+            window.timeout = 0.05
+            started = time.monotonic()
+            await window.acquire()
+            return time.monotonic() - started
+
+        waited = run(scenario(), wait_for_spawned_tasks=False)
+        assert waited < 1
+        assert "lost" not in window
+
+
+class TestTakeBatch:
+    def queued(self, text, i, chat_id="a", epoch=0):
+        payload = SentenceEventPayload(id=f"s{i}", chunk_ids=[f"c{i}"], text=text, audio="", order=i, chat_id=chat_id)
+        return chat_id, epoch, SentenceEvent(type="sentence", payload=payload)
+
+    def batch(self, first, queued, max_chars):
+        queue = BoundedQueue(16, "coalesce", "test", merge_sentences)
+
+        async def scenario():
+            for item in queued:
+                await queue.put(item)
+            batch = await take_batch(queue, first, max_chars)
+            return batch[2].payload, [item[2].payload.id for item in queue.items]
+
+        return run(scenario())
+
+    def test_queued_short_sentences_are_merged_up_to_the_budget(self):
+        metrics.reset()
+        payload, left = self.batch(
+            self.queued("One.", 0), [self.queued("Two.", 1), self.queued("Three.", 2), self.queued("Four.", 3)], 16
+        )
+        assert (payload.text, payload.chunk_ids, payload.order) == ("One. Two. Three.", ["c0", "c1", "c2"], 0)
+        assert left == ["s3"]
+        assert metrics.snapshot()["counters"]["speech.batched_sentences"] == 2
+
+    def test_other_chats_and_epochs_end_the_batch(self):
+        first = self.queued("One.", 0)
+        assert self.batch(first, [self.queued("Two.", 1, chat_id="b")], 100)[0].text == "One."
+        assert self.batch(first, [self.queued("Two.", 1, epoch=1)], 100)[0].text == "One."
+
+    def test_long_sentences_are_not_merged(self):
+        payload, left = self.batch(self.queued("One.", 0), [self.queued("A much longer second sentence.", 1)], 16)
+        assert payload.text == "One."
+        assert left == ["s1"]
+
+
+class Finished(BaseException):
+    """Ends the flow once the scenario is done."""
+
+
+class TestSentenceSpeaker:
+    @pytest.fixture(autouse=True)
+    def fresh_speaker(self, monkeypatch):
+        # The speakers share their queues, window and tasks as class attributes;
+        # each test gets its own, and the originals are restored afterwards
+        monkeypatch.setattr(SentenceSpeaker, "sentence_queue", BoundedQueue(
+            gui_io.SENTENCE_QUEUE_SIZE, "coalesce", "tts_sentences", merge_sentences
+        ))
+        monkeypatch.setattr(SentenceSpeaker, "rendered", BoundedQueue(SpeechConfig.lookahead, "block", "tts_rendered"))
+        monkeypatch.setattr(SentenceSpeaker, "pending_sentences", CreditWindow(
+            SpeechConfig.max_in_flight, SpeechConfig.ack_timeout, "speech",
+            on_release=lambda sentence_id, _: gui_io.audio_spool.remove(sentence_id),
+        ))
+        monkeypatch.setattr(SentenceSpeaker, "epochs", {})
+        for task in ("render_task", "speak_task", "expiry_task"):
+            monkeypatch.setattr(SentenceSpeaker, task, None)
+        yield
+        # The flow ended with the tasks parked on the queues. Close them now
+        # rather than whenever they are collected, during some later test.
+        for task in ("render_task", "speak_task", "expiry_task"):
+            handle = getattr(SentenceSpeaker, task)
+            if handle is not None:
+                try:
+                    handle.raw_task.close()
+                except RuntimeError:
+                    # Leaving the queue's lock needs the event loop, which is gone
+                    pass
+
+    @pytest.fixture
+    def sent(self, monkeypatch):
+        bridge = MagicMock()
+        monkeypatch.setattr(outbox, "nodejs_callback_bridge", bridge)
+
+        def sent():
+            messages = [call.args[0] for call in bridge.send_message.call_args_list]
+            # Unpack the batches the outbox sent as envelopes
+            return [m for message in messages for m in getattr(message, "messages", [message])]
+        return sent
+
+    def speak(self, texts, speech, scenario):
+        @node
+        async def Sentences():
+            for i, text in enumerate(texts):
+                payload = SentenceEventPayload(id=f"s{i}", chunk_ids=[f"c{i}"], text=text, audio="", order=i)
+                yield SentenceEvent(type="sentence", payload=payload)
+
+        with FlowHDL() as f:
+            f.sentences = Sentences()
+            f.tts = SentenceSpeaker(f.sentences, None, speech)
+
+        f.create_task(scenario(f.tts))
+        with pytest.raises(Finished):
+            f.run_until_complete()
+
+    def test_sentences_are_paced_by_acknowledgements(self, sent):
+        seen = []
+
+        async def scenario(speaker):
+            for i in range(3):
+                await sleep(0.05)
+                seen.append([event.payload.id for event in sent()])
+                await speaker.handle_sentence_done(f"s{i}")
+            raise Finished()
+
+        self.speak(["One.", "Two.", "Three."], SpeechConfig(max_in_flight=1), scenario)
+        assert seen == [["s0"], ["s0", "s1"], ["s0", "s1", "s2"]]
+        assert all(event.payload.audio == "" for event in sent())
+
+    def test_audio_is_rendered_before_sending(self, sent):
+        async def scenario(speaker):
+            for i in range(2):
+                await sleep(0.1)
+                await speaker.handle_sentence_done(f"s{i}")
+            raise Finished()
+
+        self.speak(["One.", "Two."], SpeechConfig(engine="stub", lookahead=1, audio_transport="inline"), scenario)
+        audio = [base64.b64decode(event.payload.audio) for event in sent()]
+        assert audio == [StubEngine().synthesize("One."), StubEngine().synthesize("Two.")]
+
+    def test_audio_files_live_until_the_sentence_is_done(self, sent):
+        files = []
+
+        async def scenario(speaker):
+            await sleep(0.1)
+            ref = sent()[0].payload.audio_ref
+            with open(ref.path, "rb") as f:
+                files.append(f.read())
+            await speaker.handle_sentence_done("s0")
+            files.append(os.path.exists(ref.path))
+            raise Finished()
+
+        self.speak(["One."], SpeechConfig(engine="stub"), scenario)
+        event = sent()[0]
+        assert event.payload.audio == ""
+        assert (event.payload.audio_ref.size, event.payload.audio_ref.media_type) == (len(files[0]), "audio/wav")
+        assert files == [StubEngine().synthesize("One."), False]
+
+
+class TestAudioTransport:
+    def event(self, **audio):
+        payload = SentenceEventPayload(id="s0", chunk_ids=["c0"], text="One.", order=0, **audio)
+        return SentenceEvent(type="sentence", payload=payload)
+
+    def test_references_keep_the_message_small(self, tmp_path):
+        metrics.reset()
+        audio = StubEngine().synthesize("Here is a sentence of average length.")
+        encoder = NodeJSMessageJSONEncoder()
+        inline = encoder.encode(self.event(audio=base64.b64encode(audio).decode("ascii")))
+        ref = AudioSpool(str(tmp_path)).write("s0", audio, "audio/wav")
+        by_reference = encoder.encode(self.event(audio="", audio_ref=ref))
+
+        assert len(inline) > len(audio) * 4 / 3
+        assert len(by_reference) < 500
+        assert json.loads(by_reference)["payload"]["audio_ref"]["size"] == len(audio)
+        summary = metrics.snapshot()["summaries"]["ipc.sentence.bytes"]
+        assert (summary["count"], summary["max"]) == (2, len(inline))
+
+    def test_spool_removes_its_files(self, tmp_path):
+        spool = AudioSpool(str(tmp_path))
+        ref = spool.write("s0", b"audio", "audio/wav")
+        spool.remove("s0")
+        spool.remove("s0")
+        assert not os.path.exists(ref.path)
+        spool.write("s1", b"audio", "audio/wav")
+        spool.close()
+        assert list(tmp_path.iterdir()) == []
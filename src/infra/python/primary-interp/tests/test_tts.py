@@ -0,0 +1,126 @@
+from unittest.mock import MagicMock
+import sys
+
+# Mock the nodejs bridge modules before importing any FlownoApp modules
+sys.modules['_nodejs_callback_bridge'] = MagicMock()
+sys.modules['nodejs_callback_bridge'] = MagicMock()
+
+import io
+import wave
+
+import pytest
+from flowno import EventLoop
+
+from FlownoApp.services import tts
+from FlownoApp.services.audio_cache import AudioCache
+from FlownoApp.services.metrics import metrics
+from FlownoApp.messages.domain_types import SpeechConfig
+from FlownoApp.services.tts import CachedEngine, StubEngine, get_engine, register_engine, synthesize
+
+
+def run(coro):
+    return EventLoop().run_until_complete(coro, join=True)
+
+
+class TestStubEngine:
+    def test_renders_a_wav_that_grows_with_the_text(self):
+        engine = StubEngine()
+        short = wave.open(io.BytesIO(engine.synthesize("Sure!")))
+        long = wave.open(io.BytesIO(engine.synthesize("Here is a much longer sentence to say.")))
+        assert (short.getnchannels(), short.getframerate()) == (1, StubEngine.sample_rate)
+        assert long.getnframes() > short.getnframes()
+
+    def test_is_deterministic_per_text_and_voice(self):
+        assert StubEngine().synthesize("Hello.") == StubEngine().synthesize("Hello.")
+        assert StubEngine("a").synthesize("Hello.") != StubEngine("b").synthesize("Hello.")
+
+    def test_synthesize_runs_off_the_event_loop(self):
+        engine = StubEngine()
+        assert run(synthesize(engine, "Hello.")) == engine.synthesize("Hello.")
+
+
+class TestEngineRegistry:
+    @pytest.fixture(autouse=True)
+    def fresh_registry(self, monkeypatch):
+        monkeypatch.setattr(tts, "_factories", dict(tts._factories))
+        monkeypatch.setattr(tts, "_engines", {})
+        monkeypatch.setattr(tts, "_cache", None)
+
+    def test_engines_are_created_once_per_voice(self):
+        engine = get_engine("stub", "a")
+        assert get_engine("stub", "a") is engine
+        assert get_engine("stub", "b").voice == "b"
+
+    def test_registered_engines_can_be_selected(self):
+        class Silent(StubEngine):
+            name = "silent"
+
+        register_engine("silent", Silent)
+        assert isinstance(get_engine("silent"), Silent)
+
+    def test_engines_are_cached_once_configured(self):
+        assert isinstance(get_engine("stub", "a"), StubEngine)
+        tts.configure(SpeechConfig(cache_memory_bytes=1024))
+        assert isinstance(get_engine("stub", "b"), CachedEngine)
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            get_engine("missing")
+
+
+class CountingEngine(StubEngine):
+    def __init__(self, voice="default"):
+        super().__init__(voice)
+        self.calls = 0
+
+    def synthesize(self, text):
+        self.calls += 1
+        return text.encode("utf-8") * 10
+
+
+class TestAudioCache:
+    @pytest.fixture(autouse=True)
+    def fresh_metrics(self):
+        metrics.reset()
+
+    def counters(self):
+        return metrics.snapshot()["counters"]
+
+    def test_repeated_sentences_are_synthesized_once(self):
+        engine = CountingEngine()
+        cached = CachedEngine(engine, AudioCache(1024))
+        assert cached.synthesize("Sure!") == cached.synthesize("Sure!") == b"Sure!" * 10
+        assert engine.calls == 1
+        assert (self.counters()["tts_cache.misses"], self.counters()["tts_cache.memory_hits"]) == (1, 1)
+
+    def test_keys_depend_on_engine_voice_and_text(self):
+        keys = {AudioCache.key("stub", "a", "Hi."), AudioCache.key("stub", "b", "Hi."),
+                AudioCache.key("other", "a", "Hi."), AudioCache.key("stub", "a", "Hi!")}
+        assert len(keys) == 4
+
+    def test_memory_tier_evicts_the_least_recently_used(self):
+        cache = AudioCache(memory_bytes=10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        cache.get("a")
+        cache.put("c", b"cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"aaaa"
+        assert self.counters()["tts_cache.memory_evictions"] == 1
+        assert metrics.snapshot()["gauges"]["tts_cache.memory_bytes"] == 8
+
+    def test_disk_tier_survives_a_restart(self, tmp_path):
+        AudioCache(memory_bytes=1024, directory=str(tmp_path)).put("a", b"audio")
+        cache = AudioCache(memory_bytes=1024, directory=str(tmp_path))
+        assert cache.get("a") == b"audio"
+        assert cache.get("a") == b"audio"
+        assert (self.counters()["tts_cache.disk_hits"], self.counters()["tts_cache.memory_hits"]) == (1, 1)
+
+    def test_disk_tier_is_size_capped(self, tmp_path):
+        cache = AudioCache(memory_bytes=0, directory=str(tmp_path), disk_bytes=10)
+        for key in "abc":
+            cache.put(key, key.encode() * 4)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["b.audio", "c.audio"]
+        assert cache.get("a") is None
+        assert cache.get("c") == b"cccc"
+        assert self.counters()["tts_cache.disk_evictions"] == 1
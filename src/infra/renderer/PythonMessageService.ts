@@ -87,6 +87,17 @@ export class PythonMessageService {
     return window.electron.ElectronFlownoBridge.send(message);
   }
 
+  /**
+   * Turns speech on or off. While it is off, responses are not split into
+   * sentences and no sentence events are sent.
+   * @param enabled Whether responses are spoken
+   * @returns Promise that resolves when the message is sent
+   */
+  async setSpeech(enabled: boolean): Promise<void> {
+    const message = MessageFactory.createSetSpeech(enabled);
+    return window.electron.ElectronFlownoBridge.send(message);
+  }
+
   /**
    * Edits an existing message.
    * @param messageId ID of the message to edit
@@ -98,6 +109,17 @@ export class PythonMessageService {
     return window.electron.ElectronFlownoBridge.send(message);
   }
 
+  /**
+   * Sends several messages in one bridge crossing. Python handles them in
+   * order, as if they had been sent one by one.
+   * @param messages Messages to send
+   * @returns Promise that resolves when the batch is sent
+   */
+  async sendBatch(messages: IPCMessage[]): Promise<void> {
+    const message = MessageFactory.createBatch(messages);
+    return window.electron.ElectronFlownoBridge.send(message);
+  }
+
   /**
    * Generic method to send any valid IPC message.
    * @param message Message to send
@@ -38,6 +38,17 @@ export abstract class IPCMessageBase {
   abstract readonly type: string;
 }
 
+/**
+ * Several messages crossing the bridge at once, in either direction.
+ * They are handled in order, as if they had been sent one by one.
+ */
+export class BatchMessage extends IPCMessageBase {
+  readonly type = "batch";
+  constructor(public messages: IPCMessage[]) {
+    super();
+  }
+}
+
 // -----------------------------------------------------------------
 // Frontend → Python Messages (Commands & Queries)
 // -----------------------------------------------------------------
@@ -46,7 +57,8 @@ export class NewPromptPayload {
   constructor(
     public id: string,
     public role: "user" | "system",
-    public content: string
+    public content: string,
+    public chatId?: string
   ) {}
 }
 
@@ -116,10 +128,13 @@ export class SetApiConfigRequest extends IPCMessageBase {
   }
 }
 
+export class StopGenerationPayload {
+  constructor(public chatId?: string) {}
+}
+
 export class StopGenerationRequest extends IPCMessageBase {
   readonly type = "stop-generation";
-  public payload: null = null;
-  constructor() {
+  constructor(public payload: StopGenerationPayload | null = null) {
     super();
   }
 }
@@ -140,6 +155,14 @@ export class GetApiConfigRequest extends IPCMessageBase {
   }
 }
 
+export class GetMetricsRequest extends IPCMessageBase {
+  readonly type = "get-metrics";
+  public payload: null = null;
+  constructor() {
+    super();
+  }
+}
+
 // -----------------------------------------------------------------
 // Python → Frontend Messages (Responses & Events)
 // -----------------------------------------------------------------
@@ -184,6 +207,28 @@ export class ApiConfigResponse extends IPCMessageBase {
   }
 }
 
+export interface MetricsSummary {
+  count: number;
+  total: number;
+  mean: number;
+  max: number;
+}
+
+export class MetricsPayload {
+  constructor(
+    public counters: Record<string, number>,
+    public gauges: Record<string, number>,
+    public summaries: Record<string, MetricsSummary>
+  ) {}
+}
+
+export class MetricsResponse extends IPCMessageBase {
+  readonly type = "metrics";
+  constructor(public payload: MetricsPayload) {
+    super();
+  }
+}
+
 export class MessageDeletedPayload {
   constructor(public messageId: string) {}
 }
@@ -195,10 +240,13 @@ export class MessageDeletedResponse extends IPCMessageBase {
   }
 }
 
+export class GenerationStoppedPayload {
+  constructor(public chatId: string | null) {}
+}
+
 export class GenerationStoppedResponse extends IPCMessageBase {
   readonly type = "generation-stopped";
-  public payload: null = null;
-  constructor() {
+  constructor(public payload: GenerationStoppedPayload) {
     super();
   }
 }
@@ -247,13 +295,24 @@ export class ErrorResponse extends IPCMessageBase {
 // Sentence-related Messages for TTS
 // -----------------------------------------------------------------
 
+export class AudioRef {
+  constructor(
+    public path: string,       // File holding the audio; removed once the sentence is done
+    public size: number,       // Size of the audio in bytes
+    public media_type: string  // MIME type of the audio, e.g. "audio/wav"
+  ) {}
+}
+
 export class SentenceEventPayload {
   constructor(
     public id: string,
     public chunk_ids: string[],
     public text: string,
-    public audio: string,
-    public order: number
+    public audio: string,  // Base64-encoded audio if pre-rendered inline, otherwise ""
+    public order: number,
+    public chat_id?: string,
+    public audio_ref?: AudioRef | null,  // Pre-rendered audio passed as a file
+    public audio_data?: Uint8Array       // The audio_ref's bytes, read by the main process
   ) {}
 }
 
@@ -275,6 +334,17 @@ export class SentenceDoneRequest extends IPCMessageBase {
   }
 }
 
+export class SetSpeechPayload {
+  constructor(public enabled: boolean) {}
+}
+
+export class SetSpeechRequest extends IPCMessageBase {
+  readonly type = "set-speech";
+  constructor(public payload: SetSpeechPayload) {
+    super();
+  }
+}
+
 // -----------------------------------------------------------------
 // Streaming Response Messages
 // -----------------------------------------------------------------
@@ -289,7 +359,10 @@ export class NewResponsePayload {
 
 export class NewResponseMessage extends IPCMessageBase {
   readonly type = "new-response";
-  constructor(public response: NewResponsePayload) {
+  constructor(
+    public response: NewResponsePayload,
+    public chat_id?: string
+  ) {
     super();
   }
 }
@@ -300,7 +373,9 @@ export class ChunkedResponse extends IPCMessageBase {
     public id: string,
     public response_id: string,
     public content: string,
-    public finish_reason?: string
+    public finish_reason?: string,
+    public chat_id?: string,
+    public chunk_ids?: string[] // Ids of the chunks merged into this one, if it was coalesced
   ) {
     super();
   }
@@ -314,6 +389,7 @@ export class ChunkedResponse extends IPCMessageBase {
  * Union type of all possible IPC message classes.
  */
 export type IPCMessage = 
+  | BatchMessage
   | NewPromptMessage
   | EditMessageRequest
   | DeleteMessageRequest
@@ -324,10 +400,12 @@ export type IPCMessage =
   | StopGenerationRequest
   | GetChatListRequest
   | GetApiConfigRequest
+  | GetMetricsRequest
   | ChatListResponse
   | ChatLoadedResponse
   | AllChatsDeletedResponse
   | ApiConfigResponse
+  | MetricsResponse
   | MessageDeletedResponse
   | GenerationStoppedResponse
   | MessageUpdatedResponse
@@ -335,6 +413,7 @@ export type IPCMessage =
   | ErrorResponse
   | SentenceEvent
   | SentenceDoneRequest
+  | SetSpeechRequest
   | NewResponseMessage
   | ChunkedResponse;
 
@@ -353,8 +432,8 @@ export function isMessageOfType<T extends { type: string }>(
  * Message Factory to create type-safe IPC message instances.
  */
 export class MessageFactory {
-  static createNewPrompt(id: string, content: string, role: "user" | "system" = "user"): NewPromptMessage {
-    const payload = new NewPromptPayload(id, role, content);
+  static createNewPrompt(id: string, content: string, role: "user" | "system" = "user", chatId?: string): NewPromptMessage {
+    const payload = new NewPromptPayload(id, role, content, chatId);
     return new NewPromptMessage(payload);
   }
 
@@ -376,8 +455,20 @@ export class MessageFactory {
     return new GetChatListRequest();
   }
 
-  static createStopGeneration(): StopGenerationRequest {
-    return new StopGenerationRequest();
+  static createStopGeneration(chatId?: string): StopGenerationRequest {
+    return new StopGenerationRequest(chatId ? new StopGenerationPayload(chatId) : null);
+  }
+
+  static createGetMetrics(): GetMetricsRequest {
+    return new GetMetricsRequest();
+  }
+
+  static createSetSpeech(enabled: boolean): SetSpeechRequest {
+    return new SetSpeechRequest(new SetSpeechPayload(enabled));
+  }
+
+  static createBatch(messages: IPCMessage[]): BatchMessage {
+    return new BatchMessage(messages);
   }
 
   static createSetApiConfig(config: ApiConfig): SetApiConfigRequest {
@@ -22,7 +22,12 @@ contextBridge.exposeInMainWorld("electron", {
 
     registerMessageListener(callback: (message: any) => void) {
       const listener = (_event: Electron.IpcRendererEvent, message: any) => {
-        callback(message);
+        // Python sends queued messages in one batch envelope; hand them over one by one
+        if (message?.type === "batch" && Array.isArray(message.messages)) {
+          message.messages.forEach((m: any) => callback(m));
+        } else {
+          callback(message);
+        }
       };
 
       ipcRenderer.on(IPC_ElectronFlownoBridge_messageForRenderer, listener);